@@ -0,0 +1,232 @@
+"""
+Memory and tick throughput of the terminal's market data for a 5000-instrument universe.
+
+"dict" is the previous layout: a dict of MarketData dataclasses keyed by an f"{token}_{exchange}" string built on
+every tick, a datetime per update, and ten new DepthLevel dataclasses per depth tick. "store" is WebSocketManager as
+it is now: slotted rows over the columns of MarketDataStore, found through interned segment/token keys, depth levels
+updated in place and monotonic timestamps.
+
+Usage:
+    python benchmarks/bench_market_data.py [--instruments N] [--ticks N]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from terminal.websocket_manager import WebSocketManager
+
+
+@dataclass
+class MarketData:
+    instrument_token: str
+    exchange_segment: str
+    trading_symbol: str = ""
+    ltp: float = 0.0
+    last_traded_qty: int = 0
+    volume: int = 0
+    open_price: float = 0.0
+    high_price: float = 0.0
+    low_price: float = 0.0
+    close_price: float = 0.0
+    change: float = 0.0
+    change_percent: float = 0.0
+    bid_price: float = 0.0
+    ask_price: float = 0.0
+    bid_qty: int = 0
+    ask_qty: int = 0
+    open_interest: int = 0
+    total_buy_qty: int = 0
+    total_sell_qty: int = 0
+    lower_circuit: float = 0.0
+    upper_circuit: float = 0.0
+    week_52_high: float = 0.0
+    week_52_low: float = 0.0
+    last_update: datetime = field(default_factory=datetime.now)
+
+
+@dataclass
+class DepthLevel:
+    price: float = 0.0
+    quantity: int = 0
+    orders: int = 0
+
+
+@dataclass
+class MarketDepth:
+    instrument_token: str
+    exchange_segment: str
+    trading_symbol: str = ""
+    bids: List[DepthLevel] = field(default_factory=list)
+    asks: List[DepthLevel] = field(default_factory=list)
+    last_update: datetime = field(default_factory=datetime.now)
+
+
+class DictFeed:
+    """The previous stock and depth handlers, without callbacks and logging"""
+
+    def __init__(self):
+        self.market_data = {}
+        self.market_depth = {}
+
+    def stock_tick(self, data):
+        token = str(data.get("tk", ""))
+        exchange = data.get("e", "")
+        key = f"{token}_{exchange}"
+        if key not in self.market_data:
+            self.market_data[key] = MarketData(instrument_token=token, exchange_segment=exchange)
+        md = self.market_data[key]
+        md.trading_symbol = data.get("ts", md.trading_symbol)
+        if data.get("ltp"):
+            md.ltp = data["ltp"]
+        md.last_traded_qty = data.get("ltq", md.last_traded_qty) or 0
+        md.volume = data.get("v", md.volume) or 0
+        md.open_price = data.get("op", md.open_price) or 0
+        md.high_price = data.get("h", md.high_price) or 0
+        md.low_price = data.get("lo", md.low_price) or 0
+        md.close_price = data.get("c", md.close_price) or 0
+        md.change = data.get("cng", md.change) or 0
+        md.change_percent = data.get("nc", md.change_percent) or 0
+        md.bid_price = data.get("bp", md.bid_price) or 0
+        md.ask_price = data.get("sp", md.ask_price) or 0
+        md.bid_qty = data.get("bq", md.bid_qty) or 0
+        md.ask_qty = data.get("sq", md.ask_qty) or 0
+        md.open_interest = data.get("oi", md.open_interest) or 0
+        md.total_buy_qty = data.get("tbq", md.total_buy_qty) or 0
+        md.total_sell_qty = data.get("tsq", md.total_sell_qty) or 0
+        md.lower_circuit = data.get("lcl", md.lower_circuit) or 0
+        md.upper_circuit = data.get("ucl", md.upper_circuit) or 0
+        md.week_52_high = data.get("yh", md.week_52_high) or 0
+        md.week_52_low = data.get("yl", md.week_52_low) or 0
+        md.last_update = datetime.now()
+
+    def depth_tick(self, data):
+        token = str(data.get("tk", ""))
+        exchange = data.get("e", "")
+        key = f"{token}_{exchange}"
+        if key not in self.market_depth:
+            self.market_depth[key] = MarketDepth(instrument_token=token, exchange_segment=exchange)
+        depth = self.market_depth[key]
+        depth.trading_symbol = data.get("ts", depth.trading_symbol)
+        depth.last_update = datetime.now()
+        depth.bids = []
+        for i in range(5):
+            suffix = str(i + 1) if i > 0 else ""
+            depth.bids.append(DepthLevel(price=data.get(f"bp{suffix}", 0) or 0,
+                                         quantity=data.get(f"bq{suffix}", 0) or 0,
+                                         orders=data.get(f"bno{i + 1}", 0) or 0))
+        depth.asks = []
+        for i in range(5):
+            suffix = str(i + 1) if i > 0 else ""
+            depth.asks.append(DepthLevel(price=data.get(f"sp{suffix}", 0) or 0,
+                                         quantity=data.get(f"bs{suffix}", 0) or 0,
+                                         orders=data.get(f"sno{i + 1}", 0) or 0))
+        bp = data.get("bp")
+        sp = data.get("sp")
+        if bp or sp:
+            md = self.market_data[key]
+            md.ltp = (bp + sp) / 2 if bp and sp else bp or sp
+            md.bid_price = bp if bp else md.bid_price
+            md.ask_price = sp if sp else md.ask_price
+            if md.close_price and md.close_price > 0 and md.ltp > 0:
+                md.change = md.ltp - md.close_price
+                md.change_percent = ((md.ltp - md.close_price) / md.close_price) * 100
+            md.last_update = datetime.now()
+
+
+def store_feed():
+    WebSocketManager._instance = None
+    manager = WebSocketManager()
+    manager.stock_tick = manager._handle_stock_feed
+    manager.depth_tick = manager._handle_depth_feed
+    return manager
+
+
+def make_ticks(instruments, count, rng):
+    """Stock ticks carrying a few changed fields, and full five-level depth ticks"""
+    stock, depth = [], []
+    for _ in range(count):
+        token = str(rng.randrange(instruments))
+        price = round(rng.uniform(50, 5000), 2)
+        stock.append({"name": "sf", "tk": token, "e": "nse_fo", "ltp": price, "ltq": rng.randrange(1, 500),
+                      "v": rng.randrange(10 ** 6), "bp": price - 0.05, "sp": price + 0.05, "oi": rng.randrange(10 ** 5)})
+        tick = {"name": "dp", "tk": token, "e": "nse_fo"}
+        for level in range(1, 6):
+            suffix = str(level) if level > 1 else ""
+            tick.update({f"bp{suffix}": price - level * 0.05, f"bq{suffix}": rng.randrange(1, 900),
+                         f"bno{level}": rng.randrange(1, 20), f"sp{suffix}": price + level * 0.05,
+                         f"bs{suffix}": rng.randrange(1, 900), f"sno{level}": rng.randrange(1, 20)})
+        depth.append(tick)
+    return stock, depth
+
+
+def seed(feed, instruments):
+    """One full stock tick and one depth tick per instrument, as after subscribing"""
+    for index in range(instruments):
+        token = str(index)
+        feed.stock_tick({"tk": token, "e": "nse_fo", "ts": f"SYM{index}-FUT", "ltp": 100.0 + index, "c": 99.0 + index,
+                         "op": 98.0, "h": 110.0, "lo": 90.0, "v": index, "oi": index, "lcl": 80.0, "ucl": 120.0,
+                         "yh": 150.0, "yl": 60.0})
+        feed.depth_tick({"tk": token, "e": "nse_fo", "bp": 99.95 + index, "sp": 100.05 + index, "bq": 10, "bs": 10})
+
+
+def measure_memory(make_feed, instruments):
+    gc.collect()
+    tracemalloc.start()
+    feed = make_feed()
+    seed(feed, instruments)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def rate(handler, ticks, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for tick in ticks:
+            handler(tick)
+        best = min(best, time.perf_counter() - start)
+    return len(ticks) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instruments", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    stock, depth = make_ticks(args.instruments, args.ticks, rng)
+
+    print("{} instruments, {} ticks of each kind".format(args.instruments, args.ticks))
+    print("{:>6} {:>12} {:>14} {:>14} {:>12}".format("", "memory KiB", "stock ticks/s", "depth ticks/s", "snapshot ms"))
+    for name, make_feed in (("dict", DictFeed), ("store", store_feed)):
+        memory = measure_memory(make_feed, args.instruments)
+        feed = make_feed()
+        seed(feed, args.instruments)
+        stock_rate = rate(feed.stock_tick, stock)
+        depth_rate = rate(feed.depth_tick, depth)
+        if isinstance(feed, DictFeed):
+            snapshot = lambda: [dict(vars(md), last_update=md.last_update.isoformat())
+                                for md in feed.market_data.values()]
+        else:
+            snapshot = feed.get_all_market_data
+        snapshot_ms = 1e3 / rate(lambda _: snapshot(), [None])
+        print("{:>6} {:>12.0f} {:>14.0f} {:>14.0f} {:>12.2f}".format(name, memory / 1024, stock_rate, depth_rate,
+                                                                      snapshot_ms))
+
+    print("store top movers: {:.2f} ms".format(1e3 / rate(lambda _: feed.get_top_movers(10), [None])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Throughput of HSWrapper.parseData on synthetic feed frames, for each decoder mode.
+
+For every mix the connection and snapshot frames are parsed first, then the timed run decodes the UPDATE
+frames. A tick is one UPDATE packet, so the columnar mode (one FeedBatch per frame) is counted the same way. Allocations are measured in a separate tracemalloc pass: the blocks and bytes still held by the
+decoded ticks, divided by the number of ticks.
+
+Usage:
+    python benchmarks/bench_parser.py [--frames N] [--rounds N] [--save FILE] [--compare FILE] [--tolerance F]
+
+With --compare the run exits with status 1 when any ticks/sec figure falls more than --tolerance below the
+saved baseline.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_synth import FrameSynth
+from neo_api_client.HSWebSocketLib import HSWrapper
+
+# name: (scrips, depth, indices)
+MIXES = {
+    "3000 scrips, 10% depth": (2700, 300, 0),
+    "500 scrips, 20 indices": (480, 0, 20),
+    "200 depth": (0, 200, 0),
+}
+
+MODES = {
+    "default": {},
+    "native": {"native_output": True},
+    "legacy": {"legacy_parser": True},
+    "columnar": {"columnar_output": True},
+}
+
+
+def prepare(mix, frame_count):
+    scrips, depth, indices = MIXES[mix]
+    synth = FrameSynth(seed=7)
+    topics = synth.make_topics(scrips=scrips, depth=depth, indices=indices)
+    setup = [synth.connection_frame(ack_count=50)] + synth.snapshot_frames(topics)
+    frames = synth.update_frames(topics, frame_count)
+    # packet count sits after length(2), type(1) and the message number(4)
+    ticks = sum(struct.unpack_from(">H", frame, 7)[0] for frame in frames)
+    return setup, frames, ticks
+
+
+def new_wrapper(mode, setup):
+    wrapper = HSWrapper(**MODES[mode])
+    for frame in setup:
+        wrapper.parseData(frame)
+    return wrapper
+
+
+def run_timed(mode, setup, frames, rounds):
+    best = None
+    for _ in range(rounds):
+        wrapper = new_wrapper(mode, setup)
+        parse = wrapper.parseData
+        start = time.perf_counter()
+        for frame in frames:
+            parse(frame)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_allocations(mode, setup, frames, ticks):
+    wrapper = new_wrapper(mode, setup)
+    parse = wrapper.parseData
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for frame in frames:
+        results.append(parse(frame))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    return blocks / ticks, size / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--save", help="write ticks/sec per mix and mode to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = {}
+    print("{:<24} {:>11} {:>11} {:>11} {:>12} {:>12}".format(
+        "mix", "mode", "frames/s", "ticks/s", "blocks/tick", "bytes/tick"))
+    for mix in MIXES:
+        setup, frames, ticks = prepare(mix, args.frames)
+        for mode in MODES:
+            elapsed = run_timed(mode, setup, frames, args.rounds)
+            blocks, size = run_allocations(mode, setup, frames, ticks)
+            results["{} / {}".format(mix, mode)] = ticks / elapsed
+            print("{:<24} {:>11} {:>11.0f} {:>11.0f} {:>12.1f} {:>12.0f}".format(
+                mix, mode, len(frames) / elapsed, ticks / elapsed, blocks, size))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = []
+        for key, ticks_per_sec in results.items():
+            if key in baseline and ticks_per_sec < baseline[key] * (1 - args.tolerance):
+                regressions.append("{}: {:.0f} ticks/s, baseline {:.0f}".format(key, ticks_per_sec, baseline[key]))
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-tick cost of ScripTopicData.prepareData for UPDATE packets that touch 1, 5 and 30 fields.
+
+Usage:
+    python benchmarks/bench_prepare_data.py [--ticks N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo_api_client.HSWebSocketLib import ScripTopicData, SCRIP_INDEX, STRING_INDEX
+
+CHANGED_FIELD_COUNTS = (1, 5, 30)
+
+
+def make_topic():
+    topic = ScripTopicData()
+    for index in range(32):
+        topic.setLongValues(index, 1700000000 if index < 4 else 1000 + index)
+    topic.setLongValues(SCRIP_INDEX["MULTIPLIER"], 1)
+    topic.setLongValues(SCRIP_INDEX["PRECISION"], 2)
+    topic.setMultiplierAndPrec()
+    topic.setStringValues(STRING_INDEX["SYMBOL"], "11536")
+    topic.setStringValues(STRING_INDEX["EXCHG"], "nse_cm")
+    topic.setStringValues(STRING_INDEX["TSYMBOL"], "TCS-EQ")
+    topic.prepareData("SNAP")
+    return topic
+
+
+def changed_fields(count):
+    # LTP and volume first, as in a typical trade tick, then the rest of the wire fields
+    fields = [SCRIP_INDEX["LTP"], SCRIP_INDEX["VOLUME"]]
+    fields += [index for index in range(32) if index not in fields and index not in
+               (SCRIP_INDEX["MULTIPLIER"], SCRIP_INDEX["PRECISION"])]
+    return fields[:count]
+
+
+def bench(count, ticks):
+    topic = make_topic()
+    fields = changed_fields(count)
+    state = {"tick": 0}
+
+    def tick():
+        state["tick"] += 1
+        for index in fields:
+            topic.setLongValues(index, state["tick"] + index)
+        topic.prepareData("SUB")
+
+    best = min(timeit.repeat(tick, number=ticks, repeat=5))
+    return best / ticks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=20000)
+    args = parser.parse_args()
+    print(f"{'changed fields':>15} {'us/tick':>10}")
+    for count in CHANGED_FIELD_COUNTS:
+        print(f"{count:>15} {bench(count, args.ticks):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
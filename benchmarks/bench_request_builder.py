@@ -0,0 +1,235 @@
+"""
+Cost of building the subscribe, snapshot and ack frames sent at startup and after every reconnect,
+compared with the previous list-of-ints encoder kept below for reference.
+
+Every frame built by HSWebSocketLib is first checked byte for byte against the legacy encoder, and the
+scrips are decoded back out of the subscribe frames, before anything is timed.
+
+The second table times a whole (re)subscribe through HSWebSocket into a socket that only records frames:
+"per token" is the previous subscribe_scripts, one JSON request and frame per scrip, "batched" is
+NeoWebSocket.subscribe_scripts, one frame per channel and MAX_SCRIPS scrips.
+
+Usage:
+    python benchmarks/bench_request_builder.py [--scrips N] [--rounds N]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo_api_client.HSWebSocketLib import (BinRespTypes, HSWebSocket, HSWrapper, MAX_SCRIPS, SCRIP_PREFIX,
+                                           DEPTH_PREFIX, get_acknowledgement_req, prepareConnectionRequest2,
+                                           prepareSnapshotRequest, prepareSubsUnSubsRequest)
+from neo_api_client.NeoWebSocket import NeoWebSocket
+
+
+class LegacyByteData:
+    def __init__(self, c):
+        self.pos = 0
+        self.bytes = [0] * c
+
+    def markStartOfMsg(self):
+        self.pos += 2
+
+    def markEndOfMsg(self):
+        length = self.pos - 2
+        self.bytes[0] = (length >> 8) & 255
+        self.bytes[1] = length & 255
+
+    def appendByte(self, d):
+        self.bytes[self.pos] = d
+        self.pos += 1
+
+    def appendShort(self, d):
+        for shift in (8, 0):
+            self.appendByte((d >> shift) & 255)
+
+    def appendInt(self, d):
+        for shift in (24, 16, 8, 0):
+            self.appendByte((d >> shift) & 255)
+
+    def append_string(self, d):
+        for char in d:
+            self.appendByte(ord(char))
+
+    def appendByteArr(self, e, d):
+        for i in range(d):
+            self.appendByte(e[i])
+
+
+def legacy_scrip_byte_array(c, a):
+    if c[-1] == "&":
+        c = c[:-1]
+    scrips = [a + "|" + scrip for scrip in c.split("&")]
+    data = [(len(scrips) >> 8) & 255, len(scrips) & 255]
+    for scrip in scrips:
+        data.append(len(scrip) & 255)
+        data.extend(ord(char) for char in scrip)
+    return data
+
+
+def legacy_subs_request(scrips, subscribe_type, scrip_prefix, channel_num):
+    data = legacy_scrip_byte_array(scrips, scrip_prefix)
+    buffer = LegacyByteData(len(data) + 11)
+    buffer.markStartOfMsg()
+    buffer.appendByte(subscribe_type)
+    buffer.appendByte(2)
+    buffer.appendByte(1)
+    buffer.appendShort(len(data))
+    buffer.appendByteArr(data, len(data))
+    buffer.appendByte(2)
+    buffer.appendShort(1)
+    buffer.appendByte(int(channel_num))
+    buffer.markEndOfMsg()
+    return buffer.bytes
+
+
+def legacy_snapshot_request(a, c, d):
+    data = legacy_scrip_byte_array(a, d)
+    buffer = LegacyByteData(len(data) + 7)
+    buffer.markStartOfMsg()
+    buffer.appendByte(c)
+    buffer.appendByte(1)
+    buffer.appendByte(2)
+    buffer.appendShort(len(data))
+    buffer.appendByteArr(data, len(data))
+    buffer.markEndOfMsg()
+    return buffer.bytes
+
+
+def legacy_connection_request(a, c):
+    src = "JS_API"
+    buffer = LegacyByteData(len(src) + len(a) + len(c) + 13)
+    buffer.markStartOfMsg()
+    buffer.appendByte(BinRespTypes["CONNECTION_TYPE"])
+    buffer.appendByte(3)
+    for field_id, value in ((1, a), (2, c), (3, src)):
+        buffer.appendByte(field_id)
+        buffer.appendShort(len(value))
+        buffer.append_string(value)
+    buffer.markEndOfMsg()
+    return buffer.bytes
+
+
+def legacy_ack_request(a):
+    buffer = LegacyByteData(11)
+    buffer.markStartOfMsg()
+    buffer.appendByte(BinRespTypes["ACK_TYPE"])
+    buffer.appendByte(1)
+    buffer.appendByte(1)
+    buffer.appendShort(4)
+    buffer.appendInt(a)
+    buffer.markEndOfMsg()
+    return buffer.bytes
+
+
+def decode_scrips(frame):
+    # length(2) type(1) field count(1) field id(1) field length(2) scrip count(2)
+    count = (frame[7] << 8) | frame[8]
+    pos = 9
+    scrips = []
+    for _ in range(count):
+        length = frame[pos]
+        scrips.append(bytes(frame[pos + 1:pos + 1 + length]).decode('latin-1'))
+        pos += 1 + length
+    return scrips
+
+
+def make_requests(scrip_count):
+    """Subscribe requests as NeoWebSocket sends them: MAX_SCRIPS scrips per request, 15 channels"""
+    tokens = ["nse_cm|" + str(10000 + index) for index in range(scrip_count)]
+    chunks = [tokens[index:index + MAX_SCRIPS] for index in range(0, len(tokens), MAX_SCRIPS)]
+    return [("&".join(chunk), 2 + index % 15) for index, chunk in enumerate(chunks)]
+
+
+def check_round_trip(requests):
+    sub_type = BinRespTypes["SUBSCRIBE_TYPE"]
+    for scrips, channel in requests:
+        frame = prepareSubsUnSubsRequest(scrips, sub_type, SCRIP_PREFIX, channel)
+        assert list(frame) == legacy_subs_request(scrips, sub_type, SCRIP_PREFIX, channel)
+        assert decode_scrips(frame) == [SCRIP_PREFIX + "|" + scrip for scrip in scrips.split("&")]
+        frame = prepareSnapshotRequest(scrips, BinRespTypes["SNAPSHOT"], DEPTH_PREFIX)
+        assert list(frame) == legacy_snapshot_request(scrips, BinRespTypes["SNAPSHOT"], DEPTH_PREFIX)
+    jwt, redis_key = "eyJhbGciOiJIUzI1NiJ9." * 20, "redis-key-1234"
+    assert list(prepareConnectionRequest2(jwt, redis_key)) == legacy_connection_request(jwt, redis_key)
+    for msg_num in (0, 1, 65535, 2 ** 31 - 1):
+        assert list(get_acknowledgement_req(msg_num)) == legacy_ack_request(msg_num)
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, data, opcode):
+        self.frames.append(data)
+
+
+class RecordingServer:
+    def __init__(self):
+        self.ws = RecordingSocket()
+        self.hsWrapper = HSWrapper()
+
+
+def make_socket(scrip_count):
+    hs_websocket = HSWebSocket()
+    hs_websocket.server = RecordingServer()
+    socket = NeoWebSocket("sid", "token", "server", None)
+    socket.hsWebsocket = hs_websocket
+    for index in range(scrip_count):
+        entry = socket.subscriptions.add({'instrument_token': str(10000 + index), 'exchange_segment': 'nse_cm',
+                                          'subscription_type': 'mws'})
+        socket.subscriptions.assign([entry])
+    return socket
+
+
+def per_token_subscribe(socket):
+    for channel, token_list in socket.subscriptions.channel_entries().items():
+        for tokens in token_list:
+            value = next(iter(tokens.values()))
+            socket.hsWebsocket.hs_send(json.dumps({"type": value["subscription_type"],
+                                                   "scrips": socket.format_tokens_live(value),
+                                                   "channelnum": channel}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scrips", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    requests = make_requests(args.scrips)
+    check_round_trip(requests)
+    sub_type = BinRespTypes["SUBSCRIBE_TYPE"]
+
+    def run_new():
+        for scrips, channel in requests:
+            prepareSubsUnSubsRequest(scrips, sub_type, SCRIP_PREFIX, channel)
+
+    def run_legacy():
+        for scrips, channel in requests:
+            legacy_subs_request(scrips, sub_type, SCRIP_PREFIX, channel)
+
+    print("round trip ok for {} scrips in {} requests".format(args.scrips, len(requests)))
+    print("{:>10} {:>14}".format("encoder", "ms/subscribe"))
+    for name, func in (("legacy", run_legacy), ("bytearray", run_new)):
+        best = min(timeit.repeat(func, number=1, repeat=args.rounds))
+        print("{:>10} {:>14.3f}".format(name, best * 1e3))
+
+    socket = make_socket(args.scrips)
+    frames = socket.hsWebsocket.server.ws.frames
+    print("{:>10} {:>14} {:>8}".format("subscribe", "ms/subscribe", "frames"))
+    for name, func in (("per token", lambda: per_token_subscribe(socket)),
+                       ("batched", lambda: socket.subscribe_scripts(socket.subscriptions.channel_entries()))):
+        frames.clear()
+        func()
+        count = len(frames)
+        best = min(timeit.repeat(func, number=1, repeat=args.rounds))
+        frames.clear()
+        print("{:>10} {:>14.3f} {:>8}".format(name, best * 1e3, count))
+
+
+if __name__ == "__main__":
+    main()
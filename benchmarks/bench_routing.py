@@ -0,0 +1,61 @@
+"""
+Cost of deciding which items of a stock_feed message belong to the subscription, for 10 to 3000 subscriptions.
+
+"rebuild" is the previous is_message_for_subscription, which rebuilt the token list from sub_list on every frame;
+"index" is NeoWebSocket.subscribed_items, which checks each item against the registry's live token index.
+
+Usage:
+    python benchmarks/bench_routing.py [--items N] [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo_api_client.NeoWebSocket import NeoWebSocket
+
+SUBSCRIPTION_COUNTS = (10, 100, 500, 1000, 3000)
+
+
+def rebuild_routing(sub_list, message):
+    keys_in_sublist = list({outer_key for data_dict in sub_list for outer_key in data_dict})
+    for item in message:
+        if 'tk' in item and item['tk'] in keys_in_sublist:
+            return True
+    return False
+
+
+def make_socket(count):
+    socket = NeoWebSocket("sid", "token", "server", None)
+    for token in range(count):
+        socket.subscriptions.add({'instrument_token': str(10000 + token), 'exchange_segment': 'nse_cm',
+                                  'subscription_type': 'mws'})
+    return socket
+
+
+def make_message(count, items):
+    # Every other item is for a token that is not subscribed, the rest are spread over the subscription
+    return [{'ltp': '101.50', 'tk': str(10000 + (index * 7919) % count if index % 2 else 90000 + index),
+             'e': 'nse_cm'} for index in range(items)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=20, help="items per stock_feed message")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("{:>13} {:>14} {:>14}".format("subscriptions", "rebuild us", "index us"))
+    for count in SUBSCRIPTION_COUNTS:
+        socket = make_socket(count)
+        sub_list = socket.sub_list
+        message = make_message(count, args.items)
+        rebuild = min(timeit.repeat(lambda: rebuild_routing(sub_list, message), number=args.number, repeat=3))
+        index = min(timeit.repeat(lambda: socket.subscribed_items(message), number=args.number, repeat=3))
+        print("{:>13} {:>14.2f} {:>14.2f}".format(count, rebuild / args.number * 1e6, index / args.number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
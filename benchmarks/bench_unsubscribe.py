@@ -0,0 +1,119 @@
+"""
+Cost of rotating k instruments out of a full 3000-instrument subscription, as at an expiry roll.
+
+"scan" is the previous un_subscribe_list and remove_items: every requested token is looked up in a list built from
+the whole subscription and then searched for in every channel's token list, and the acknowledged ones are removed
+with list scans. "index" is NeoWebSocket.un_subscribe_list, which finds each token's channel in the subscription
+registry and sends one unsubscribe frame per channel.
+
+Usage:
+    python benchmarks/bench_unsubscribe.py [--subscriptions N] [--rounds N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo_api_client.HSWebSocketLib import HSWebSocket, HSWrapper
+from neo_api_client.NeoWebSocket import NeoWebSocket
+
+ROTATIONS = (10, 100, 500, 1000)
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, data, opcode):
+        self.frames.append(data)
+
+
+class RecordingServer:
+    def __init__(self):
+        self.ws = RecordingSocket()
+        self.hsWrapper = HSWrapper()
+
+
+def make_items(count):
+    return [{'instrument_token': str(10000 + index), 'exchange_segment': 'nse_fo'} for index in range(count)]
+
+
+def make_socket(count):
+    socket = NeoWebSocket("sid", "token", "server", None)
+    socket.hsWebsocket = HSWebSocket()
+    socket.hsWebsocket.server = RecordingServer()
+    socket.is_hsw_open = 1
+    socket.get_live_feed(make_items(count), False, False)
+    return socket
+
+
+def make_lists(count):
+    """The previous sub_list and {channel: [entries]} bookkeeping, 200 tokens per channel"""
+    sub_list = []
+    channel_tokens = {}
+    for index, item in enumerate(make_items(count)):
+        value = dict(item, subscription_type='mws')
+        sub_list.append({item['instrument_token']: value})
+        channel_tokens.setdefault(2 + index // 200, []).append({item['instrument_token']: dict(value)})
+    return sub_list, channel_tokens
+
+
+def scan_unsubscribe(sub_list, channel_tokens, instrument_tokens):
+    extracted_tokens = [{'instrument_token': item[key]['instrument_token'],
+                         'exchange_segment': item[key]['exchange_segment'],
+                         'subscription_type': item[key]['subscription_type']}
+                        for item in sub_list for key in item]
+    un_sub_channel_token = {}
+    for token in instrument_tokens:
+        token["subscription_type"] = 'mws'
+        if token in extracted_tokens:
+            for key, value in channel_tokens.items():
+                for obj in value:
+                    if list(obj.values())[0] == token:
+                        un_sub_channel_token.setdefault(str(key) + '-mwu', []).append(
+                            {token['instrument_token']: dict(token)})
+    for un_sub_json in un_sub_channel_token.values():
+        for unsubscribe_token in un_sub_json:
+            value = unsubscribe_token[list(unsubscribe_token.keys())[0]]
+            sub_list = [token for token in sub_list if token != unsubscribe_token]
+            for channel_token_list in channel_tokens.values():
+                for channel_token_dict in channel_token_list:
+                    if next(iter(channel_token_dict.values())) == value:
+                        channel_token_list.remove(channel_token_dict)
+                        break
+    return un_sub_channel_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscriptions", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>10} {:>8}".format("removed", "scan ms", "index ms", "frames"))
+    for count in ROTATIONS:
+        # Evenly strided, so the removed tokens are spread over all channels
+        rotated = make_items(args.subscriptions)[::max(1, args.subscriptions // count)][:count]
+        scan = index = float("inf")
+        frames = 0
+        for _ in range(args.rounds):
+            sub_list, channel_tokens = make_lists(args.subscriptions)
+            start = time.perf_counter()
+            scan_unsubscribe(sub_list, channel_tokens, [dict(item) for item in rotated])
+            scan = min(scan, time.perf_counter() - start)
+
+            socket = make_socket(args.subscriptions)
+            sent = socket.hsWebsocket.server.ws.frames
+            sent.clear()
+            start = time.perf_counter()
+            socket.un_subscribe_list([dict(item) for item in rotated])
+            index = min(index, time.perf_counter() - start)
+            assert len(socket.subscriptions) == args.subscriptions - count
+            frames = len(sent)
+        print("{:>8} {:>10.2f} {:>10.2f} {:>8}".format(count, scan * 1e3, index * 1e3, frames))
+
+
+if __name__ == "__main__":
+    main()
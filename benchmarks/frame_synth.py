@@ -0,0 +1,165 @@
+"""
+Synthetic HSM binary frames for driving HSWrapper.parseData without a live feed.
+
+Long fields are generated from SCRIP_MAPPING, INDEX_MAPPING and DEPTH_MAPPING: DATE fields carry epoch seconds,
+FLOAT32 fields carry prices scaled by the topic multiplier and precision, LONG fields carry quantities, and
+fields the decoder derives itself (change, percentage change) are sent as TRASH_VAL like the server does.
+
+Usage:
+    synth = FrameSynth(seed=7)
+    topics = synth.make_topics(scrips=2700, depth=300, indices=0)
+    frames = [synth.connection_frame(ack_count=0)] + synth.snapshot_frames(topics) + synth.update_frames(topics, 1000)
+"""
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo_api_client.HSWebSocketLib import (BinRespStat, BinRespTypes, DEPTH_INDEX, DEPTH_MAPPING, FieldTypes,
+                                           INDEX_INDEX, INDEX_MAPPING, ResponseTypes, SCRIP_INDEX, SCRIP_MAPPING,
+                                           STRING_INDEX, TRASH_VAL, TopicTypes)
+
+UINT16 = struct.Struct(">H")
+INT32 = struct.Struct(">i")
+
+MULTIPLIER = 1
+PRECISION = 2
+
+# Number of long fields the server sends for each feed type, and the wire index of multiplier/precision
+LAYOUTS = {
+    TopicTypes["SCRIP"]: (SCRIP_MAPPING, SCRIP_INDEX["TURNOVER"] + 1, SCRIP_INDEX["MULTIPLIER"],
+                          SCRIP_INDEX["PRECISION"]),
+    TopicTypes["INDEX"]: (INDEX_MAPPING, INDEX_INDEX["PERCHANGE"] + 1, INDEX_INDEX["MULTIPLIER"],
+                          INDEX_INDEX["PRECISION"]),
+    TopicTypes["DEPTH"]: (DEPTH_MAPPING, DEPTH_INDEX["PRECISION"] + 1, DEPTH_INDEX["MULTIPLIER"],
+                          DEPTH_INDEX["PRECISION"]),
+}
+
+# Fields that move on a typical trade tick; a few of the remaining fields change on top of these
+HOT_FIELDS = {
+    TopicTypes["SCRIP"]: (3, SCRIP_INDEX["VOLUME"], SCRIP_INDEX["LTP"], 6, 7, 8, 9, 10, 11, 12),
+    TopicTypes["INDEX"]: (1, INDEX_INDEX["LTP"]),
+    TopicTypes["DEPTH"]: (1, 2, 7, 12, 17, 22, 27),
+}
+
+# Fields the decoder computes itself, so the server leaves them empty
+DERIVED_FIELDS = {SCRIP_INDEX["CHANGE"], SCRIP_INDEX["PERCHANGE"], INDEX_INDEX["CHANGE"],
+                  INDEX_INDEX["PERCHANGE"]}
+
+
+class Topic:
+    def __init__(self, topic_id, feed_type, segment, token, price, values):
+        self.topic_id = topic_id
+        self.feed_type = feed_type
+        self.segment = segment
+        self.token = token
+        self.price = price
+        self.values = values
+
+    @property
+    def name(self):
+        return self.feed_type + "|" + self.segment + "|" + self.token
+
+
+class FrameSynth:
+    def __init__(self, seed=0, base_time=1700000000):
+        self.random = random.Random(seed)
+        self.base_time = base_time
+        self.now = base_time
+        self.next_topic_id = 1
+        self.msg_num = 0
+        self.ack_count = 0
+
+    def connection_frame(self, ok=True, ack_count=0):
+        """CONNECTION response; a non-zero ack_count makes every DATA frame carry a message number"""
+        self.ack_count = ack_count
+        status = (BinRespStat["OK"] if ok else BinRespStat["NOT_OK"]).encode()
+        body = bytes((BinRespTypes["CONNECTION_TYPE"], 2, 1)) + UINT16.pack(len(status)) + status
+        body += bytes((2,)) + UINT16.pack(4) + INT32.pack(ack_count)
+        return UINT16.pack(len(body)) + body
+
+    def make_topics(self, scrips=0, depth=0, indices=0, segment="nse_cm"):
+        topics = []
+        for feed_type, count in ((TopicTypes["SCRIP"], scrips), (TopicTypes["DEPTH"], depth),
+                                 (TopicTypes["INDEX"], indices)):
+            for _ in range(count):
+                token = str(10000 + self.next_topic_id)
+                price = self.random.uniform(50, 5000)
+                topics.append(Topic(self.next_topic_id, feed_type, segment, token, price,
+                                    self.initial_values(feed_type, price)))
+                self.next_topic_id += 1
+        self.random.shuffle(topics)
+        return topics
+
+    def field_value(self, field_type, price):
+        if field_type == FieldTypes["DATE"]:
+            return self.now
+        if field_type == FieldTypes["FLOAT32"]:
+            return int(price * self.random.uniform(0.98, 1.02) * MULTIPLIER * 10 ** PRECISION)
+        return self.random.randint(1, 500000)
+
+    def initial_values(self, feed_type, price):
+        mapping, field_count, mul_index, prec_index = LAYOUTS[feed_type]
+        values = [TRASH_VAL] * field_count
+        for index in range(field_count):
+            field = mapping[index]
+            if index == mul_index:
+                values[index] = MULTIPLIER
+            elif index == prec_index:
+                values[index] = PRECISION
+            elif field and index not in DERIVED_FIELDS and field["type"] != FieldTypes["STRING"]:
+                values[index] = self.field_value(field["type"], price)
+        return values
+
+    def snap_packet(self, topic):
+        name = topic.name.encode('latin-1')
+        body = bytes((ResponseTypes["SNAP"],)) + INT32.pack(topic.topic_id) + bytes((len(name),)) + name
+        body += bytes((len(topic.values),)) + struct.pack(">%di" % len(topic.values), *topic.values)
+        strings = ((STRING_INDEX["NAME"], topic.name), (STRING_INDEX["SYMBOL"], topic.token),
+                   (STRING_INDEX["EXCHG"], topic.segment), (STRING_INDEX["TSYMBOL"], "SYM" + topic.token + "-EQ"))
+        body += bytes((len(strings),))
+        for fid, value in strings:
+            data = value.encode('latin-1')
+            body += bytes((fid, len(data))) + data
+        return UINT16.pack(len(body)) + body
+
+    def update_packet(self, topic, extra_fields=2):
+        """UPDATE with the hot fields of the feed type moved, sent up to the highest changed index"""
+        mapping, field_count, mul_index, prec_index = LAYOUTS[topic.feed_type]
+        changed = set(HOT_FIELDS[topic.feed_type])
+        for _ in range(extra_fields):
+            changed.add(self.random.randrange(field_count))
+        changed -= DERIVED_FIELDS | {mul_index, prec_index}
+        changed = {index for index in changed if mapping[index]}
+        count = max(changed) + 1
+        values = [TRASH_VAL] * count
+        for index in changed:
+            values[index] = self.field_value(mapping[index]["type"], topic.price)
+            topic.values[index] = values[index]
+        body = bytes((ResponseTypes["UPDATE"],)) + INT32.pack(topic.topic_id) + bytes((count,))
+        body += struct.pack(">%di" % count, *values)
+        return UINT16.pack(len(body)) + body
+
+    def data_frame(self, packets):
+        body = bytes((BinRespTypes["DATA_TYPE"],))
+        if self.ack_count > 0:
+            self.msg_num += 1
+            body += INT32.pack(self.msg_num)
+        body += UINT16.pack(len(packets)) + b"".join(packets)
+        return UINT16.pack(len(body)) + body
+
+    def snapshot_frames(self, topics, per_frame=50):
+        return [self.data_frame([self.snap_packet(topic) for topic in topics[start:start + per_frame]])
+                for start in range(0, len(topics), per_frame)]
+
+    def update_frames(self, topics, frame_count, min_packets=1, max_packets=40):
+        """DATA frames of UPDATE packets; the clock advances one second every 100 frames"""
+        frames = []
+        for number in range(frame_count):
+            self.now = self.base_time + number // 100
+            packets = [self.update_packet(self.random.choice(topics))
+                       for _ in range(self.random.randint(min_packets, max_packets))]
+            frames.append(self.data_frame(packets))
+        return frames
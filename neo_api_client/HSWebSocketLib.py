@@ -1,16 +1,23 @@
 import datetime
 import json
+import socket
 import ssl
+import struct
+from collections import deque
 
+import numpy as np
 import websocket
 
+from neo_api_client.reconnect import ReconnectManager
+
 # from neo_api_client.logger import logger
 
 isEncyptOut = False
 isEncyptIn = True
+# Set to True to decode DATA frames with the original slice/buf2long parser
+USE_LEGACY_PARSER = False
 
 MAX_SCRIPS = 100
-topic_list = {}
 counter = 0
 FieldTypes = {
     'FLOAT32': 1,
@@ -75,6 +82,14 @@ RespCodes = {
 }
 
 
+# Precompiled big-endian unpackers used by the memoryview frame decoder
+UINT16 = struct.Struct(">H")
+INT32 = struct.Struct(">i")
+UINT32 = struct.Struct(">I")
+UINT64 = struct.Struct(">Q")
+WIRE_INT32 = np.dtype(">i4")
+
+
 def DataType(c, d):
     return {"name": c, "type": d}
 
@@ -243,7 +258,7 @@ def leadingZero(a):
     return "0" + str(a) if a < 10 else str(a)
 
 
-def getFormatDate(a):
+def formatDate(a):
     date = datetime.datetime.fromtimestamp(a)
     formatDate = "{}/{}/{} {}:{}:{}".format(
         leadingZero(date.day),
@@ -256,10 +271,66 @@ def getFormatDate(a):
     return formatDate
 
 
+class DateFormatCache:
+    """
+    Memoizes formatDate for the last second seen and reuses the "dd/mm/yyyy hh:mm:" prefix of the
+    current minute, since most ticks in a burst carry the same or a nearby timestamp.
+    Each cache entry is one (key, text) tuple, so concurrent feed threads never see a torn pair.
+    """
+
+    def __init__(self):
+        self.last_second = (None, None)
+        self.last_minute = (None, None)
+
+    def format(self, a):
+        second, text = self.last_second
+        if a == second:
+            return text
+        minute_start = a - a % 60
+        minute, prefix = self.last_minute
+        if minute_start != minute:
+            date = datetime.datetime.fromtimestamp(minute_start)
+            if date.second:
+                # Local offset is not a whole number of minutes, the prefix cannot be shared
+                return formatDate(a)
+            prefix = "{}/{}/{} {}:{}:".format(
+                leadingZero(date.day),
+                leadingZero(date.month),
+                date.year,
+                leadingZero(date.hour),
+                leadingZero(date.minute)
+            )
+            self.last_minute = (minute_start, prefix)
+        text = prefix + leadingZero(a - minute_start)
+        self.last_second = (a, text)
+        return text
+
+
+date_format_cache = DateFormatCache()
+
+
+def getFormatDate(a):
+    return date_format_cache.format(a)
+
+
+class FeedTime(int):
+    """
+    Epoch seconds of a DATE field, emitted when lazy_dates is enabled.
+    Behaves as an int and is only formatted as "dd/mm/yyyy hh:mm:ss" when a consumer calls str() on it.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return getFormatDate(int(self))
+
+    def to_datetime(self):
+        return datetime.datetime.fromtimestamp(self)
+
+
 class ByteData:
     def __init__(self, c):
         self.pos = 0
-        self.bytes = [0] * (c)
+        self.bytes = bytearray(c)
         self.startOfMsg = 0
 
     def lenth(self):
@@ -272,8 +343,7 @@ class ByteData:
 
     def markEndOfMsg(self):
         len = (self.pos - self.startOfMsg - 2)
-        self.bytes[0] = ((len >> 8) & 255)
-        self.bytes[1] = (len & 255)
+        UINT16.pack_into(self.bytes, 0, len & 0xFFFF)
 
     def clear(self):
         self.pos = 0
@@ -285,11 +355,8 @@ class ByteData:
         return self.bytes
 
     def appendByte(self, d):
-        # print("in append Bytes POS", self.pos)
-        # print("in append Bytes d", d)
         self.bytes[self.pos] = d
         self.pos += 1
-        # print("in append Bytes", self.bytes)
 
     def appendByteAtPos(self, e, d):
         self.bytes[e] = d
@@ -302,68 +369,55 @@ class ByteData:
         self.bytes[e] = d
 
     def appendShort(self, d):
-        self.bytes[self.pos] = ((d >> 8) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = (d & 255)
-        self.pos += 1
+        UINT16.pack_into(self.bytes, self.pos, d & 0xFFFF)
+        self.pos += 2
 
     def appendInt(self, d):
-        self.bytes[self.pos] = ((d >> 24) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 16) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 8) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = (d & 255)
-        self.pos += 1
+        UINT32.pack_into(self.bytes, self.pos, d & 0xFFFFFFFF)
+        self.pos += 4
 
     def appendLong(self, d):
-        self.bytes[self.pos] = ((d >> 56) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 48) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 40) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 32) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 24) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 16) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = ((d >> 8) & 255)
-        self.pos += 1
-        self.bytes[self.pos] = (d & 255)
-        self.pos += 1
+        UINT64.pack_into(self.bytes, self.pos, d & 0xFFFFFFFFFFFFFFFF)
+        self.pos += 8
 
     def append_long_as_big_int(self, e):
-        d = int(e)
-        self.bytes.append((d >> 56) & 255)
-        self.bytes.append((d >> 48) & 255)
-        self.bytes.append((d >> 40) & 255)
-        self.bytes.append((d >> 32) & 255)
-        self.bytes.append((d >> 24) & 255)
-        self.bytes.append((d >> 16) & 255)
-        self.bytes.append((d >> 8) & 255)
-        self.bytes.append(d & 255)
+        self.appendLong(int(e))
 
     def append_string(self, d):
-        str_len = len(d)
-        for i in range(str_len):
-            self.bytes[self.pos] = ord(d[i])
-            self.pos += 1
-            # self.bytes.append(ord(d[i]))
+        data = d.encode('latin-1')
+        self.bytes[self.pos:self.pos + len(data)] = data
+        self.pos += len(data)
 
     def append_byte_array(self, d):
-        byte_len = len(d)
-        for i in range(byte_len):
-            self.bytes[self.pos] = d[i]
-            self.pos += 1
-            # self.bytes.append(d[i])
+        self.bytes[self.pos:self.pos + len(d)] = d
+        self.pos += len(d)
 
     def appendByteArr(self, e, d):
-        for i in range(d):
-            self.bytes[self.pos] = e[i]
-            self.pos += 1
+        self.bytes[self.pos:self.pos + d] = e[:d]
+        self.pos += d
+
+
+# Bits of the name, exchange and symbol fields, emitted with every prepared message
+COMMON_FIELDS_MASK = (1 << STRING_INDEX["NAME"]) | (1 << STRING_INDEX["EXCHG"]) | (1 << STRING_INDEX["SYMBOL"])
+
+
+DIRTY_INDICES_CACHE_SIZE = 4096
+dirty_indices_cache = {}
+
+
+def bit(index_val):
+    return 1 << index_val
+
+
+def getDirtyIndices(mask):
+    """Returns the set bit positions of mask in ascending order, memoized since ticks repeat the same fields"""
+    indices = dirty_indices_cache.get(mask)
+    if indices is None:
+        indices = tuple(i for i in range(mask.bit_length()) if mask >> i & 1)
+        if len(dirty_indices_cache) >= DIRTY_INDICES_CACHE_SIZE:
+            dirty_indices_cache.clear()
+        dirty_indices_cache[mask] = indices
+    return indices
 
 
 class TopicData:
@@ -377,7 +431,8 @@ class TopicData:
         self.precisionValue = 100
         self.jsonArray = None
         self.fieldDataArray = [None] * 100
-        self.updatedFieldsArray = [None] * 100
+        # Bitmask of the field indices changed since the last prepareData (bit n = field n)
+        self.updatedFields = 0
         self.fieldDataArray[STRING_INDEX["NAME"]] = feed_type
 
     def getKey(self):
@@ -386,12 +441,17 @@ class TopicData:
     def setLongValues(self, index_val, value):
         if self.fieldDataArray[index_val] != value and value != TRASH_VAL:
             self.fieldDataArray[index_val] = value
-            self.updatedFieldsArray[index_val] = True
+            self.updatedFields |= 1 << index_val
+
+    def isUpdated(self, index_val):
+        return self.updatedFields >> index_val & 1
+
+    def setDerivedValue(self, index_val, value):
+        self.fieldDataArray[index_val] = value
+        self.updatedFields |= 1 << index_val
 
     def prepareCommonData(self):
-        self.updatedFieldsArray[STRING_INDEX["NAME"]] = True
-        self.updatedFieldsArray[STRING_INDEX["EXCHG"]] = True
-        self.updatedFieldsArray[STRING_INDEX["SYMBOL"]] = True
+        self.updatedFields |= COMMON_FIELDS_MASK
 
     def setStringValues(self, e, d):
         if e == STRING_INDEX["SYMBOL"]:
@@ -403,42 +463,49 @@ class TopicData:
         elif e == STRING_INDEX["TSYMBOL"]:
             self.tSymbol = d
             self.fieldDataArray[STRING_INDEX["TSYMBOL"]] = d
-            self.updatedFieldsArray[STRING_INDEX["TSYMBOL"]] = True
+            self.updatedFields |= 1 << STRING_INDEX["TSYMBOL"]
 
 
 class DepthTopicData(TopicData):
     def __init__(self):
         # print("INSIDE DepthTopicData")
         super().__init__(TopicTypes["DEPTH"])
-        self.updatedFieldsArray = [None] * 100
         self.multiplier = None
         self.precision = None
         self.precisionValue = None
 
     def setMultiplierAndPrec(self):
         # print("INTO setMultiplierAndPrec")
-        if self.updatedFieldsArray[DEPTH_INDEX['PRECISION']]:
+        if self.isUpdated(DEPTH_INDEX['PRECISION']):
             self.precision = self.fieldDataArray[DEPTH_INDEX['PRECISION']]
             self.precisionValue = 10 ** self.precision
-        if self.updatedFieldsArray[DEPTH_INDEX['MULTIPLIER']]:
+        if self.isUpdated(DEPTH_INDEX['MULTIPLIER']):
             self.multiplier = self.fieldDataArray[DEPTH_INDEX['MULTIPLIER']]
 
-    def prepareData(self, type=None):
+    def prepareData(self, type=None, native=False, lazy_dates=False):
         # print("INSIDE prepareData")
         self.prepareCommonData()
         # print("\nDepth:", self.feedType, self.exchange, self.symbol)
         json_res = {}
-        for d in range(len(DEPTH_MAPPING)):
+        # Visit only the changed fields, lowest index first, as the full scan did
+        updated = getDirtyIndices(self.updatedFields)
+        self.updatedFields = 0
+        for d in updated:
+            if d >= len(DEPTH_MAPPING):
+                break
             c = DEPTH_MAPPING[d]
             e = self.fieldDataArray[d]
-            if self.updatedFieldsArray[d] and e is not None and c:
+            if e is not None and c:
                 if c["type"] == FieldTypes.get("FLOAT32"):
                     e = round(e / (self.multiplier * self.precisionValue), self.precision)
                 elif c["type"] == FieldTypes.get("DATE"):
-                    e = getFormatDate(e)
+                    if lazy_dates:
+                        json_res[c["name"]] = FeedTime(e)
+                        continue
+                    if not native:
+                        e = getFormatDate(e)
                 # print(d, ":", c["name"], ":", e)
-                json_res[c["name"]] = str(e)
-        self.updatedFieldsArray = [None] * 100
+                json_res[c["name"]] = e if native else str(e)
         # print("INSIDE Parse Data", json_res)
         if type is not None:
             json_res["request_type"] = type
@@ -511,28 +578,14 @@ def is_scrip_ok(a):
 def getScripByteArray(c, a):
     if c[-1] == "&":
         c = c[:-1]
-    scripArray = c.split("&")
-    scripsCount = len(scripArray)
-    dataLen = 0
-    for index in range(scripsCount):
-        scripArray[index] = a + "|" + scripArray[index]
-        dataLen += len(scripArray[index]) + 1
-    # print("Data len ", dataLen)
-    bytes = [0] * (dataLen + 2)
-    pos = 0
-    bytes[pos] = (scripsCount >> 8) & 255
-    pos += 1
-    bytes[pos] = scripsCount & 255
-    pos += 1
-    for index in range(scripsCount):
-        currScrip = scripArray[index]
-        scripLen = len(currScrip)
-        bytes[pos] = scripLen & 255
-        pos += 1
-        for strIndex in range(scripLen):
-            bytes[pos] = ord(currScrip[strIndex])
-            pos += 1
-    # print("Bytes ", bytes)
+    # Encode the whole scrip list once and split it as bytes instead of walking it char by char
+    scripArray = c.encode('latin-1').split(b"&")
+    prefix = (a + "|").encode('latin-1')
+    bytes = bytearray(UINT16.pack(len(scripArray) & 0xFFFF))
+    for scrip in scripArray:
+        bytes.append((len(prefix) + len(scrip)) & 255)
+        bytes += prefix
+        bytes += scrip
     return bytes
 
 
@@ -609,29 +662,7 @@ def prepareThrottlingIntervalRequest(a):
 
 
 def get_scrip_byte_array(c, a):
-    if c[-1] == "&":
-        c = c[:-1]
-    scrip_array = c.split("&")
-    scrips_count = len(scrip_array)
-    data_len = 0
-    for index in range(scrips_count):
-        scrip_array[index] = a + "|" + scrip_array[index]
-        data_len += len(scrip_array[index]) + 1
-    bytes = bytearray(data_len + 2)
-    pos = 0
-    bytes[pos] = (scrips_count >> 8) & 255
-    pos += 1
-    bytes[pos] = scrips_count & 255
-    pos += 1
-    for index in range(scrips_count):
-        curr_scrip = scrip_array[index]
-        scrip_len = len(curr_scrip)
-        bytes[pos] = scrip_len & 255
-        pos += 1
-        for str_index in range(scrip_len):
-            bytes[pos] = ord(curr_scrip[str_index])
-            pos += 1
-    return bytes
+    return getScripByteArray(c, a)
 
 
 def get_opc_chain_subs_request(d, e, a, c, f):
@@ -718,7 +749,6 @@ def buf2long(a):
 
 
 def buf2string(a):
-    import numpy as np
     return ''.join(map(chr, np.frombuffer(a, dtype=np.uint8)))
 
 
@@ -731,46 +761,52 @@ class ScripTopicData(TopicData):
         self.multiplier = None
 
     def setMultiplierAndPrec(self):
-        if self.updatedFieldsArray[SCRIP_INDEX["PRECISION"]]:
+        if self.isUpdated(SCRIP_INDEX["PRECISION"]):
             self.precision = self.fieldDataArray[SCRIP_INDEX["PRECISION"]]
             self.precisionValue = pow(10, self.precision)
-        if self.updatedFieldsArray[SCRIP_INDEX["MULTIPLIER"]]:
+        if self.isUpdated(SCRIP_INDEX["MULTIPLIER"]):
             self.multiplier = self.fieldDataArray[SCRIP_INDEX["MULTIPLIER"]]
 
-    def prepareData(self,type=None):
+    def prepareData(self, type=None, native=False, lazy_dates=False):
         self.prepareCommonData()
         #hardcoded formatting is removed and made it dynamic
         precesionFormat="{:."+str(self.precision)+"f}"
-        if self.updatedFieldsArray[SCRIP_INDEX["LTP"]] or self.updatedFieldsArray[SCRIP_INDEX["CLOSE"]]:
+        if self.updatedFields & (bit(SCRIP_INDEX["LTP"]) | bit(SCRIP_INDEX["CLOSE"])):
             ltp = self.fieldDataArray[SCRIP_INDEX["LTP"]]
             close = self.fieldDataArray[SCRIP_INDEX["CLOSE"]]
             if ltp is not None and close is not None:
                 change = ltp - close
-                self.fieldDataArray[SCRIP_INDEX["CHANGE"]] = change
-                self.updatedFieldsArray[SCRIP_INDEX["CHANGE"]] = True
-                self.fieldDataArray[SCRIP_INDEX["PERCHANGE"]] = precesionFormat.format((change / close * 100))
-                self.updatedFieldsArray[SCRIP_INDEX["PERCHANGE"]] = True
-        if self.updatedFieldsArray[SCRIP_INDEX["VOLUME"]] or self.updatedFieldsArray[SCRIP_INDEX["VWAP"]]:
+                self.setDerivedValue(SCRIP_INDEX["CHANGE"], change)
+                per_change = change / close * 100
+                self.setDerivedValue(SCRIP_INDEX["PERCHANGE"],
+                                     round(per_change, self.precision) if native else precesionFormat.format(per_change))
+        if self.updatedFields & (bit(SCRIP_INDEX["VOLUME"]) | bit(SCRIP_INDEX["VWAP"])):
             volume = self.fieldDataArray[SCRIP_INDEX["VOLUME"]]
             vwap = self.fieldDataArray[SCRIP_INDEX["VWAP"]]
             if volume is not None and vwap is not None:
-                self.fieldDataArray[SCRIP_INDEX["TURNOVER"]] = volume * vwap
-                self.updatedFieldsArray[SCRIP_INDEX["TURNOVER"]] = True
+                self.setDerivedValue(SCRIP_INDEX["TURNOVER"], volume * vwap)
         # print("\nScrip::" + self.feedType + "|" + self.exchange + "|" + self.symbol)
         jsonRes = {}
-        for index in range(len(SCRIP_MAPPING)):
+        updated = getDirtyIndices(self.updatedFields)
+        self.updatedFields = 0
+        for index in updated:
+            if index >= len(SCRIP_MAPPING):
+                break
             dataType = SCRIP_MAPPING[index]
             val = self.fieldDataArray[index]
-            if self.updatedFieldsArray[index] and val is not None and dataType:
+            if val is not None and dataType:
                 if dataType["type"] == FieldTypes["FLOAT32"]:
-                   
-                    val = precesionFormat.format(val / (self.multiplier * self.precisionValue))
+                    val = val / (self.multiplier * self.precisionValue)
+                    val = round(val, self.precision) if native else precesionFormat.format(val)
                     # val = "{:.4f}".format(val / (self.multiplier * self.precisionValue))
                 elif dataType["type"] == FieldTypes["DATE"]:
-                    val = getFormatDate(val)
+                    if lazy_dates:
+                        jsonRes[dataType["name"]] = FeedTime(val)
+                        continue
+                    if not native:
+                        val = getFormatDate(val)
                 # print(str(index) + ":" + dataType["name"] + ":" + str(val))
-                jsonRes[dataType["name"]] = str(val)
-        self.updatedFieldsArray = [None] * 100
+                jsonRes[dataType["name"]] = val if native else str(val)
         if type is not None:
             jsonRes["request_type"]=type
         
@@ -781,53 +817,214 @@ class IndexTopicData(TopicData):
     def __init__(self):
         # print("INSIDE IndexTopicData")
         super().__init__(TopicTypes["INDEX"])
-        self.updatedFieldsArray = [None] * 100
         self.multiplier = None
         self.precision = None
         self.precisionValue = None
 
     def setMultiplierAndPrec(self):
-        if self.updatedFieldsArray[INDEX_INDEX["PRECISION"]]:
+        if self.isUpdated(INDEX_INDEX["PRECISION"]):
             self.precision = self.fieldDataArray[INDEX_INDEX["PRECISION"]]
             self.precisionValue = 10 ** self.precision
-        if self.updatedFieldsArray[INDEX_INDEX["MULTIPLIER"]]:
+        if self.isUpdated(INDEX_INDEX["MULTIPLIER"]):
             self.multiplier = self.fieldDataArray[INDEX_INDEX["MULTIPLIER"]]
 
-    def prepareData(self, type=None):
+    def prepareData(self, type=None, native=False, lazy_dates=False):
         self.prepareCommonData()
-        if self.updatedFieldsArray[INDEX_INDEX["LTP"]] or self.updatedFieldsArray[INDEX_INDEX["CLOSE"]]:
+        if self.updatedFields & (bit(INDEX_INDEX["LTP"]) | bit(INDEX_INDEX["CLOSE"])):
             ltp = self.fieldDataArray[INDEX_INDEX["LTP"]]
             close = self.fieldDataArray[INDEX_INDEX["CLOSE"]]
             if ltp is not None and close is not None:
                 change = ltp - close
-                self.fieldDataArray[INDEX_INDEX["CHANGE"]] = change
-                self.updatedFieldsArray[INDEX_INDEX["CHANGE"]] = True
-                per_change = round(change / close * 100, self.precision)
-                self.fieldDataArray[INDEX_INDEX["PERCHANGE"]] = per_change
-                self.updatedFieldsArray[INDEX_INDEX["PERCHANGE"]] = True
+                self.setDerivedValue(INDEX_INDEX["CHANGE"], change)
+                self.setDerivedValue(INDEX_INDEX["PERCHANGE"], round(change / close * 100, self.precision))
         # print("\nIndex::" + self.feedType + "|" + self.exchange + "|" + self.symbol)
         json_res = {}
-        for index in range(len(INDEX_MAPPING)):
+        updated = getDirtyIndices(self.updatedFields)
+        self.updatedFields = 0
+        for index in updated:
+            if index >= len(INDEX_MAPPING):
+                break
             data_type = INDEX_MAPPING[index]
             val = self.fieldDataArray[index]
-            if self.updatedFieldsArray[index] and val is not None and data_type is not None:
+            if val is not None and data_type is not None:
                 if data_type["type"] == FieldTypes["FLOAT32"]:
                     val = round(val / (self.multiplier * self.precisionValue), self.precision)
                 elif data_type["type"] == FieldTypes["DATE"]:
-                    val = getFormatDate(val)
+                    if lazy_dates:
+                        json_res[data_type["name"]] = FeedTime(val)
+                        continue
+                    if not native:
+                        val = getFormatDate(val)
                 # print(str(index) + ":" + data_type["name"] + ":" + str(val))
-                json_res[data_type["name"]] = str(val)
-        self.updatedFieldsArray = [None] * 100
+                json_res[data_type["name"]] = val if native else str(val)
         if type is not None:
             json_res["request_type"] = type
 
         return json_res
 
 
-class HSWrapper:
+class TopicTable:
+    """
+    Topic state of one connection. TopicData objects live in a dense slot list addressed through the
+    server topic id; slots of unsubscribed topics are freed when the server acknowledges the
+    unsubscribe and are reused by the next snapshot.
+    """
+
     def __init__(self):
+        self.slots = []
+        self.names = []
+        self.slotOf = {}
+        self.idOf = {}
+        self.freeSlots = []
+        self.pendingUnsubs = deque()
+
+    def __len__(self):
+        return len(self.slotOf)
+
+    def get(self, topicId):
+        slot = self.slotOf.get(topicId)
+        return None if slot is None else self.slots[slot]
+
+    def put(self, topicId, topicName, d):
+        slot = self.slotOf.get(topicId)
+        if slot is None:
+            if topicName in self.idOf:
+                # The server assigned a new id to a topic it already sent a snapshot for
+                self.remove(self.idOf[topicName])
+            if self.freeSlots:
+                slot = self.freeSlots.pop()
+            else:
+                slot = len(self.slots)
+                self.slots.append(None)
+                self.names.append(None)
+            self.slotOf[topicId] = slot
+        elif self.names[slot] != topicName and self.idOf.get(self.names[slot]) == topicId:
+            del self.idOf[self.names[slot]]
+        self.slots[slot] = d
+        self.names[slot] = topicName
+        self.idOf[topicName] = topicId
+
+    def remove(self, topicId):
+        slot = self.slotOf.pop(topicId, None)
+        if slot is None:
+            return
+        if self.idOf.get(self.names[slot]) == topicId:
+            del self.idOf[self.names[slot]]
+        self.slots[slot] = None
+        self.names[slot] = None
+        self.freeSlots.append(slot)
+
+    def clear(self):
+        self.__init__()
+
+    def queueUnsubscribe(self, scrips, prefix):
+        """Remembers the topics of an unsubscribe request until the server acknowledges it"""
+        if scrips[-1] == "&":
+            scrips = scrips[:-1]
+        self.pendingUnsubs.append([prefix + "|" + scrip for scrip in scrips.split("&")])
+
+    def onUnsubscribeAck(self, ok):
+        if not self.pendingUnsubs:
+            return
+        names = self.pendingUnsubs.popleft()
+        if ok:
+            for name in names:
+                topicId = self.idOf.get(name)
+                if topicId is not None:
+                    self.remove(topicId)
+
+
+# Row of each feed type in the columnar lookup tables below
+FEED_TYPE_CODES = {
+    TopicTypes["SCRIP"]: 0,
+    TopicTypes["INDEX"]: 1,
+    TopicTypes["DEPTH"]: 2
+}
+MUL_PREC_INDEX = {
+    TopicTypes["SCRIP"]: (SCRIP_INDEX["MULTIPLIER"], SCRIP_INDEX["PRECISION"]),
+    TopicTypes["INDEX"]: (INDEX_INDEX["MULTIPLIER"], INDEX_INDEX["PRECISION"]),
+    TopicTypes["DEPTH"]: (DEPTH_INDEX["MULTIPLIER"], DEPTH_INDEX["PRECISION"])
+}
+
+
+def columnarFieldNames(mapping, feed_type):
+    names = [c["name"] if c else None for c in mapping[:100]]
+    names += [None] * (100 - len(names))
+    names[MUL_PREC_INDEX[feed_type][0]] = "mul"
+    return names
+
+
+COLUMNAR_FIELD_NAMES = [None] * len(FEED_TYPE_CODES)
+COLUMNAR_FIELD_NAMES[FEED_TYPE_CODES[TopicTypes["SCRIP"]]] = columnarFieldNames(SCRIP_MAPPING, TopicTypes["SCRIP"])
+COLUMNAR_FIELD_NAMES[FEED_TYPE_CODES[TopicTypes["INDEX"]]] = columnarFieldNames(INDEX_MAPPING, TopicTypes["INDEX"])
+COLUMNAR_FIELD_NAMES[FEED_TYPE_CODES[TopicTypes["DEPTH"]]] = columnarFieldNames(DEPTH_MAPPING, TopicTypes["DEPTH"])
+# True where a wire field is a FLOAT32 price that has to be divided by multiplier * 10^precision
+COLUMNAR_FLOAT_FIELDS = np.array([[c is not None and c != "mul" and mapping[i]["type"] == FieldTypes["FLOAT32"]
+                                   for i, c in enumerate(names)]
+                                  for names, mapping in zip(COLUMNAR_FIELD_NAMES,
+                                                            (SCRIP_MAPPING, INDEX_MAPPING, DEPTH_MAPPING))])
+
+
+class FeedBatch:
+    """
+    Columnar result of one DATA frame, returned by HSWrapper when columnar_output is enabled.
+
+    Row i says field field_ids[i] of topic topic_ids[i] now holds values[i]. FLOAT32 fields are already divided
+    by the topic multiplier and precision (not rounded), LONG and DATE fields are raw, dates in epoch seconds.
+    Fields the server left empty are dropped and the derived change, percentage change and turnover fields are
+    not computed.
+    feed_codes[i] is the FEED_TYPE_CODES row of the topic, topics maps each topic id to its TopicData
+    (exchange, symbol, tSymbol) and snapshot_ids holds the topics whose rows come from a SNAP packet.
+    """
+    __slots__ = ("topic_ids", "field_ids", "feed_codes", "values", "topics", "snapshot_ids")
+
+    def __init__(self, topic_ids, field_ids, feed_codes, values, topics, snapshot_ids):
+        self.topic_ids = topic_ids
+        self.field_ids = field_ids
+        self.feed_codes = feed_codes
+        self.values = values
+        self.topics = topics
+        self.snapshot_ids = snapshot_ids
+
+    def __len__(self):
+        return len(self.values)
+
+    def fieldName(self, row):
+        return COLUMNAR_FIELD_NAMES[self.feed_codes[row]][self.field_ids[row]]
+
+    def tokens(self):
+        """(exchange, symbol) of every topic in the batch"""
+        return {topic_id: (d.exchange, d.symbol) for topic_id, d in self.topics.items()}
+
+    def select(self, topic_ids):
+        """New FeedBatch holding only the rows of the given topic ids"""
+        keep = set(topic_ids)
+        mask = np.isin(self.topic_ids, list(keep))
+        return FeedBatch(self.topic_ids[mask], self.field_ids[mask], self.feed_codes[mask], self.values[mask],
+                         {topic_id: d for topic_id, d in self.topics.items() if topic_id in keep},
+                         [topic_id for topic_id in self.snapshot_ids if topic_id in keep])
+
+
+EMPTY_INT32 = np.empty(0, dtype=np.int32)
+
+
+class HSWrapper:
+    def __init__(self, legacy_parser=None, native_output=False, lazy_dates=False, ws=None, columnar_output=False):
         self.counter = 0
         self.ack_num = 0
+        # Return one FeedBatch of NumPy columns per DATA frame instead of a list of dicts; this is the vectorized
+        # decoder, converting all UPDATE field blocks of a frame with one np.frombuffer
+        self.columnar_output = columnar_output
+        # Socket used to acknowledge DATA frames, owned by the StartServer of this connection
+        self.ws = ws
+        self.topics = TopicTable()
+        # UPDATE packets for topics without a snapshot on this connection, which are dropped
+        self.dropped_updates = 0
+        # Emit floats/ints (epoch ints for dates) instead of formatted strings
+        self.native_output = native_output
+        # Emit DATE fields as FeedTime epoch ints that are formatted only on str()
+        self.lazy_dates = lazy_dates
+        self.use_legacy_parser = USE_LEGACY_PARSER if legacy_parser is None else legacy_parser
 
     def getNewTopicData(self, c):
         # print("INPUT ", c)
@@ -855,7 +1052,197 @@ class HSWrapper:
             d += field_length
         return status
 
+    def reset(self):
+        """Forgets the topics and ack count of the previous connection"""
+        self.topics.clear()
+        self.counter = 0
+        self.ack_num = 0
+
     def parseData(self, e):
+        if len(e) > 2 and e[2] == BinRespTypes["DATA_TYPE"]:
+            if self.columnar_output:
+                return self.parseDataFrameColumnar(memoryview(e))
+            if not self.use_legacy_parser:
+                return self.parseDataFrame(memoryview(e))
+        return self.parseDataLegacy(e)
+
+    def acknowledge(self, e, pos):
+        """Reads the message number of a DATA frame and acks every ack_num-th frame; returns the new offset"""
+        if self.ack_num > 0:
+            self.counter += 1
+            msg_num = INT32.unpack_from(e, pos)[0]
+            pos += 4
+            if self.counter == self.ack_num:
+                req = get_acknowledgement_req(msg_num)
+                if self.ws:
+                    self.ws.send(req, 0x2)
+                    self.counter = 0
+        return pos
+
+    def parseDataFrame(self, e):
+        """
+        Decodes a DATA frame by walking a single memoryview with an offset cursor.
+        Produces the same output as parseDataLegacy without allocating a slice per field.
+        """
+        pos = self.acknowledge(e, 3)
+        topics = self.topics
+        slot_of, slots = topics.slotOf, topics.slots
+        h = []
+        packets_count = UINT16.unpack_from(e, pos)[0]
+        pos += 2
+        for _ in range(packets_count):
+            pos += 2
+            resp_type = e[pos]
+            pos += 1
+            if resp_type == ResponseTypes["SNAP"]:
+                topic_id = INT32.unpack_from(e, pos)[0]
+                pos += 4
+                name_len = e[pos]
+                pos += 1
+                topic_name = str(e[pos:pos + name_len], 'latin-1')
+                pos += name_len
+                d = self.getNewTopicData(topic_name)
+                fcount = e[pos]
+                pos += 1
+                end = pos + 4 * fcount
+                if d:
+                    topics.put(topic_id, topic_name, d)
+                    index = 0
+                    for fvalue, in INT32.iter_unpack(e[pos:end]):
+                        d.setLongValues(index, fvalue)
+                        index += 1
+                    d.setMultiplierAndPrec()
+                pos = end
+                fcount = e[pos]
+                pos += 1
+                for _ in range(fcount):
+                    fid = e[pos]
+                    data_len = e[pos + 1]
+                    pos += 2
+                    if d:
+                        d.setStringValues(fid, str(e[pos:pos + data_len], 'latin-1'))
+                    pos += data_len
+                if d:
+                    h.append(d.prepareData("SNAP", self.native_output, self.lazy_dates))
+                else:
+                    print("Invalid topic feed type !")
+            elif resp_type == ResponseTypes["UPDATE"]:
+                topic_id = INT32.unpack_from(e, pos)[0]
+                pos += 4
+                fcount = e[pos]
+                pos += 1
+                end = pos + 4 * fcount
+                slot = slot_of.get(topic_id)
+                d = slots[slot] if slot is not None else None
+                if not d:
+                    self.dropped_updates += 1
+                    print("Topic Not Available in TopicList!")
+                else:
+                    index = 0
+                    for fvalue, in INT32.iter_unpack(e[pos:end]):
+                        d.setLongValues(index, fvalue)
+                        index += 1
+                    h.append(d.prepareData("SUB", self.native_output, self.lazy_dates))
+                pos = end
+            else:
+                print("Invalid ResponseType: " + str(resp_type))
+                break
+        return h
+
+    def parseDataFrameColumnar(self, e):
+        """
+        Decodes a DATA frame into a FeedBatch. Snapshots still go through TopicData for the multiplier,
+        precision and symbol; UPDATE field blocks are only collected and converted with NumPy once per frame.
+        """
+        pos = self.acknowledge(e, 3)
+        topics = self.topics
+        blocks, topic_ids, counts, feed_codes, divisors = [], [], [], [], []
+        batch_topics = {}
+        snapshot_ids = []
+        packets_count = UINT16.unpack_from(e, pos)[0]
+        pos += 2
+        for _ in range(packets_count):
+            pos += 2
+            resp_type = e[pos]
+            pos += 1
+            if resp_type == ResponseTypes["SNAP"]:
+                topic_id = INT32.unpack_from(e, pos)[0]
+                pos += 4
+                name_len = e[pos]
+                pos += 1
+                topic_name = str(e[pos:pos + name_len], 'latin-1')
+                pos += name_len
+                d = self.getNewTopicData(topic_name)
+                fcount = e[pos]
+                pos += 1
+                start, end = pos, pos + 4 * fcount
+                if d:
+                    topics.put(topic_id, topic_name, d)
+                    index = 0
+                    for fvalue, in INT32.iter_unpack(e[pos:end]):
+                        d.setLongValues(index, fvalue)
+                        index += 1
+                    d.setMultiplierAndPrec()
+                pos = end
+                fcount2 = e[pos]
+                pos += 1
+                for _ in range(fcount2):
+                    fid = e[pos]
+                    data_len = e[pos + 1]
+                    pos += 2
+                    if d:
+                        d.setStringValues(fid, str(e[pos:pos + data_len], 'latin-1'))
+                    pos += data_len
+                if not d:
+                    print("Invalid topic feed type !")
+                    continue
+                d.updatedFields = 0
+                snapshot_ids.append(topic_id)
+            elif resp_type == ResponseTypes["UPDATE"]:
+                topic_id = INT32.unpack_from(e, pos)[0]
+                pos += 4
+                fcount = e[pos]
+                pos += 1
+                start, end = pos, pos + 4 * fcount
+                pos = end
+                d = topics.get(topic_id)
+                if not d:
+                    self.dropped_updates += 1
+                    print("Topic Not Available in TopicList!")
+                    continue
+                mul_index, prec_index = MUL_PREC_INDEX[d.feedType]
+                if fcount > mul_index or fcount > prec_index:
+                    for index in (mul_index, prec_index):
+                        if index < fcount:
+                            d.setLongValues(index, INT32.unpack_from(e, start + 4 * index)[0])
+                    d.setMultiplierAndPrec()
+                    d.updatedFields = 0
+            else:
+                print("Invalid ResponseType: " + str(resp_type))
+                break
+            blocks.append(e[start:end])
+            topic_ids.append(topic_id)
+            counts.append(fcount)
+            feed_codes.append(FEED_TYPE_CODES[d.feedType])
+            divisors.append((d.multiplier or 1) * (d.precisionValue or 1))
+            batch_topics[topic_id] = d
+        if not blocks:
+            return FeedBatch(EMPTY_INT32, EMPTY_INT32, EMPTY_INT32, np.empty(0), batch_topics, snapshot_ids)
+        raw = np.frombuffer(b"".join(blocks), dtype=WIRE_INT32)
+        counts = np.array(counts, dtype=np.int32)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        field_rows = np.arange(len(raw), dtype=np.int32) - starts
+        code_rows = np.repeat(np.array(feed_codes, dtype=np.int32), counts)
+        keep = raw != TRASH_VAL
+        field_rows = field_rows[keep]
+        code_rows = code_rows[keep]
+        values = raw[keep].astype(np.float64)
+        is_float = COLUMNAR_FLOAT_FIELDS[code_rows, field_rows]
+        values[is_float] /= np.repeat(np.array(divisors, dtype=np.float64), counts)[keep][is_float]
+        return FeedBatch(np.repeat(np.array(topic_ids, dtype=np.int32), counts)[keep], field_rows, code_rows,
+                         values, batch_topics, snapshot_ids)
+
+    def parseDataLegacy(self, e):
         pos = 0
         # print("INTO Parse Data", e)
         packetsCount = buf2long(e[pos:2])
@@ -928,8 +1315,8 @@ class HSWrapper:
                     pos += 4
                     if self.counter == self.ack_num:
                         req = get_acknowledgement_req(msg_num)
-                        if ws:
-                            ws.send(req, 0x2)
+                        if self.ws:
+                            self.ws.send(req, 0x2)
                             self.counter = 0
                         # print("Acknowledgement sent for message num:", msg_num)
                 h = []
@@ -952,7 +1339,7 @@ class HSWrapper:
                         pos += name_len
                         d = self.getNewTopicData(topic_name)
                         if d:
-                            topic_list[f] = d
+                            self.topics.put(f, topic_name, d)
                             fcount = buf2long(e[pos: pos + 1])
                             pos += 1
                             for index in range(fcount):
@@ -974,7 +1361,7 @@ class HSWrapper:
                                 d.setStringValues(fid, str_val)
                                 # print(fid, ":", str_val)
                                 # print("index:", index, "fid:",fid, "val:", str_val)
-                            h.append(d.prepareData("SNAP"))
+                            h.append(d.prepareData("SNAP", self.native_output, self.lazy_dates))
                         else:
                             print("Invalid topic feed type !")
                     else:
@@ -983,9 +1370,11 @@ class HSWrapper:
                             f = buf2long(e[pos: pos + 4])
                             # print("topic Id:", f)
                             pos += 4
-                            d = topic_list[f]
+                            d = self.topics.get(f)
                             if not d:
+                                self.dropped_updates += 1
                                 print("Topic Not Available in TopicList!")
+                                pos += 1 + 4 * buf2long(e[pos:pos + 1])
                             else:
                                 # print("INSIDE Else COndition ")
                                 fcount = buf2long(e[pos:pos + 1])
@@ -997,7 +1386,7 @@ class HSWrapper:
                                     # d[index] = fvalue
                                     # print("index:", index, "val:", fvalue)
                                     pos += 4
-                            h.append(d.prepareData("SUB"))
+                                h.append(d.prepareData("SUB", self.native_output, self.lazy_dates))
                         else:
                             print("Invalid ResponseType: " + c)
                 # print("Final resoonse ",h)
@@ -1006,6 +1395,8 @@ class HSWrapper:
                 if type == BinRespTypes.get("SUBSCRIBE_TYPE") or type == BinRespTypes.get("UNSUBSCRIBE_TYPE"):
                     # print("INTO SUBScirbe Condition")
                     status = self.getStatus(e, pos)
+                    if type == BinRespTypes.get("UNSUBSCRIBE_TYPE"):
+                        self.topics.onUnsubscribeAck(status == BinRespStat.get("OK"))
                     json_res = {}
                     if status == BinRespStat.get("OK"):
                         json_res["stat"] = STAT.get("OK")
@@ -1100,40 +1491,76 @@ class HSWrapper:
 
 
 class StartServer:
-    def __init__(self, a, token, sid, onopen, onmessage, onerror, onclose):
+    def __init__(self, a, token, sid, onopen, onmessage, onerror, onclose, native_output=False, lazy_dates=False,
+                 columnar_output=False, reconnect=None, onpong=None):
         self.userSocket = self
         self.a = a
         self.onopen = onopen
         self.onmessage = onmessage
         self.onerror = onerror
         self.onclose = onclose
+        self.onpong = onpong
         self.token, self.sid = token, sid
-        global ws
+        self.ws = None
+        self.hsWrapper = None
+        self.reconnect = reconnect if reconnect is not None else ReconnectManager()
+        self.closed = False
         try:
             # websocket.enableTrace(True)
-            ws = websocket.WebSocketApp(a,
-                                        on_open=self.on_open,
-                                        on_message=self.on_message,
-                                        on_error=self.on_error,
-                                        on_close=self.on_close)
+            self.ws = websocket.WebSocketApp(a,
+                                             on_open=self.on_open,
+                                             on_message=self.on_message,
+                                             on_error=self.on_error,
+                                             on_close=self.on_close,
+                                             on_pong=self.on_pong)
         except Exception:
             print("WebSocket not supported!")
 
-        if ws:
+        if self.ws:
             # print("WS is a array buffer ")
-            self.hsWrapper = HSWrapper()
+            self.hsWrapper = HSWrapper(native_output=native_output, lazy_dates=lazy_dates, ws=self.ws,
+                                       columnar_output=columnar_output)
             # print("HS WRAPPER IS DONE ")
         else:
             print("WebSocket not initialized!")
 
-        ws.run_forever(ping_interval=0, reconnect=5,sslopt={"cert_reqs": ssl.CERT_NONE})
+    def run(self):
+        # Each pass of the loop is one connection; the reconnect manager decides when and whether to retry
+        if self.ws:
+            self.reconnect.start()
+            while not self.closed:
+                self.ws.run_forever(ping_interval=0, sslopt={"cert_reqs": ssl.CERT_NONE})
+                self.reconnect.on_disconnected()
+                if self.closed or not self.reconnect.wait():
+                    break
+
+    def stop(self):
+        self.closed = True
+        self.reconnect.stop()
+
+    def ping(self):
+        if self.ws and self.ws.sock and self.ws.sock.connected:
+            self.ws.sock.ping()
+
+    def drop(self):
+        # Shuts the socket down without a closing handshake, so run() goes on to reconnect
+        if self.ws:
+            shutdown_socket(self.ws)
+
+    def on_pong(self, ws, data):
+        if self.onpong:
+            self.onpong()
 
     def on_open(self, ws):
         # print("[OnOpen]: Function is running in HSWebscoket")
+        # Topic ids and snapshots belong to the previous connection; UPDATEs wait for the new SNAPs
+        self.hsWrapper.reset()
         self.onopen()
 
     def on_message(self, ws, inData):
         # print("[OnMessage]: Function is running in HSWebsocket")
+        if not self.reconnect.connected:
+            self.reconnect.on_connected()
         outData = None
         if isinstance(inData, bytes):
             jsonData = self.hsWrapper.parseData(inData)
@@ -1151,13 +1578,29 @@ class StartServer:
             self.onclose()
 
     def on_error(self, ws, error):
+        self.reconnect.last_error = error
         self.onerror(error)
         # print('ERROR in HSWebscoket', error)
 
 
+def shutdown_socket(app):
+    # shutdown() rather than close(), which would not wake the thread waiting in run_forever
+    raw = app.sock.sock if app.sock else None
+    if raw:
+        try:
+            raw.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
 SCRIP_PREFIX = "sf"
 INDEX_PREFIX = "if"
 DEPTH_PREFIX = "dp"
+UNSUBS_PREFIX = {
+    ReqTypeValues.get("SCRIP_UNSUBS"): SCRIP_PREFIX,
+    ReqTypeValues.get("INDEX_UNSUBS"): INDEX_PREFIX,
+    ReqTypeValues.get("DEPTH_UNSUBS"): DEPTH_PREFIX
+}
 
 
 def convert_to_dict(scrips=None, channelnum=None):
@@ -1170,36 +1613,62 @@ class HSWebSocket:
     OPEN = 0
     readyState = 0
 
-    def __init__(self):
+    def __init__(self, native_output=False, lazy_dates=False, columnar_output=False, reconnect=None):
         self.onclose = None
         self.url = None
         self.onopen = None
         self.onmessage = None
         self.on_error = None
+        self.native_output = native_output
+        self.lazy_dates = lazy_dates
+        self.columnar_output = columnar_output
+        self.reconnect = reconnect
+        self.server = None
 
-    def open_connection(self, url, token, sid, on_open, on_message, on_error, on_close):
+    def open_connection(self, url, token, sid, on_open, on_message, on_error, on_close, on_pong=None):
         self.url = url
         self.onopen = on_open
         self.onmessage = on_message
         self.on_error = on_error
         self.onclose = on_close
-        StartServer(self.url, token, sid, self.onopen, self.onmessage, self.on_error, self.onclose)
+        self.server = StartServer(self.url, token, sid, self.onopen, self.onmessage, self.on_error, self.onclose,
+                                  native_output=self.native_output, lazy_dates=self.lazy_dates,
+                                  columnar_output=self.columnar_output, reconnect=self.reconnect, onpong=on_pong)
+        self.server.run()
+
+    def ping(self):
+        if self.server:
+            self.server.ping()
+
+    def drop(self):
+        """Abandons the current connection (e.g. when it went quiet); it is reconnected like a dropped one"""
+        if self.server:
+            self.server.drop()
 
     def hs_send(self, d):
         req_json = json.loads(d)
         req_type = req_json[Keys.get("TYPE")]
         # print("Req Type", req_type)
-        req = {}
         if Keys.get("SCRIPS") in req_json:
             scrips = req_json[Keys.get("SCRIPS")]
             # print("scrips ", scrips)
             channelnum = req_json[Keys.get("CHANNEL_NUM")]
             # print("CHANNEL NUM ", channelnum)
+        elif Keys.get("CHANNEL_NUMS") in req_json:
+            scrips = None
+            channelnum = req_json[Keys.get("CHANNEL_NUMS")]
         else:
             scrips = None
             channelnum = 1
         # scrips = None
         # channelnum = req_json[Keys.get("CHANNEL_NUM")]
+        self.send_request(req_type, scrips, channelnum, req_json)
+
+    def send_request(self, req_type, scrips=None, channelnum=1, req_json=None):
+        """hs_send without the JSON round trip, for callers that already hold the request fields"""
+        if req_json is None:
+            req_json = {}
+        req = {}
         if req_type == ReqTypeValues.get("CONNECTION"):
             if Keys.get("USER_ID") in req_json:
                 user = req_json[Keys.get("USER_ID")]
@@ -1243,26 +1712,32 @@ class HSWebSocket:
         elif req_type == ReqTypeValues.get("SNAP_IF"):
             req = prepareSnapshotRequest(scrips, BinRespTypes.get("SNAPSHOT"), INDEX_PREFIX)
         elif req_type == ReqTypeValues.get("OPC_SUBS"):
-            req = get_opc_chain_subs_request(req[Keys.get("OPC_KEY")], req[Keys.get("STK_PRC")],
-                                             req[Keys.get("HIGH_STK")],
-                                             req[Keys.get("LOW_STK")], channelnum)
+            req = get_opc_chain_subs_request(req_json[Keys.get("OPC_KEY")], req_json[Keys.get("STK_PRC")],
+                                             req_json[Keys.get("HIGH_STK")],
+                                             req_json[Keys.get("LOW_STK")], channelnum)
         elif req_type == ReqTypeValues.get("THROTTLING_INTERVAL"):
             req = prepareThrottlingIntervalRequest(scrips)
         elif req_type == ReqTypeValues.get("LOG"):
-            enable_log(req.get('enable'))
+            enable_log(req_json.get('enable'))
+        ws = self.server.ws if self.server else None
         if ws and req:
+            if req_type in UNSUBS_PREFIX:
+                self.server.hsWrapper.topics.queueUnsubscribe(scrips, UNSUBS_PREFIX[req_type])
             ws.send(req, 0x2)
         else:
             print("Unable to send request !, Reason: Connection faulty or request not valid !")
 
     def close(self):
-        ws.close()
+        if self.server:
+            self.server.stop()
+        if self.server and self.server.ws:
+            self.server.ws.close()
         if self.onclose:
             self.onclose()
 
 
 class StartHSIServer:
-    def __init__(self, url, onopen, onmessage, onerror, onclose):
+    def __init__(self, url, onopen, onmessage, onerror, onclose, onpong=None):
         self.OPEN = None
         self.readyState = None
         self.url = url
@@ -1270,6 +1745,7 @@ class StartHSIServer:
         self.onmessage = onmessage
         self.onerror = onerror
         self.onclose = onclose
+        self.onpong = onpong
         # self.token, self.sid = token, sid
         global hsiWs
         try:
@@ -1278,7 +1754,8 @@ class StartHSIServer:
                                            on_open=self.on_open,
                                            on_message=self.on_message,
                                            on_error=self.on_error,
-                                           on_close=self.on_close)
+                                           on_close=self.on_close,
+                                           on_pong=self.on_pong)
             hsiWs.run_forever(ping_interval=5,reconnect=5,sslopt={"cert_reqs": ssl.CERT_NONE})
         except Exception:
             print("WebSocket not supported!")
@@ -1292,6 +1769,10 @@ class StartHSIServer:
         print("Error:", error)
         self.onerror(error)
 
+    def on_pong(self, ws, data):
+        if self.onpong:
+            self.onpong()
+
     def on_close(self, ws, close_status_code, close_msg):
         # print("Connection closed")
         self.OPEN = 0
@@ -1321,13 +1802,13 @@ class HSIWebSocket:
         self.onerror = None
         # self.token, self.sid = token, sid
 
-    def open_connection(self, url, onopen, onmessage, onclose, onerror):
+    def open_connection(self, url, onopen, onmessage, onclose, onerror, onpong=None):
         self.url = url
         self.onopen = onopen
         self.onmessage = onmessage
         self.onclose = onclose
         self.onerror = onerror
-        StartHSIServer(self.url, self.onopen, self.onmessage, self.onerror, self.onclose)
+        StartHSIServer(self.url, self.onopen, self.onmessage, self.onerror, self.onclose, onpong=onpong)
 
     def send(self, d):
         reqJson = json.loads(d)
@@ -1363,12 +1844,20 @@ class HSIWebSocket:
                 req = self.reqData
             else:
                 print("Invalid Request !")
-        if hsiWs and req:
-            js_obj = json.dumps(req)
-            js_obj = str(js_obj).replace('"', '').replace(' ', '')
-            hsiWs.send(js_obj)
-        else:
-            print("Unable to send request! Reason: Connection faulty or request not valid!")
+        if req and self.transmit(str(json.dumps(req)).replace('"', '').replace(' ', '')):
+            return
+        print("Unable to send request! Reason: Connection faulty or request not valid!")
+
+    def transmit(self, js_obj):
+        if not hsiWs:
+            return False
+        hsiWs.send(js_obj)
+        return True
+
+    def drop(self):
+        # run_forever(reconnect=...) opens the connection again after the socket fails
+        if hsiWs:
+            shutdown_socket(hsiWs)
 
     def close(self):
         self.OPEN = 0
@@ -1,9 +1,14 @@
+import concurrent.futures
 import copy
 import json
 import threading
-import time
 
 import neo_api_client
+from neo_api_client import heartbeat
+from neo_api_client.HSWebSocketLib import FeedBatch, MAX_SCRIPS
+from neo_api_client.reconnect import ReconnectManager
+from neo_api_client.snapshot_requests import PendingSnapshots
+from neo_api_client.subscription_registry import SubscriptionRegistry
 from neo_api_client.settings import stock_key_mapping, MarketDepthResp, QuotesChannel, \
     ReqTypeValues, index_key_mapping
 from neo_api_client.urls import ORDER_FEED_URL, ORDER_FEED_URL_ADC, \
@@ -12,9 +17,16 @@ from neo_api_client.urls import ORDER_FEED_URL, ORDER_FEED_URL_ADC, \
 
 # from neo_api_client.logger import logger
 
+UNSUBSCRIPTION_TYPES = {
+    ReqTypeValues.get("SCRIP_SUBS"): ReqTypeValues.get("SCRIP_UNSUBS"),
+    ReqTypeValues.get("INDEX_SUBS"): ReqTypeValues.get("INDEX_UNSUBS"),
+    ReqTypeValues.get("DEPTH_SUBS"): ReqTypeValues.get("DEPTH_UNSUBS")
+}
+
 
 class NeoWebSocket:
-    def __init__(self, sid, token, server_id, data_center):
+    def __init__(self, sid, token, server_id, data_center, native_output=False, lazy_dates=False,
+                 columnar_output=False):
         self.hsiWebsocket = None
         self.is_hsi_open = 0
         self.un_sub_token = False
@@ -22,13 +34,13 @@ class NeoWebSocket:
         self.access_token = token
         self.server_id = server_id
         self.is_hsw_open = 0
-        self.quotes_arr = []
-        self.sub_list = []
+        self.snapshots = PendingSnapshots()
+        self.snapshot_queue = []
+        self.subscriptions = SubscriptionRegistry()
         self.un_sub_list = []
-        self.un_sub_channel_token = {}
+        self.pending_unsubs = 0
         # self.quotes_api_callback = None
         self.hsWebsocket = None
-        self.channel_tokens = {}
         self.live_scrip_type = None
         self.on_message = None
         self.on_error = None
@@ -36,29 +48,67 @@ class NeoWebSocket:
         self.on_open = None
         self.quotes_index = None
         self.un_sub_list_count = 0
-        self.un_sub_channel = None
         self.token_limit_reached = False
         self.hsw_thread = None
         self.hsi_thread = None
         self.data_center = data_center
+        self.native_output = native_output
+        self.lazy_dates = lazy_dates
+        self.columnar_output = columnar_output
+        self.reconnect = ReconnectManager()
+        self.reconnects_reported = 0
+        self.heartbeats = heartbeat.scheduler
+        self.hsm_heartbeat_key = (id(self), "hsm")
+        self.hsi_heartbeat_key = (id(self), "hsi")
+        self.hsm_heartbeat_interval = 29
+        self.hsi_heartbeat_interval = 30
+        # Seconds without a message or pong before a connection is given up and reopened
+        self.stale_timeout = 90
+
+    @property
+    def sub_list(self):
+        return self.subscriptions.values()
+
+    @property
+    def channel_tokens(self):
+        return self.subscriptions.channel_entries()
+
+    def start_hsm_heartbeat(self):
+        # The live feed has no heartbeat request, so its connection is kept alive with websocket pings
+        self.heartbeats.schedule(self.hsm_heartbeat_key, self.hsm_heartbeat_interval, self.hsWebsocket.ping,
+                                 self.stale_timeout, self.on_hsm_stale)
+
+    def start_hsi_heartbeat(self):
+        self.heartbeats.schedule(self.hsi_heartbeat_key, self.hsi_heartbeat_interval, self.send_hsi_heartbeat,
+                                 self.stale_timeout, self.on_hsi_stale)
+
+    def send_hsi_heartbeat(self):
+        self.hsiWebsocket.send(json.dumps({"type": "HB"}))
+
+    def on_hsm_pong(self):
+        self.heartbeats.touch(self.hsm_heartbeat_key)
+
+    def on_hsi_pong(self):
+        self.heartbeats.touch(self.hsi_heartbeat_key)
+
+    def on_hsm_stale(self):
+        self.on_hsm_error(TimeoutError("No message on the live feed for %d seconds" % self.stale_timeout))
+        if self.hsWebsocket:
+            self.hsWebsocket.drop()
 
-    def start_hsi_ping_thread(self):
-        while self.hsiWebsocket and self.is_hsi_open:
-            time.sleep(30)
-            payload = {"type": "HB"}
-            self.hsiWebsocket.send(json.dumps(payload))
-
-    def start_hsm_ping_thread(self):
-        while self.hsWebsocket and self.is_hsw_open:
-            time.sleep(29)
-            payload = {"type": "hb"}
-            self.hsWebsocket.hs_send(json.dumps(payload))
+    def on_hsi_stale(self):
+        self.on_hsi_error(TimeoutError("No message on the order feed for %d seconds" % self.stale_timeout))
+        if self.hsiWebsocket:
+            self.hsiWebsocket.drop()
 
     def start_websocket(self):
-        self.hsWebsocket = neo_api_client.HSWebSocket()
+        self.hsWebsocket = neo_api_client.HSWebSocket(native_output=self.native_output,
+                                                      lazy_dates=self.lazy_dates,
+                                                      columnar_output=self.columnar_output,
+                                                      reconnect=self.reconnect)
         self.hsWebsocket.open_connection(neo_api_client.WEBSOCKET_URL, self.access_token, self.sid,
                                          self.on_hsm_open, self.on_hsm_message,
-                                         self.on_hsm_error, self.on_hsm_close)
+                                         self.on_hsm_error, self.on_hsm_close, on_pong=self.on_hsm_pong)
 
     def start_websocket_thread(self):
         self.hsw_thread = threading.Thread(target=self.start_websocket)
@@ -87,80 +137,105 @@ class NeoWebSocket:
 
     def on_hsm_message(self, message):
         # print("on Message Func in NeoWebsocket", message)
+        self.heartbeats.touch(self.hsm_heartbeat_key)
         if message:
             if type(message) == str:
                 req_type = json.loads(message)[0]["type"]
                 if req_type == 'cn':
                     # print("INSIDE CONNECTION")
                     self.is_hsw_open = 1
-                    # Uncomment this to start HSM ping thread
-                    # And add logic to send binary data to websocket
-                    # threading.Thread(target=self.start_hsm_ping_thread).start()
-
-                    if len(self.quotes_arr) >= 1:
-                        self.call_quotes()
-                    if len(self.sub_list) >= 1:
-                        self.subscribe_scripts(self.channel_tokens)
+                    self.start_hsm_heartbeat()
+
+                    if self.snapshot_queue:
+                        self.send_snapshot_requests()
+                    if self.reconnect.reconnects != self.reconnects_reported:
+                        self.reconnects_reported = self.reconnect.reconnects
+                        if self.on_message:
+                            self.on_message({"type": "reconnect", "data": self.reconnect_metrics()})
+                    if len(self.subscriptions) >= 1:
+                        self.subscribe_scripts(self.subscriptions.channel_entries())
+                    if self.subscriptions.allocator.paused:
+                        self.send_channel_request(ReqTypeValues.get("CHANNEL_PAUSE"),
+                                                  sorted(self.subscriptions.allocator.paused))
                 if req_type == "unsub":
-                    if len(self.un_sub_channel_token) > 0 and self.un_sub_channel:
-                        # remove from sub_list and sub_token
-                        self.remove_items(self.un_sub_channel_token[self.un_sub_channel])
-                        del self.un_sub_channel_token[self.un_sub_channel]
-                    if len(self.un_sub_channel_token) == 0:
-                        if self.token_limit_reached:
-                            self.sub_list = []
-                            self.channel_tokens = {}
-                            self.un_sub_channel_token = {}
+                    # The subscriptions were already dropped when the request was sent
+                    if self.pending_unsubs > 0:
+                        self.pending_unsubs -= 1
                     if self.on_message:
                         self.on_message("Un-Subscribed Successfully!")
             elif type(message) == list:
 
                     # print("raw message ",message)
-
-                    # print("quotes ",self.quotes_arr)
-                    request_type=message[0].get('request_type')
-                    if request_type and request_type == "SNAP" and (len(self.quotes_arr) >= 1):
-                        
-                        out_list, quote_type = self.quote_response_formatter(message)
-                        if len(out_list)>0:
-                            # print("length greater than 0 ")
-                            quote_message = self.response_format(out_list, quote_type=quote_type)
-                            if self.on_message:
-                                self.on_message({"type": "quotes", "data": quote_message})
-                            self.quotes_arr = []
-                    if len(self.sub_list) >= 1 and self.is_message_for_subscription(message):
-                        if self.on_message:
-                            self.on_message({"type": "stock_feed", "data": message})
+                    if len(self.snapshots) >= 1:
+                        self.resolve_snapshots(message)
+                    if len(self.subscriptions) >= 1:
+                        feed = self.subscribed_items(message)
+                        if feed:
+                            self.emit_feed({"type": "stock_feed", "data": feed})
                     
-                    # If there is no other tokens in quotes_arr and sub_list. disconnect the socket
-                    # print("sublist size ",len(self.sub_list))
-                    if(len(self.sub_list)<=0):
+                    # If there are no pending snapshot requests and no subscriptions, disconnect the socket
+                    if len(self.subscriptions) <= 0 and len(self.snapshots) <= 0:
                         self.hsWebsocket.close()
-
-
-    def is_message_for_subscription(self,message):
-        # print("message ==== ",message)
-        is_for_sub = False
-        keys_in_sublist = list({outer_key for data_dict in self.sub_list for outer_key in data_dict})
-        # print("sublist keys ",keys_in_sublist)
+            elif isinstance(message, FeedBatch):
+                if len(self.snapshots) >= 1:
+                    self.resolve_snapshot_batch(message)
+                if len(self.subscriptions) >= 1:
+                    batch = self.subscribed_batch(message)
+                    if batch is not None:
+                        self.emit_feed({"type": "stock_feed_batch", "data": batch})
+                if len(self.subscriptions) <= 0 and len(self.snapshots) <= 0:
+                    self.hsWebsocket.close()
+
+
+    def emit_feed(self, message):
+        if self.on_message:
+            self.on_message(message)
+
+    def hsm_running(self):
+        """True while a socket is connected, connecting or waiting to reconnect"""
+        return self.hsw_thread is not None and self.hsw_thread.is_alive()
+
+    def is_message_for_subscription(self, message):
+        tokens = self.subscriptions.tokens
+        return any(item.get('tk') in tokens for item in message)
+
+    def subscribed_items(self, message):
+        # Checked per item against the live token index, so the cost follows the frame size
+        tokens = self.subscriptions.tokens
+        return [item for item in message if item.get('tk') in tokens]
+
+    def subscribed_batch(self, batch):
+        tokens = self.subscriptions.tokens
+        topic_ids = [topic_id for topic_id, d in batch.topics.items() if d.symbol in tokens]
+        if not topic_ids:
+            return None
+        if len(topic_ids) == len(batch.topics):
+            return batch
+        return batch.select(topic_ids)
+
+    def resolve_snapshots(self, message):
         for item in message:
-            if 'tk' in item:
-                if item['tk'] in keys_in_sublist:
-                    is_for_sub = True
-
-            if is_for_sub:
-                break
-        return is_for_sub
-        
+            if item.get('request_type') == "SNAP" and 'tk' in item:
+                key = PendingSnapshots.key(item.get('e'), item['tk'])
+                if key in self.snapshots:
+                    self.snapshots.resolve(key, str(item.get('name', ''))[:2], item)
+
+    def resolve_snapshot_batch(self, batch):
+        for topic_id in batch.snapshot_ids:
+            d = batch.topics[topic_id]
+            key = PendingSnapshots.key(d.exchange, d.symbol)
+            if key in self.snapshots:
+                self.snapshots.resolve(key, d.feedType, batch.select([topic_id]))
 
     def on_hsi_message(self, message):
         # print("HSI on message called here")
+        self.heartbeats.touch(self.hsi_heartbeat_key)
         if message:
             if isinstance(message, str):
                 req = json.loads(message)
                 if req["type"] == 'cn':
                     self.is_hsi_open = 1
-                    threading.Thread(target=self.start_hsi_ping_thread).start()
+                    self.start_hsi_heartbeat()
 
         # print("on message callback, ", self.on_message)
         if self.on_message:
@@ -170,6 +245,13 @@ class NeoWebSocket:
         # print("On Close Function is running!")
         if self.is_hsw_open == 1:
             self.is_hsw_open = 0
+        self.heartbeats.cancel(self.hsm_heartbeat_key)
+        self.pending_unsubs = 0
+        server = self.hsWebsocket.server if self.hsWebsocket else None
+        if server is None or server.closed:
+            self.snapshot_queue = []
+            self.snapshots.fail_all(ConnectionError("Websocket closed before the snapshot arrived"))
+        # Otherwise the socket reconnects: unsent requests go out on 'cn', sent ones wait for their deadline
         if self.on_close:
             self.on_close()
 
@@ -179,16 +261,12 @@ class NeoWebSocket:
         # print("On Close Function is running!")
         if self.is_hsi_open == 1:
             self.is_hsi_open = 0
+        self.heartbeats.cancel(self.hsi_heartbeat_key)
         if self.on_close:
             self.on_close()
 
     def on_hsm_error(self, error):
-        if self.is_hsw_open == 1:
-            self.is_hsw_open = 0
-            # if self.quotes_arr:
-            #     self.quotes_api_callback(error)
-        if self.hsWebsocket:
-            self.hsWebsocket.close()
+        # The socket is not closed here: if the connection dropped, StartServer reconnects and resubscribes
         if self.on_error:
             self.on_error(error)
         else:
@@ -206,27 +284,6 @@ class NeoWebSocket:
             print("Error Occurred in Websocket! Error Message ", error)
 
 
-    def remove_items(self, un_sub_json):
-        for unsubscribe_token in un_sub_json:
-            token_value = unsubscribe_token[list(unsubscribe_token.keys())[0]]['instrument_token']
-            segment_value = unsubscribe_token[list(unsubscribe_token.keys())[0]]['exchange_segment']
-            sub_type_value = unsubscribe_token[list(unsubscribe_token.keys())[0]]['subscription_type']
-
-            # self.sub_list = [token for token in self.sub_list if str(list(token.keys())[0]) != str(token_value)]
-            self.sub_list = [token for token in self.sub_list if token != unsubscribe_token]
-
-            for channel_token_list in self.channel_tokens.values():
-                for channel_token_dict in channel_token_list:
-                    for channel_token_key, channel_token_value in channel_token_dict.items():
-
-                        if token_value == channel_token_value['instrument_token'] and segment_value == \
-                                channel_token_value['exchange_segment'] and sub_type_value == \
-                                channel_token_value['subscription_type']:
-                            channel_token_list.remove(channel_token_dict)
-                            break
-
-        return
-
     def input_validation(self, instrument_tokens):
         valid_params = ["instrument_token", "exchange_segment"]
         ret_obj = True
@@ -278,18 +335,55 @@ class NeoWebSocket:
                 scrips += instrument_token["exchange_segment"] + "|" + str(instrument_token["instrument_token"])
         return scrips
 
-    def call_quotes(self):
-        scrips, quote_type = self.get_formatted_data(self.quotes_arr)
-        scrip_type = ReqTypeValues.get("SNAP_MW")
-        if self.quotes_index:
-            scrip_type = ReqTypeValues.get("SNAP_IF")
-        else:
-            if quote_type:
-                if quote_type.strip().lower() == 'market_depth':
-                    scrip_type = ReqTypeValues.get("SNAP_DP")
-        
-        req_params = json.dumps({"type": scrip_type, "scrips": scrips, "channelnum": QuotesChannel})
-        self.hsWebsocket.hs_send(req_params)
+    def request_snapshots(self, instrument_tokens, isIndex=False, isDepth=False, timeout=5):
+        """
+            Asks the HSM socket for one snapshot of every instrument and returns {(exchange_segment,
+            instrument_token): Future}. Each future gets the SNAP item of its instrument (a FeedBatch with
+            columnar_output), or fails with TimeoutError after timeout seconds. Requests made before the
+            socket is connected, or while it reconnects, are sent once it is.
+        """
+        if not self.input_validation(instrument_tokens):
+            raise ValueError("Invalid Inputs")
+        scrip_type, feed_type = ReqTypeValues.get("SNAP_MW"), "sf"
+        if isIndex:
+            scrip_type, feed_type = ReqTypeValues.get("SNAP_IF"), "if"
+        if isDepth:
+            scrip_type, feed_type = ReqTypeValues.get("SNAP_DP"), "dp"
+
+        futures = {}
+        for item in instrument_tokens:
+            key = PendingSnapshots.key(item['exchange_segment'], item['instrument_token'])
+            if key not in futures:
+                futures[key] = self.snapshots.add(key, feed_type, timeout)
+        keys = list(futures)
+        for start in range(0, len(keys), MAX_SCRIPS):
+            scrips = "&".join(segment + "|" + token for segment, token in keys[start:start + MAX_SCRIPS])
+            self.snapshot_queue.append((scrip_type, scrips))
+
+        if self.hsWebsocket and self.is_hsw_open == 1:
+            self.send_snapshot_requests()
+        elif not self.hsm_running():
+            self.start_websocket_thread()
+        return futures
+
+    def get_snapshots(self, instrument_tokens, isIndex=False, isDepth=False, timeout=5):
+        """Blocking request_snapshots: {(exchange_segment, instrument_token): SNAP item, or None if none came}"""
+        futures = self.request_snapshots(instrument_tokens, isIndex, isDepth, timeout)
+        concurrent.futures.wait(list(futures.values()), timeout=timeout)
+        self.snapshots.expire()
+        out = {}
+        for key, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                out[key] = future.result()
+            else:
+                self.snapshots.cancel(key, future)
+                out[key] = None
+        return out
+
+    def send_snapshot_requests(self):
+        requests, self.snapshot_queue = self.snapshot_queue, []
+        for scrip_type, scrips in requests:
+            self.hsWebsocket.send_request(scrip_type, scrips, QuotesChannel)
 
     def quote_type_validation(self, quote_type):
         Q_type = True
@@ -300,47 +394,57 @@ class NeoWebSocket:
         return Q_type
 
     def subscribe_scripts(self, channel_tokens):
-        # print("self.channel_tokens.items()", self.channel_tokens)
+        # One frame per channel and subscription type with up to MAX_SCRIPS scrips, sent without a JSON round trip
         for channel, token_list in channel_tokens.items():
+            scrips_by_type = {}
             for tokens in token_list:
-                tokens = list(tokens.values())
-                scrips = self.format_tokens_live(tokens[0])
-                req_params1 = json.dumps(
-                    {"type": tokens[0]["subscription_type"], "scrips": scrips, "channelnum": channel})
-                self.hsWebsocket.hs_send(req_params1)
-
-    def prepare_un_sub(self):
-        # print("IN Prepare UNSUB")
-        for key, value in self.channel_tokens.items():
-            # Loop through each item in the value list
-            for item in value:
-                # Extract the subscription_type from the item
-                subscription_type = list(item.values())[0]["subscription_type"]
-                subscription_type = subscription_type.replace('s', 'u')
-                # Create a new key by appending the subscription_type to the original key
-                new_key = f"{key}-{subscription_type}"
-                # Create a list to store the items as the value
-                new_value = [{list(item.values())[0]["instrument_token"]: list(item.values())[0]}]
-                # Add the item to the new_value list
-                # Add the new key-value pair to un_sub_channel_token
-                if new_key in self.un_sub_channel_token:
-                    self.un_sub_channel_token[new_key].extend(new_value)
-                else:
-                    self.un_sub_channel_token[new_key] = new_value
+                value = next(iter(tokens.values()))
+                scrips_by_type.setdefault(value["subscription_type"], []).append(self.format_tokens_live(value))
+            for subscription_type, scrips in scrips_by_type.items():
+                for start in range(0, len(scrips), MAX_SCRIPS):
+                    self.hsWebsocket.send_request(subscription_type, "&".join(scrips[start:start + MAX_SCRIPS]),
+                                                  channel)
+
+    def workload_type(self, isIndex=False, isDepth=False):
+        subscription_type = ReqTypeValues.get("SCRIP_SUBS")
+        if isIndex:
+            subscription_type = ReqTypeValues.get("INDEX_SUBS")
+        if isDepth:
+            subscription_type = ReqTypeValues.get("DEPTH_SUBS")
+        return subscription_type
+
+    def send_channel_request(self, req_type, channels):
+        if channels and self.hsWebsocket and self.is_hsw_open == 1:
+            self.hsWebsocket.send_request(req_type, None, channels)
+
+    def pause_channels(self, isIndex=False, isDepth=False):
+        """Pauses the channels carrying scrip, index or depth subscriptions and returns their numbers"""
+        channels = self.subscriptions.allocator.pause(self.workload_type(isIndex, isDepth))
+        self.send_channel_request(ReqTypeValues.get("CHANNEL_PAUSE"), channels)
+        return channels
+
+    def resume_channels(self, isIndex=False, isDepth=False):
+        channels = self.subscriptions.allocator.resume(self.workload_type(isIndex, isDepth))
+        self.send_channel_request(ReqTypeValues.get("CHANNEL_RESUME"), channels)
+        return channels
+
+    def reconnect_metrics(self):
+        """Reconnects and outage gaps of the HSM socket, plus the UPDATEs dropped while waiting for snapshots"""
+        metrics = self.reconnect.metrics()
+        server = self.hsWebsocket.server if self.hsWebsocket else None
+        metrics["dropped_updates"] = server.hsWrapper.dropped_updates if server and server.hsWrapper else 0
+        return metrics
 
+    def channel_occupancy(self):
+        return self.subscriptions.allocator.occupancy()
 
     def get_live_feed(self, instrument_tokens, isIndex, isDepth):
-        if len(self.sub_list) + len(instrument_tokens) > 3000:
+        if len(self.subscriptions) + len(instrument_tokens) > 3000:
             self.token_limit_reached = True
-            self.prepare_un_sub()
-            self.un_subscription()
+            self.un_subscribe_keys(list(self.subscriptions.entries))
 
         tmp_token_list = []
-        subscription_type = ReqTypeValues.get("SCRIP_SUBS")
-        if isIndex:
-            subscription_type = ReqTypeValues.get("INDEX_SUBS")
-        if isDepth:
-            subscription_type = ReqTypeValues.get("DEPTH_SUBS")
+        subscription_type = self.workload_type(isIndex, isDepth)
 
         if self.input_validation(instrument_tokens):
             for item in instrument_tokens:
@@ -350,10 +454,9 @@ class NeoWebSocket:
                          'subscription_type': subscription_type}
                 if 'subscription_type' not in item:
                     item['subscription_type'] = subscription_type
-                # if key not in [list(x.keys())[0] for x in self.sub_list]:
-                if {key: value} not in self.sub_list:
-                    self.sub_list.append({key: value})
-                    tmp_token_list.append({key: value})
+                entry = self.subscriptions.add(value)
+                if entry:
+                    tmp_token_list.append(entry)
                 # else:
                 #     index = [list(x.keys())[0] for x in self.sub_list].index(key)
                 #     print("index, key === ", index, key)
@@ -372,8 +475,9 @@ class NeoWebSocket:
             if self.hsWebsocket and self.is_hsw_open == 1:
                 self.subscribe_scripts(channel_tokens)
 
-            else:
+            elif not self.hsm_running():
                 self.start_websocket_thread()
+            # Otherwise the socket is connecting or waiting to reconnect and subscribes everything on 'cn'
 
         else:
             if self.on_error:
@@ -488,27 +592,6 @@ class NeoWebSocket:
                     out_resp = response_data
         return out_resp
 
-    def quote_response_formatter(self, message):
-        # print("quote response formatter ",message)
-        quote_type = ''
-        out_list = []
-        quotes_arr_list = list(set().union(*(d.keys() for d in self.quotes_arr)))
-        # print("quotes arr list ",quotes_arr_list)
-        if "quote_type" in quotes_arr_list:
-            quotes_arr_list.remove("quote_type")
-        for item in message:
-            if 'tk' in item:
-                if item['tk'] in quotes_arr_list:
-                    out_list.append(item)
-                    for i in range(len(self.quotes_arr)):
-                        if self.quotes_arr[i].get(item['tk']):
-                            quote_type = self.quotes_arr[i]["quote_type"]
-                            # print("quote type --- ",self.quotes_arr)
-                        if self.quotes_arr[i].get(item['tk']):
-                            del self.quotes_arr[i]
-                            break
-        return out_list, quote_type
-
     def response_format(self, response_data, quote_type):
         # print("response formatter ",response_data)
         # print("quote type ",quote_type)
@@ -535,82 +618,44 @@ class NeoWebSocket:
 
     def channel_segregation(self, tmp_token_list):
         # print("****** tmp_token_list", tmp_token_list)
-        out_channel_list = {}
-        for channel_num in range(2, 17):
-            # Check if there is an existing channel array for this channel number
-            if channel_num not in self.channel_tokens:
-                self.channel_tokens[channel_num] = []
-            if channel_num not in out_channel_list:
-                out_channel_list[channel_num] = []
-
-            # Check if there is space to add all the input JSON objects to this channel
-            if len(self.channel_tokens[channel_num]) + len(tmp_token_list) <= 200:
-                # Add all the input JSON objects to this channel
-                self.channel_tokens[channel_num].extend(tmp_token_list)
-                if out_channel_list[channel_num]:
-                    out_channel_list[channel_num].extend(tmp_token_list)
-                else:
-                    out_channel_list[channel_num] = tmp_token_list
-                # Exit the loop since all objects have been added to a channel
-                break
-
-            # Otherwise, add as many input JSON objects as possible to this channel
-            num_to_add = 200 - len(self.channel_tokens[channel_num])
-            self.channel_tokens[channel_num].extend(tmp_token_list[:num_to_add])
-            out_channel_list[channel_num].extend(tmp_token_list[:num_to_add])
-            # Remove the added objects from the input array
-            tmp_token_list = tmp_token_list[num_to_add:]
-
-        return out_channel_list
-
-    def un_subscription(self):
-        for channels, token_list in self.un_sub_channel_token.items():
-            tokens_list = [list(tokens.values())[0] for tokens in token_list]
-            scrips = self.format_un_sub_list(tokens_list)
-            self.un_sub_channel = channels
-            channel, sub_type = channels.split('-')
-            req_params1 = json.dumps(
-                {"type": sub_type, "scrips": scrips, "channelnum": channel})
-            self.hsWebsocket.hs_send(req_params1)
+        return self.subscriptions.assign(tmp_token_list)
+
+    def un_subscribe_keys(self, keys):
+        """
+            Drops the subscriptions of keys and, while connected, sends their unsubscribe requests: one frame per
+            channel and subscription type with up to MAX_SCRIPS scrips. Returns False when there was no connection
+            to send them on.
+        """
+        scrips_by_channel = {}
+        for key in keys:
+            channel_num = self.subscriptions.channel(key)
+            if self.subscriptions.remove(key) is not None and channel_num is not None:
+                scrips_by_channel.setdefault((channel_num, UNSUBSCRIPTION_TYPES[key[2]]), []).append(
+                    key[0] + "|" + str(key[1]))
+        if not (self.hsWebsocket and self.is_hsw_open == 1):
+            # Nothing to send, and the tokens are no longer subscribed again when the socket reconnects
+            return False
+        for (channel_num, un_subscription_type), scrips in scrips_by_channel.items():
+            for start in range(0, len(scrips), MAX_SCRIPS):
+                self.pending_unsubs += 1
+                self.hsWebsocket.send_request(un_subscription_type, "&".join(scrips[start:start + MAX_SCRIPS]),
+                                              channel_num)
+        return True
 
     def un_subscribe_list(self, instrument_tokens, isIndex=False, isDepth=False):
         # print("INTO UNSUBSCRIBE", instrument_tokens)
-        un_subscription_type = ReqTypeValues.get("SCRIP_UNSUBS")
-        subscription_type = ReqTypeValues.get("SCRIP_SUBS")
-        if isIndex:
-            un_subscription_type = ReqTypeValues.get("INDEX_UNSUBS")
-            subscription_type = ReqTypeValues.get("INDEX_SUBS")
-        if isDepth:
-            un_subscription_type = ReqTypeValues.get("DEPTH_UNSUBS")
-            subscription_type = ReqTypeValues.get("DEPTH_SUBS")
+        subscription_type = self.workload_type(isIndex, isDepth)
 
         if self.input_validation(instrument_tokens):
-            extracted_tokens = [{'instrument_token': item[key]['instrument_token'],
-                                 'exchange_segment': item[key]['exchange_segment'],
-                                 'subscription_type': item[key]['subscription_type']}
-                                for item in self.sub_list for key in item]
-
+            keys = []
             for token in instrument_tokens:
                 token["subscription_type"] = subscription_type
-                if token in extracted_tokens:
-                    for key, value in self.channel_tokens.items():
-                        for obj in value:
-                            if list(obj.values())[0] == token:
-                                in_key = token['instrument_token']
-                                value = {'instrument_token': token['instrument_token'],
-                                         'exchange_segment': token['exchange_segment'],
-                                         'subscription_type': subscription_type}
-                                key = str(key) + '-' + un_subscription_type
-                                if key not in self.un_sub_channel_token:
-                                    self.un_sub_channel_token[key] = []
-                                self.un_sub_channel_token[key].append({in_key: value})
-
+                sub_key = SubscriptionRegistry.key(token)
+                if sub_key in self.subscriptions:
+                    keys.append(sub_key)
                 else:
                     print("The Given Token is not in Subscription list")
-            if self.hsWebsocket and self.is_hsw_open == 1:
-                self.un_subscription()
-
-            else:
+            if not self.un_subscribe_keys(keys):
                 print("Socket Connection has been closed, So! The scripts are already un-subscribed!")
 
             # else:
@@ -619,7 +664,7 @@ class NeoWebSocket:
             #     self.hsWebsocket.open_connection(neo_api_client.WEBSOCKET_URL, self.access_token, self.sid,
             #                                      self.on_open, self.on_message, self.on_error, self.on_close)
 
-    def start_hsi_websocket(self):
+    def order_feed_url(self):
         url = ORDER_FEED_URL
         if self.data_center:
             if self.data_center.lower() == 'adc':
@@ -632,11 +677,14 @@ class NeoWebSocket:
                 url = ORDER_FEED_URL_E41
             elif self.data_center.lower() == 'e43':
                 url = ORDER_FEED_URL_E43
+        return url
+
+    def start_hsi_websocket(self):
         self.hsiWebsocket = neo_api_client.HSIWebSocket()
-        self.hsiWebsocket.open_connection(url=url, onopen=self.on_hsi_open,
+        self.hsiWebsocket.open_connection(url=self.order_feed_url(), onopen=self.on_hsi_open,
                                           onmessage=self.on_hsi_message,
                                           onclose=self.on_hsi_close,
-                                          onerror=self.on_hsi_error)
+                                          onerror=self.on_hsi_error, onpong=self.on_hsi_pong)
 
     def start_hsi_websocket_thread(self):
         self.hsi_thread = threading.Thread(target=self.start_hsi_websocket)
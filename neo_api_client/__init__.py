@@ -22,6 +22,7 @@ from neo_api_client.api.limits_api import LimitsAPI
 from neo_api_client.api.logout_api import LogoutAPI
 from .settings import stock_key_mapping
 from neo_api_client.NeoWebSocket import NeoWebSocket
+from neo_api_client.sharded_websocket import ShardedNeoWebSocket
 from neo_api_client.HSWebSocketLib import HSWebSocket
 from neo_api_client.HSWebSocketLib import HSIWebSocket
 from neo_api_client.urls import (WEBSOCKET_URL, PROD_BASE_URL, SESSION_PROD_BASE_URL, SESSION_UAT_BASE_URL, UAT_BASE_URL,
@@ -0,0 +1,282 @@
+import asyncio
+import ssl
+
+import websockets
+
+import neo_api_client
+from neo_api_client.HSWebSocketLib import HSIWebSocket, HSWebSocket, HSWrapper
+from neo_api_client.NeoWebSocket import NeoWebSocket
+from neo_api_client.reconnect import ReconnectManager
+
+
+def ssl_context(url):
+    # Same as the sslopt={"cert_reqs": ssl.CERT_NONE} of the websocket-client sockets
+    if not url.startswith("wss"):
+        return None
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class AsyncSender:
+    """
+        Stands in for the websocket-client socket that HSWebSocket and HSWrapper send through: send() hands
+        the frame to the event loop, which writes it to the current connection.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.socket = None
+
+    def send(self, data, opcode=0x2):
+        socket = self.socket
+        if socket is None:
+            print("Unable to send request !, Reason: Connection faulty or request not valid !")
+            return
+        if not isinstance(data, str):
+            data = bytes(data)
+        self.loop.call_soon_threadsafe(self.loop.create_task, socket.send(data))
+
+    def close(self):
+        socket = self.socket
+        if socket is not None:
+            self.loop.call_soon_threadsafe(self.loop.create_task, socket.close())
+
+
+class AsyncStartServer:
+    """StartServer on asyncio: one coroutine per socket, reconnecting with the same ReconnectManager"""
+
+    def __init__(self, url, onopen, onmessage, onerror, onclose, native_output=False, lazy_dates=False,
+                 columnar_output=False, reconnect=None, binary=True, onpong=None):
+        self.url = url
+        self.onopen = onopen
+        self.onmessage = onmessage
+        self.onerror = onerror
+        self.onclose = onclose
+        self.onpong = onpong
+        self.binary = binary
+        self.ws = AsyncSender(asyncio.get_running_loop())
+        self.hsWrapper = HSWrapper(native_output=native_output, lazy_dates=lazy_dates, ws=self.ws,
+                                   columnar_output=columnar_output) if binary else None
+        self.reconnect = reconnect if reconnect is not None else ReconnectManager()
+        self.closed = False
+
+    async def run(self):
+        self.reconnect.start()
+        while not self.closed:
+            try:
+                async with websockets.connect(self.url, ssl=ssl_context(self.url), ping_interval=None,
+                                              max_size=None) as socket:
+                    self.ws.socket = socket
+                    if self.hsWrapper:
+                        # Topic ids and snapshots belong to the previous connection
+                        self.hsWrapper.reset()
+                    self.onopen()
+                    async for message in socket:
+                        self.on_message(message)
+            except asyncio.CancelledError:
+                self.closed = True
+                raise
+            except Exception as error:
+                self.reconnect.last_error = error
+                self.onerror(error)
+            finally:
+                self.ws.socket = None
+                self.onclose()
+            self.reconnect.on_disconnected()
+            if self.closed or not self.reconnect.should_retry():
+                break
+            await asyncio.sleep(self.reconnect.next_delay())
+
+    def on_message(self, inData):
+        if not self.reconnect.connected:
+            self.reconnect.on_connected()
+        if isinstance(inData, bytes) and self.hsWrapper:
+            outData = self.hsWrapper.parseData(inData)
+        else:
+            outData = inData
+        if outData:
+            self.onmessage(outData)
+
+    def stop(self):
+        self.closed = True
+        self.reconnect.stop()
+
+    def ping(self):
+        # Called from the heartbeat scheduler thread
+        if self.ws.socket is not None:
+            asyncio.run_coroutine_threadsafe(self.await_pong(self.ws.socket), self.ws.loop)
+
+    async def await_pong(self, socket):
+        try:
+            await (await socket.ping())
+        except websockets.ConnectionClosed:
+            return
+        if self.onpong:
+            self.onpong()
+
+    def drop(self):
+        socket = self.ws.socket
+        if socket is not None and socket.transport is not None:
+            self.ws.loop.call_soon_threadsafe(socket.transport.abort)
+
+
+class AsyncHSWebSocket(HSWebSocket):
+    """HSWebSocket whose open_connection is a coroutine; hs_send and close work as before"""
+
+    async def open_connection(self, url, token, sid, on_open, on_message, on_error, on_close, on_pong=None):
+        self.url = url
+        self.onopen = on_open
+        self.onmessage = on_message
+        self.on_error = on_error
+        self.onclose = on_close
+        self.server = AsyncStartServer(url, on_open, on_message, on_error, on_close,
+                                       native_output=self.native_output, lazy_dates=self.lazy_dates,
+                                       columnar_output=self.columnar_output, reconnect=self.reconnect,
+                                       onpong=on_pong)
+        await self.server.run()
+
+    def close(self):
+        # StartServer reports the close itself once the connection is gone
+        if self.server:
+            self.server.stop()
+            self.server.ws.close()
+
+
+class AsyncHSIWebSocket(HSIWebSocket):
+    """Order feed socket on asyncio, sending the same requests as HSIWebSocket"""
+
+    def __init__(self):
+        super().__init__()
+        self.server = None
+
+    async def open_connection(self, url, onopen, onmessage, onclose, onerror, onpong=None):
+        self.url = url
+        self.onopen = onopen
+        self.onmessage = onmessage
+        self.onclose = onclose
+        self.onerror = onerror
+        self.server = AsyncStartServer(url, self.on_open, onmessage, onerror, self.on_close, binary=False,
+                                       onpong=onpong)
+        await self.server.run()
+
+    def on_open(self):
+        self.OPEN = 1
+        self.readyState = 1
+        self.onopen()
+
+    def on_close(self):
+        self.OPEN = 0
+        self.readyState = 0
+        self.onclose()
+
+    def transmit(self, js_obj):
+        if not self.server or self.server.ws.socket is None:
+            return False
+        self.server.ws.send(js_obj)
+        return True
+
+    def ping(self):
+        if self.server:
+            self.server.ping()
+
+    def drop(self):
+        if self.server:
+            self.server.drop()
+
+    def close(self):
+        self.OPEN = 0
+        self.readyState = 0
+        if self.server:
+            self.server.stop()
+            self.server.ws.close()
+
+
+class AsyncNeoWebSocket(NeoWebSocket):
+    """
+        NeoWebSocket with both feeds running as tasks on one asyncio event loop instead of a thread per socket,
+        so a single loop can carry the feeds of several accounts.
+
+        The callbacks and the subscribe, unsubscribe and order feed calls are the same as NeoWebSocket; call
+        them from the event loop. ticks() is an async iterator over the subscribed feed items (FeedBatch
+        objects with columnar_output), and snapshot_quotes() awaits snapshot quotes without blocking the loop.
+    """
+
+    def __init__(self, sid, token, server_id, data_center, native_output=False, lazy_dates=False,
+                 columnar_output=False, tick_buffer=10000):
+        super().__init__(sid, token, server_id, data_center, native_output=native_output, lazy_dates=lazy_dates,
+                         columnar_output=columnar_output)
+        self.tick_buffer = tick_buffer
+        self.tick_queues = []
+        self.dropped_ticks = 0
+
+    def start_websocket_thread(self):
+        self.hsWebsocket = AsyncHSWebSocket(native_output=self.native_output, lazy_dates=self.lazy_dates,
+                                            columnar_output=self.columnar_output, reconnect=self.reconnect)
+        self.hsw_thread = asyncio.get_running_loop().create_task(
+            self.hsWebsocket.open_connection(neo_api_client.WEBSOCKET_URL, self.access_token, self.sid,
+                                             self.on_hsm_open, self.on_hsm_message, self.on_hsm_error,
+                                             self.on_hsm_close, on_pong=self.on_hsm_pong))
+
+    def hsm_running(self):
+        return self.hsw_thread is not None and not self.hsw_thread.done()
+
+    def start_hsi_websocket_thread(self):
+        self.hsiWebsocket = AsyncHSIWebSocket()
+        self.hsi_thread = asyncio.get_running_loop().create_task(
+            self.hsiWebsocket.open_connection(url=self.order_feed_url(), onopen=self.on_hsi_open,
+                                              onmessage=self.on_hsi_message, onclose=self.on_hsi_close,
+                                              onerror=self.on_hsi_error, onpong=self.on_hsi_pong))
+
+    def send_hsi_heartbeat(self):
+        # Without websocket-client's ping_interval the order feed is pinged along with its heartbeat
+        super().send_hsi_heartbeat()
+        self.hsiWebsocket.ping()
+
+    def emit_feed(self, message):
+        if self.tick_queues:
+            ticks = message["data"] if message["type"] == "stock_feed" else (message["data"],)
+            for queue in self.tick_queues:
+                for tick in ticks:
+                    if queue.full():
+                        # A slow consumer loses its oldest ticks rather than stalling the socket
+                        queue.get_nowait()
+                        self.dropped_ticks += 1
+                    queue.put_nowait(tick)
+        super().emit_feed(message)
+
+    async def ticks(self):
+        queue = asyncio.Queue(maxsize=self.tick_buffer)
+        self.tick_queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.tick_queues.remove(queue)
+
+    async def snapshot_quotes(self, instrument_tokens, isIndex=False, isDepth=False, timeout=5):
+        """Awaitable get_snapshots: {(exchange_segment, instrument_token): SNAP item, or None}"""
+        futures = self.request_snapshots(instrument_tokens, isIndex, isDepth, timeout)
+        waiters = {key: asyncio.wrap_future(future) for key, future in futures.items()}
+        await asyncio.wait(list(waiters.values()), timeout=timeout)
+        self.snapshots.expire()
+        out = {}
+        for key, waiter in waiters.items():
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                out[key] = waiter.result()
+            else:
+                self.snapshots.cancel(key, futures[key])
+                out[key] = None
+        return out
+
+    async def close(self):
+        if self.hsWebsocket:
+            self.hsWebsocket.close()
+        if self.hsiWebsocket:
+            self.hsiWebsocket.close()
+        tasks = [task for task in (self.hsw_thread, self.hsi_thread) if task is not None]
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
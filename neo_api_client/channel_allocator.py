@@ -0,0 +1,91 @@
+class ChannelAllocator:
+    """
+        Places subscriptions on the HSM channels and tracks the free capacity of each one.
+
+        A channel holds one workload class (the subscription type: "mws", "ifs" or "dps") while it has members,
+        so pausing and resuming a class never touches the channels of another; classes only share a channel
+        once no channel is left empty. Scrip and index
+        subscriptions go to the fullest channel of their class that still has room, so slots freed by
+        unsubscribes are reused before a new channel is opened. Depth subscriptions are heavier and are spread
+        over at least spread_channels channels, each new one going to the least loaded of them.
+    """
+
+    def __init__(self, channels=range(2, 17), channel_capacity=200, spread_types=("dps",), spread_channels=4):
+        self.channel_numbers = list(channels)
+        self.channel_capacity = channel_capacity
+        self.spread_types = set(spread_types)
+        self.spread_channels = spread_channels
+        self.members = {channel_num: {} for channel_num in self.channel_numbers}
+        self.channel_of = {}
+        self.workload = {}
+        self.paused = set()
+
+    def free(self, channel_num):
+        return self.channel_capacity - len(self.members[channel_num])
+
+    def channels_of(self, workload):
+        return [channel_num for channel_num in self.channel_numbers if self.workload.get(channel_num) == workload]
+
+    def select(self, workload):
+        """Channel the next subscription of workload goes to, or None when every usable channel is full"""
+        own = [channel_num for channel_num in self.channels_of(workload) if self.free(channel_num) > 0]
+        empty = next((channel_num for channel_num in self.channel_numbers if channel_num not in self.workload), None)
+        if workload in self.spread_types:
+            # Past spread_channels a new channel is only opened once the existing ones are full
+            if empty is not None and (not own or len(self.channels_of(workload)) < self.spread_channels):
+                own.append(empty)
+            if own:
+                return min(own, key=lambda channel_num: len(self.members[channel_num]))
+        elif own:
+            return max(own, key=lambda channel_num: len(self.members[channel_num]))
+        if empty is not None:
+            return empty
+        # Every channel is taken: share the one with the most room rather than leave the subscription out
+        channel_num = max(self.channel_numbers, key=self.free, default=None)
+        return channel_num if channel_num is not None and self.free(channel_num) > 0 else None
+
+    def place(self, key, entry, workload):
+        channel_num = self.select(workload)
+        if channel_num is None:
+            return None
+        self.members[channel_num][key] = entry
+        self.channel_of[key] = channel_num
+        self.workload.setdefault(channel_num, workload)
+        return channel_num
+
+    def release(self, key):
+        channel_num = self.channel_of.pop(key, None)
+        if channel_num is None:
+            return None
+        members = self.members[channel_num]
+        del members[key]
+        if not members:
+            # An empty channel can be handed to any class again
+            del self.workload[channel_num]
+            self.paused.discard(channel_num)
+        return channel_num
+
+    def pause(self, workload):
+        """Marks the channels of workload paused and returns them, for the CHANNEL_PAUSE request"""
+        channels = self.channels_of(workload)
+        self.paused.update(channels)
+        return channels
+
+    def resume(self, workload):
+        channels = [channel_num for channel_num in self.channels_of(workload) if channel_num in self.paused]
+        self.paused.difference_update(channels)
+        return channels
+
+    def occupancy(self):
+        """{channel: {"workload", "used", "free", "paused"}} for every channel"""
+        return {channel_num: {"workload": self.workload.get(channel_num),
+                              "used": len(self.members[channel_num]),
+                              "free": self.free(channel_num),
+                              "paused": channel_num in self.paused}
+                for channel_num in self.channel_numbers}
+
+    def clear(self):
+        self.members = {channel_num: {} for channel_num in self.channel_numbers}
+        self.channel_of = {}
+        self.workload = {}
+        self.paused = set()
@@ -0,0 +1,121 @@
+import threading
+import time
+
+
+class HeartbeatEntry:
+    def __init__(self, key, interval, beat, timeout, on_stale):
+        self.key = key
+        self.interval = interval
+        self.beat = beat
+        self.timeout = timeout
+        self.on_stale = on_stale
+        self.last_seen = time.monotonic()
+        self.rounds = 0
+        self.slot = None
+
+
+class HeartbeatScheduler:
+    """
+        One thread that sends the heartbeats of every feed connection and notices the ones that went quiet.
+
+        Connections are kept on a timer wheel of slot_count slots, tick seconds apart; an entry sits in the slot
+        of its next beat with the number of full turns of the wheel still to wait, so each tick only looks at the
+        entries due around it, however many connections there are. When an entry comes due and nothing was
+        received on its connection (touch()) for timeout seconds, on_stale is called instead of beat and the entry
+        is dropped; the connection schedules itself again once it is back. Callbacks run on the scheduler thread
+        and must not block for long.
+    """
+
+    def __init__(self, tick=0.5, slot_count=512):
+        self.tick = tick
+        self.slot_count = slot_count
+        self.slots = [{} for _ in range(slot_count)]
+        self.entries = {}
+        self.cursor = 0
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, key, interval, beat, timeout=None, on_stale=None):
+        """Starts (or restarts) the heartbeat of the connection key: beat() every interval seconds"""
+        entry = HeartbeatEntry(key, interval, beat, timeout, on_stale)
+        with self.condition:
+            self.remove_locked(key)
+            self.entries[key] = entry
+            self.place_locked(entry)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="neo-heartbeat", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return entry
+
+    def cancel(self, key):
+        with self.condition:
+            self.remove_locked(key)
+
+    def touch(self, key):
+        """Records that the connection key received something"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.last_seen = time.monotonic()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def place_locked(self, entry):
+        ticks = max(1, int(round(entry.interval / self.tick)))
+        entry.rounds, offset = divmod(ticks - 1, self.slot_count)
+        entry.slot = (self.cursor + 1 + offset) % self.slot_count
+        self.slots[entry.slot][entry.key] = entry
+
+    def remove_locked(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.slots[entry.slot].pop(key, None)
+
+    def advance_locked(self, now):
+        """Moves the wheel one tick and returns the (entry, stale) pairs that came due"""
+        self.cursor = (self.cursor + 1) % self.slot_count
+        slot = self.slots[self.cursor]
+        due = []
+        for key, entry in list(slot.items()):
+            if entry.rounds > 0:
+                entry.rounds -= 1
+                continue
+            del slot[key]
+            stale = entry.timeout is not None and now - entry.last_seen > entry.timeout
+            if stale:
+                del self.entries[key]
+            else:
+                self.place_locked(entry)
+            due.append((entry, stale))
+        return due
+
+    def run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            with self.condition:
+                while not self.entries:
+                    self.condition.wait()
+                    next_tick = time.monotonic() + self.tick
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                next_tick += self.tick
+                due = self.advance_locked(time.monotonic())
+            # Outside the lock, so a callback can cancel or schedule connections
+            for entry, stale in due:
+                try:
+                    if stale:
+                        if entry.on_stale:
+                            entry.on_stale()
+                    else:
+                        entry.beat()
+                except Exception as e:
+                    print("Heartbeat failed for", entry.key, e)
+
+
+scheduler = HeartbeatScheduler()
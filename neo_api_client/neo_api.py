@@ -53,6 +53,14 @@ class NeoAPI:
     self.on_error: sets the callback function for errors for Websocket.
     self.on_close: sets the callback function for connection close events for Websocket.
     self.on_open: sets the callback function for connection open events for Websocket.
+    self.native_output: set to True before subscribing to receive live feed values as floats/ints
+        (dates as epoch seconds) instead of formatted strings.
+    self.lazy_dates: set to True before subscribing to receive date fields as epoch seconds that are
+        formatted as "dd/mm/yyyy hh:mm:ss" only when converted with str().
+    self.columnar_output: set to True before subscribing to receive each feed frame as one
+        {"type": "stock_feed_batch", "data": FeedBatch} message of NumPy columns instead of per-scrip dicts.
+    self.feed_shards: set above 1 before subscribing to spread the live feed over that many socket connections,
+        for subscriptions larger than the 3000 tokens one connection allows.
 
     Raises:
     ApiException: if the session initiation fails.
@@ -62,6 +70,10 @@ class NeoAPI:
         self.on_error = None
         self.on_close = None
         self.on_open = None
+        self.native_output = False
+        self.lazy_dates = False
+        self.columnar_output = False
+        self.feed_shards = 1
 
         if not access_token:
             # neo_api_client.req_data_validation.validate_configuration(consumer_key, consumer_secret)
@@ -617,6 +629,27 @@ class NeoAPI:
             warnings += "It is recommended to set callbacks to handle your own logic on events."
             print(warnings)
 
+    def new_websocket(self, data_center=None):
+        feed_options = {"native_output": self.native_output, "lazy_dates": self.lazy_dates,
+                        "columnar_output": self.columnar_output}
+        if self.feed_shards > 1:
+            return neo_api_client.ShardedNeoWebSocket(self.configuration.edit_sid, self.configuration.edit_token,
+                                                      self.configuration.serverId, data_center,
+                                                      shard_count=self.feed_shards, **feed_options)
+        return neo_api_client.NeoWebSocket(self.configuration.edit_sid, self.configuration.edit_token,
+                                           self.configuration.serverId, data_center, **feed_options)
+
+    def async_websocket(self, data_center=None, tick_buffer=10000):
+        """
+            Live and order feed client for asyncio applications, see AsyncNeoWebSocket. Create it and call
+            get_live_feed / get_order_feed from a running event loop.
+        """
+        from neo_api_client.async_websocket import AsyncNeoWebSocket
+        return AsyncNeoWebSocket(self.configuration.edit_sid, self.configuration.edit_token,
+                                 self.configuration.serverId, data_center, native_output=self.native_output,
+                                 lazy_dates=self.lazy_dates, columnar_output=self.columnar_output,
+                                 tick_buffer=tick_buffer)
+
     def set_neowebsocket_callbacks(self):
         if self.NeoWebSocket is not None:
             self.NeoWebSocket.on_message = self.__on_message
@@ -647,10 +680,7 @@ class NeoAPI:
         if self.configuration.edit_token and self.configuration.edit_sid:
             if not self.NeoWebSocket:
                 self.check_callbacks()
-                self.NeoWebSocket = neo_api_client.NeoWebSocket(self.configuration.edit_sid,
-                                                                self.configuration.edit_token,
-                                                                self.configuration.serverId,
-                                                                data_center=None)
+                self.NeoWebSocket = self.new_websocket()
                 self.set_neowebsocket_callbacks()
             self.NeoWebSocket.get_live_feed(instrument_tokens=instrument_tokens, isIndex=isIndex, isDepth=isDepth)
         else:
@@ -673,10 +703,7 @@ class NeoAPI:
         """
         if self.configuration.edit_token and self.configuration.edit_sid:
             if not self.NeoWebSocket:
-                self.NeoWebSocket = neo_api_client.NeoWebSocket(self.configuration.edit_sid,
-                                                                self.configuration.edit_token,
-                                                                self.configuration.serverId,
-                                                                data_center=None)
+                self.NeoWebSocket = self.new_websocket()
 
             self.set_neowebsocket_callbacks()
             self.NeoWebSocket.un_subscribe_list(instrument_tokens=instrument_tokens,
@@ -740,10 +767,7 @@ class NeoAPI:
         if self.configuration.edit_token and self.configuration.edit_sid:
             self.check_callbacks()
             if not self.NeoWebSocket:
-                self.NeoWebSocket = neo_api_client.NeoWebSocket(self.configuration.edit_sid,
-                                                                self.configuration.edit_token,
-                                                                self.configuration.serverId,
-                                                                self.configuration.data_center)
+                self.NeoWebSocket = self.new_websocket(self.configuration.data_center)
             self.set_neowebsocket_callbacks()
             self.NeoWebSocket.get_order_feed()
                                             
@@ -822,3 +846,32 @@ class NeoAPI:
             return error
         quotes_response = neo_api_client.QuotesAPI(self.api_client).get_quotes(instrument_tokens=instrument_tokens, quote_type=quote_type)
         return quotes_response
+
+    def socket_quotes(self, instrument_tokens, isIndex=False, isDepth=False, timeout=5):
+        """
+            Retrieves one snapshot quote per instrument over the live feed socket instead of the Quotes REST API.
+
+            Args:
+                instrument_tokens (List): A JSON-encoded list of instrument tokens.
+                isIndex (bool): Whether the instruments are indices. Default is False.
+                isDepth (bool): Whether to fetch depth snapshots. Default is False.
+                timeout (float): Seconds to wait for the snapshots. Default is 5.
+
+            Raises:
+                ValueError: If the login flow is not completed.
+
+            Returns:
+                Dict of (exchange_segment, instrument_token) to the snapshot feed item, or None for instruments
+                whose snapshot did not arrive within the timeout
+
+            Any number of calls can wait at the same time; each one only receives the snapshots it asked for. The
+            socket is opened if it is not connected yet and shares the connection used by subscribe.
+        """
+        if self.configuration.edit_token and self.configuration.edit_sid:
+            if not self.NeoWebSocket:
+                self.NeoWebSocket = self.new_websocket()
+                self.set_neowebsocket_callbacks()
+            return self.NeoWebSocket.get_snapshots(instrument_tokens=instrument_tokens, isIndex=isIndex,
+                                                   isDepth=isDepth, timeout=timeout)
+        else:
+            raise ValueError("Please complete the Login Flow to fetch Quotes over the socket")
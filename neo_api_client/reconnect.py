@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+
+class ReconnectManager:
+    """
+        Backoff and bookkeeping for re-opening a feed socket after it drops.
+
+        The n-th consecutive attempt waits initial_delay * factor^n seconds, capped at max_delay, minus a random
+        share of up to jitter of that, so many clients that dropped together do not reconnect together. The
+        attempt count goes back to zero once a connection delivers its first message. Every outage is recorded
+        as a gap: the seconds between the drop and the first message of the next connection.
+    """
+
+    def __init__(self, initial_delay=1.0, max_delay=60.0, factor=2.0, jitter=0.5, max_attempts=None):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.random = random.Random()
+        self.stopped = threading.Event()
+        self.attempt = 0
+        self.connected = False
+        self.disconnected_at = None
+        self.reconnects = 0
+        self.last_gap = None
+        self.longest_gap = 0.0
+        self.total_gap = 0.0
+        self.last_error = None
+
+    def next_delay(self):
+        delay = min(self.max_delay, self.initial_delay * self.factor ** self.attempt)
+        self.attempt += 1
+        return delay * (1 - self.jitter * self.random.random())
+
+    def should_retry(self):
+        return not self.stopped.is_set() and (self.max_attempts is None or self.attempt < self.max_attempts)
+
+    def wait(self):
+        """Sleeps before the next attempt; False when reconnecting was stopped or ran out of attempts"""
+        if not self.should_retry():
+            return False
+        return not self.stopped.wait(self.next_delay())
+
+    def start(self):
+        """Called when a new socket starts; an outage before it is not a reconnect"""
+        self.stopped.clear()
+        self.attempt = 0
+        self.disconnected_at = None
+
+    def stop(self):
+        self.stopped.set()
+
+    def on_connected(self):
+        """First message of a connection; returns True when it ends an outage"""
+        self.connected = True
+        self.attempt = 0
+        if self.disconnected_at is None:
+            return False
+        gap = time.monotonic() - self.disconnected_at
+        self.disconnected_at = None
+        self.reconnects += 1
+        self.last_gap = gap
+        self.longest_gap = max(self.longest_gap, gap)
+        self.total_gap += gap
+        return True
+
+    def on_disconnected(self, error=None):
+        self.connected = False
+        if error is not None:
+            self.last_error = error
+        if self.disconnected_at is None:
+            self.disconnected_at = time.monotonic()
+
+    def metrics(self):
+        return {"connected": self.connected,
+                "reconnects": self.reconnects,
+                "attempt": self.attempt,
+                "last_gap": self.last_gap,
+                "longest_gap": self.longest_gap,
+                "total_gap": self.total_gap,
+                "last_error": None if self.last_error is None else str(self.last_error)}
@@ -0,0 +1,208 @@
+import bisect
+import functools
+import threading
+import time
+import zlib
+
+from neo_api_client.HSWebSocketLib import FEED_TYPE_CODES, SCRIP_MAPPING, TopicTypes
+from neo_api_client.NeoWebSocket import NeoWebSocket
+
+# Rows of a columnar FeedBatch that carry the trade time of a scrip
+SCRIP_FEED_CODE = FEED_TYPE_CODES[TopicTypes["SCRIP"]]
+LTT_FIELD = next(index for index, field in enumerate(SCRIP_MAPPING) if field and field["name"] == "ltt")
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_tick_time(text):
+    """Epoch seconds of a formatted "dd/mm/yyyy hh:mm:ss" trade time, or None if it does not parse"""
+    try:
+        return int(time.mktime(time.strptime(text, "%d/%m/%Y %H:%M:%S")))
+    except ValueError:
+        return None
+
+
+class HashRing:
+    """
+        Consistent hash ring of shard indices. Each shard is placed at replicas points on the ring, so adding
+        or removing a shard only moves the keys of the neighbouring points.
+    """
+
+    def __init__(self, shard_count, replicas=64):
+        self.points = sorted((zlib.crc32(("%d-%d" % (shard, replica)).encode()), shard)
+                             for shard in range(shard_count) for replica in range(replicas))
+        self.hashes = [point for point, _ in self.points]
+
+    def walk(self, key):
+        """Shard indices in ring order starting at key, each shard once"""
+        start = bisect.bisect(self.hashes, zlib.crc32(key.encode()))
+        seen = set()
+        for index in range(len(self.points)):
+            shard = self.points[(start + index) % len(self.points)][1]
+            if shard not in seen:
+                seen.add(shard)
+                yield shard
+
+
+class ShardedNeoWebSocket:
+    """
+        Live feed over several HSM connections, one NeoWebSocket each, so the subscription can grow past the
+        per-connection token limit.
+
+        Instruments are routed to shards by consistent hashing of (exchange_segment, instrument_token); when a
+        shard is at shard_limit the next shard on the ring takes the instrument. The placement is remembered
+        once the shard has taken the instrument, so un_subscribe_list reaches the shard that holds the token.
+        Messages of all shards go to the single on_message callback, called on the receive thread of each
+        shard (so possibly from several threads at once), and feed messages are tagged with the index of the
+        shard they came from. The order feed and snapshot quotes are served by shard 0.
+
+        on_open fires when the first connection of any shard opens and on_close when the last one closes, so
+        a single shard reconnecting is not reported as the whole feed going down.
+    """
+
+    def __init__(self, sid, token, server_id, data_center, shard_count=2, shard_limit=2800, **feed_options):
+        self.shards = [NeoWebSocket(sid, token, server_id, data_center, **feed_options)
+                       for _ in range(shard_count)]
+        self.shard_limit = shard_limit
+        self.ring = HashRing(shard_count)
+        self.placement = {}
+        self.lock = threading.Lock()
+        self.on_message = None
+        self.on_error = None
+        self.on_close = None
+        self.on_open = None
+        self.stats = [{"messages": 0, "last_message": None, "last_tick_time": None} for _ in self.shards]
+        # Open connections per shard: the live feed, and the order feed on shard 0
+        self.open_connections = [0] * shard_count
+        for index, shard in enumerate(self.shards):
+            shard.on_message = functools.partial(self.forward_message, index)
+            shard.on_error = functools.partial(self.forward_error, index)
+            shard.on_open = functools.partial(self.forward_open, index)
+            shard.on_close = functools.partial(self.forward_close, index)
+
+    @staticmethod
+    def key(item):
+        return item['exchange_segment'] + "|" + str(item['instrument_token'])
+
+    def subscription_type(self, isIndex=False, isDepth=False):
+        return self.shards[0].workload_type(isIndex, isDepth)
+
+    def route(self, key, pending):
+        """Shard index for a new subscription; pending counts what this call already routed to each shard"""
+        for shard in self.ring.walk(key):
+            if len(self.shards[shard].subscriptions) + pending[shard] < self.shard_limit:
+                return shard
+        return None
+
+    def get_live_feed(self, instrument_tokens, isIndex, isDepth):
+        if not self.shards[0].input_validation(instrument_tokens):
+            if self.on_error:
+                self.on_error(Exception("Invalid Inputs"))
+            return
+        subscription_type = self.subscription_type(isIndex, isDepth)
+        batches = [[] for _ in self.shards]
+        pending = [0] * len(self.shards)
+        # New placements of this call, recorded once their shard has taken them
+        routed = {}
+        for item in instrument_tokens:
+            key = self.key(item)
+            placed = (key, subscription_type)
+            shard = self.placement.get(placed)
+            if shard is None and placed in routed:
+                shard = routed[placed][0]
+            if shard is None:
+                shard = self.route(key, pending)
+                if shard is None:
+                    print("All feed shards are full, cannot subscribe " + key)
+                    continue
+                routed[placed] = (shard, (item['exchange_segment'], item['instrument_token'], subscription_type))
+                pending[shard] += 1
+            batches[shard].append(item)
+        try:
+            for shard, batch in enumerate(batches):
+                if batch:
+                    self.shards[shard].get_live_feed(batch, isIndex, isDepth)
+        finally:
+            # A shard that raised or rejected an instrument leaves it unplaced, so the next call routes it again
+            for placed, (shard, entry) in routed.items():
+                if entry in self.shards[shard].subscriptions:
+                    self.placement[placed] = shard
+
+    def un_subscribe_list(self, instrument_tokens, isIndex=False, isDepth=False):
+        subscription_type = self.subscription_type(isIndex, isDepth)
+        batches = [[] for _ in self.shards]
+        for item in instrument_tokens:
+            shard = self.placement.pop((self.key(item), subscription_type), None)
+            if shard is None:
+                print("The Given Token is not in Subscription list")
+                continue
+            batches[shard].append(item)
+        for shard, batch in enumerate(batches):
+            if batch:
+                self.shards[shard].un_subscribe_list(batch, isIndex, isDepth)
+
+    def get_order_feed(self):
+        self.shards[0].get_order_feed()
+
+    def get_snapshots(self, instrument_tokens, isIndex=False, isDepth=False, timeout=5):
+        return self.shards[0].get_snapshots(instrument_tokens, isIndex, isDepth, timeout)
+
+    def forward_message(self, index, message):
+        stats = self.stats[index]
+        with self.lock:
+            stats["messages"] += 1
+            stats["last_message"] = time.time()
+            if isinstance(message, dict) and message.get("type") in ("stock_feed", "stock_feed_batch"):
+                if message["type"] == "stock_feed":
+                    for item in message["data"]:
+                        tick_time = item.get("ltt")
+                        if isinstance(tick_time, str):
+                            tick_time = parse_tick_time(tick_time)
+                        if tick_time and (stats["last_tick_time"] or 0) < tick_time:
+                            stats["last_tick_time"] = tick_time
+                else:
+                    batch = message["data"]
+                    tick_times = batch.values[(batch.field_ids == LTT_FIELD) & (batch.feed_codes == SCRIP_FEED_CODE)]
+                    if len(tick_times) and (stats["last_tick_time"] or 0) < tick_times.max():
+                        stats["last_tick_time"] = int(tick_times.max())
+                message = dict(message, shard=index)
+        # Outside the lock, so a slow consumer holds up only the shard whose message it is handling
+        if self.on_message:
+            self.on_message(message)
+
+    def forward_error(self, index, error):
+        if self.on_error:
+            self.on_error(error)
+
+    def forward_open(self, index):
+        with self.lock:
+            first = not any(self.open_connections)
+            self.open_connections[index] += 1
+            if first and self.on_open:
+                self.on_open()
+
+    def forward_close(self, index):
+        with self.lock:
+            # A connection attempt that failed is closed without having opened
+            if not self.open_connections[index]:
+                return
+            self.open_connections[index] -= 1
+            if not any(self.open_connections) and self.on_close:
+                self.on_close()
+
+    def shard_lag(self):
+        """
+            Per shard: subscriptions, connection state, messages delivered, seconds since the last message
+            ("idle") and seconds between now and the newest trade time it delivered ("lag").
+        """
+        now = time.time()
+        report = []
+        for index, shard in enumerate(self.shards):
+            stats = self.stats[index]
+            report.append({"shard": index,
+                           "subscriptions": len(shard.subscriptions),
+                           "connected": shard.is_hsw_open == 1,
+                           "reconnects": shard.reconnect.reconnects,
+                           "messages": stats["messages"],
+                           "idle": None if stats["last_message"] is None else now - stats["last_message"],
+                           "lag": None if stats["last_tick_time"] is None else now - stats["last_tick_time"]})
+        return report
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+
+class PendingSnapshots:
+    """
+        Snapshot quote requests waiting for their SNAP reply on the HSM socket, keyed by (exchange_segment,
+        instrument_token).
+
+        Every request gets its own Future and deadline, so any number of callers can wait on the same
+        connection; a SNAP only resolves the futures of its own key and feed type ("sf", "if" or "dp") and
+        leaves every other request pending. A timer armed for the earliest deadline fails expired requests
+        with TimeoutError and drops them, so a reply that never comes does not hold on to its waiters.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.deadlines = []
+        self.sequence = itertools.count()
+        self.timer = None
+        self.timer_deadline = None
+
+    @staticmethod
+    def key(exchange_segment, instrument_token):
+        return exchange_segment, str(instrument_token)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __contains__(self, key):
+        return key in self.pending
+
+    def add(self, key, feed_type, timeout):
+        """Registers a request for key and returns the Future its SNAP reply is delivered to"""
+        future = Future()
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            expired = self.expire_locked(time.monotonic())
+            self.pending.setdefault(key, []).append((future, feed_type))
+            heapq.heappush(self.deadlines, (deadline, next(self.sequence), key, future))
+            self.arm_locked()
+        self.fail_expired(expired)
+        return future
+
+    def resolve(self, key, feed_type, result):
+        """Hands result to every request of key waiting for feed_type and returns how many there were"""
+        with self.lock:
+            waiters = self.pending.get(key)
+            if not waiters:
+                return 0
+            matched = [future for future, waiting_type in waiters if waiting_type == feed_type]
+            if not matched:
+                return 0
+            rest = [waiter for waiter in waiters if waiter[1] != feed_type]
+            if rest:
+                self.pending[key] = rest
+            else:
+                del self.pending[key]
+        for future in matched:
+            if not future.done():
+                future.set_result(result)
+        return len(matched)
+
+    def cancel(self, key, future):
+        """Drops one request, e.g. after its caller stopped waiting"""
+        with self.lock:
+            self.discard_locked(key, future)
+        future.cancel()
+
+    def expire(self):
+        with self.lock:
+            expired = self.expire_locked(time.monotonic())
+        self.fail_expired(expired)
+
+    def on_timer(self):
+        with self.lock:
+            if self.timer is threading.current_thread():
+                self.timer = None
+            expired = self.expire_locked(time.monotonic())
+            self.arm_locked()
+        self.fail_expired(expired)
+
+    def arm_locked(self):
+        """Makes sure a timer fires at the earliest deadline; one timer at a time, re-armed as it fires"""
+        if not self.deadlines:
+            return
+        deadline = self.deadlines[0][0]
+        if self.timer is not None:
+            if self.timer_deadline <= deadline:
+                return
+            self.timer.cancel()
+        self.timer = threading.Timer(max(0.0, deadline - time.monotonic()), self.on_timer)
+        self.timer.daemon = True
+        self.timer_deadline = deadline
+        self.timer.start()
+
+    def fail_all(self, error):
+        """Fails every pending request, used when the connection goes away"""
+        with self.lock:
+            waiters = [future for futures in self.pending.values() for future, _ in futures]
+            self.pending = {}
+            self.deadlines = []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        for future in waiters:
+            if not future.done():
+                future.set_exception(error)
+
+    def expire_locked(self, now):
+        expired = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, key, future = heapq.heappop(self.deadlines)
+            if not future.done() and self.discard_locked(key, future):
+                expired.append((key, future))
+        return expired
+
+    @staticmethod
+    def fail_expired(expired):
+        # Outside the lock, since done callbacks of the futures run right here
+        for key, future in expired:
+            if not future.done():
+                future.set_exception(TimeoutError("No snapshot received for " + "|".join(key)))
+
+    def discard_locked(self, key, future):
+        waiters = self.pending.get(key)
+        if not waiters:
+            return False
+        rest = [waiter for waiter in waiters if waiter[0] is not future]
+        if len(rest) == len(waiters):
+            return False
+        if rest:
+            self.pending[key] = rest
+        else:
+            del self.pending[key]
+        return True
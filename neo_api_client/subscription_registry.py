@@ -0,0 +1,87 @@
+from neo_api_client.channel_allocator import ChannelAllocator
+
+
+class SubscriptionRegistry:
+    """
+        Live feed subscriptions of one NeoWebSocket, keyed by (exchange_segment, instrument_token,
+        subscription_type), with a ChannelAllocator that places them on channels.
+
+        Each member is kept as the single-key dict {instrument_token: value} that the socket sends and
+        reports, so add, remove, lookup and channel membership are all dict operations. tokens counts the
+        subscriptions of every instrument token (as a string, like the "tk" field of the feed) for routing.
+    """
+
+    def __init__(self, channels=range(2, 17), channel_capacity=200):
+        self.allocator = ChannelAllocator(channels, channel_capacity)
+        self.entries = {}
+        self.tokens = {}
+
+    @staticmethod
+    def key(value):
+        return value['exchange_segment'], value['instrument_token'], value['subscription_type']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, value):
+        """Registers value and returns its {instrument_token: value} entry, or None if already subscribed"""
+        key = self.key(value)
+        if key in self.entries:
+            return None
+        entry = {value['instrument_token']: value}
+        self.entries[key] = entry
+        token = str(value['instrument_token'])
+        self.tokens[token] = self.tokens.get(token, 0) + 1
+        return entry
+
+    def assign(self, entries):
+        """
+            Places entries through the allocator and returns {channel: [entries]} of the channels they went to.
+            Entries left over once all channels are full stay registered without a channel.
+        """
+        out_channel_list = {}
+        for entry in entries:
+            value = next(iter(entry.values()))
+            channel_num = self.allocator.place(self.key(value), entry, value['subscription_type'])
+            if channel_num is not None:
+                out_channel_list.setdefault(channel_num, []).append(entry)
+        return out_channel_list
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.allocator.release(key)
+        token = str(key[1])
+        if self.tokens[token] > 1:
+            self.tokens[token] -= 1
+        else:
+            del self.tokens[token]
+        return entry
+
+    def has_token(self, token):
+        return token in self.tokens
+
+    def channel(self, key):
+        return self.allocator.channel_of.get(key)
+
+    def members(self, channel_num):
+        return list(self.allocator.members.get(channel_num, {}).values())
+
+    def channel_entries(self):
+        return {channel_num: list(members.values()) for channel_num, members in self.allocator.members.items()
+                if members}
+
+    def values(self):
+        return list(self.entries.values())
+
+    def clear(self):
+        self.entries = {}
+        self.allocator.clear()
+        self.tokens = {}
@@ -8,7 +8,7 @@ VERSION = "2.0.0"
 
 REQUIRES = ['bidict==0.22.1', 'certifi==2022.12.7', 'idna==2.10', 'numpy==2.1.0', 'pyjsparser==2.7.1', 'PyJWT==2.6.0',
             'python-dateutil==2.8.2', 'python-dotenv==1.0.0', 'requests==2.32.3', 'six==1.16.0', 'urllib3==1.26.14',
-            'websocket-client==1.8.0', 'websockets==8.1', 'pandas==2.2.3', 'asyncio==3.4.3']
+            'websocket-client==1.8.0', 'websockets==12.0', 'pandas==2.2.3', 'asyncio==3.4.3']
 
 setup(
     name=NAME,
@@ -13,6 +13,7 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from terminal.config import Config
+from terminal.feed_logging import feed_logging, get_logger, sample
 from terminal.auth_manager import AuthManager
 from terminal.order_manager import OrderManager
 from terminal.data_manager import DataManager
@@ -35,14 +36,16 @@ auth_manager = AuthManager()
 order_manager = OrderManager()
 data_manager = DataManager()
 ws_manager = WebSocketManager()
+log = get_logger("app")
 
 
 # ===== WebSocket Callbacks for Real-time UI Updates =====
 
-def on_price_update(data):
-    """Broadcast price updates to connected clients"""
-    print(f"[Flask] Emitting price_update: {data.get('instrument_token')} LTP={data.get('ltp')}")
-    socketio.emit('price_update', data, namespace='/')
+def on_price_delta(delta):
+    """Broadcast the changed price fields of one conflated batch to connected clients"""
+    if feed_logging.is_debug() and sample("emit"):
+        log.debug("[Flask] Emitting price_delta %d: %d instruments", delta["seq"], len(delta["updates"]))
+    socketio.emit('price_delta', delta, namespace='/')
 
 def on_depth_update(data):
     """Broadcast depth updates to connected clients"""
@@ -58,7 +61,7 @@ def on_connection_change(data):
 
 # Set callbacks
 ws_manager.set_callbacks(
-    on_price_update=on_price_update,
+    on_price_delta=on_price_delta,
     on_depth_update=on_depth_update,
     on_order_update=on_order_update,
     on_connection_change=on_connection_change
@@ -99,7 +102,7 @@ def subscribe():
         # Check for script names (legacy/frontend Search dependent)
         elif 'script_names' in data:
             full_names = data['script_names']
-            print(f"[API] Subscribe request for names: {full_names}")
+            log.info("[API] Subscribe request for names: %s", full_names)
             for script_name in full_names:
                  if "(" in script_name and ")" in script_name:
                     parts = script_name.split("(")
@@ -110,7 +113,7 @@ def subscribe():
              return jsonify({"error": "No valid tokens or script names provided"}), 400
 
         # Subscribe
-        print(f"[API] Subscribing to {len(tokens_to_subscribe)} tokens")
+        log.info("[API] Subscribing to %d tokens", len(tokens_to_subscribe))
         result = ws_manager.subscribe(
             instrument_tokens=tokens_to_subscribe,
             is_index=data.get('is_index', False),
@@ -119,7 +122,7 @@ def subscribe():
         return jsonify(result)
         
     except Exception as e:
-        print(f"[API] Subscribe error: {e}")
+        log.error("[API] Subscribe error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
@@ -464,6 +467,15 @@ def get_market_data():
     
     return jsonify(ws_manager.get_all_market_data())
 
+@app.route('/api/market-data/movers')
+def get_top_movers():
+    """Top gainers and losers: ?count=10&by=change_percent (any numeric market data column)"""
+    by = request.args.get('by', 'change_percent')
+    if by not in ws_manager.market_data_columns:
+        return jsonify({"success": False, "error": f"unknown column: {by}"}), 400
+    count = request.args.get('count', 10, type=int)
+    return jsonify(ws_manager.get_top_movers(max(1, min(count, 100)), by))
+
 @app.route('/api/market-depth')
 def get_market_depth():
     """Get market depth"""
@@ -527,12 +539,49 @@ def get_mode():
     })
 
 
+# ===== API Routes - Admin =====
+
+@app.route('/api/admin/debug', methods=['GET', 'POST'])
+def feed_debug():
+    """Get or switch feed debug tracing: POST {"enabled": true, "sample_interval": 1.0}"""
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            feed_logging.set_debug(bool(data.get('enabled')), data.get('sample_interval'))
+        except (TypeError, ValueError) as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        log.info("[Admin] Feed debug %s", "enabled" if feed_logging.is_debug() else "disabled")
+    return jsonify({"success": True, **feed_logging.status()})
+
+@app.route('/api/admin/conflation', methods=['GET', 'POST'])
+def price_conflation():
+    """Conflation stats of the price_updates stream; POST {"interval_ms": 200} changes the flush cadence"""
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            ws_manager.set_price_flush_interval(data['interval_ms'])
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"success": False, "error": f"interval_ms required: {e}"}), 400
+    return jsonify(ws_manager.get_conflation_stats())
+
+@app.route('/api/admin/backfill')
+def close_backfill():
+    """Stats of the batched close price backfill"""
+    return jsonify(ws_manager.get_backfill_stats())
+
+
 # ===== SocketIO Events =====
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     emit('connection_status', {'connected': True, 'paper_mode': Config.PAPER_TRADING})
+    emit('price_snapshot', ws_manager.get_price_snapshot())
+
+@socketio.on('resync')
+def handle_resync():
+    """Full price state for a client that detected a gap in the price_delta sequence"""
+    emit('price_snapshot', ws_manager.get_price_snapshot())
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -0,0 +1,167 @@
+# Kotak Trading Terminal - Close Price Backfill
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from terminal.feed_logging import get_logger
+
+log = get_logger("backfill")
+
+Instrument = Tuple[str, str]  # (exchange_segment, instrument_token)
+
+
+class CloseBackfill:
+    """
+    Fetches missing close prices (with open/high/low) in batches instead of one request per instrument.
+
+    request() queues an instrument; one worker thread waits window seconds to collect more, then hands the
+    queue to a bounded pool as batches of batch_size for fetch(instruments) -> {instrument: ohlc}. Each
+    returned ohlc with a close goes to apply(segment, token, ohlc). An instrument a batch did not return is
+    retried up to retries times, retry_delay seconds apart and doubling, and is then not requested again
+    for negative_ttl seconds. Queued and in-flight instruments are not queued twice.
+    """
+
+    def __init__(self, fetch: Callable[[List[Instrument]], Dict[Instrument, dict]],
+                 apply: Callable[[str, str, dict], None], window: float = 0.25, batch_size: int = 50,
+                 workers: int = 2, retries: int = 2, retry_delay: float = 2.0, negative_ttl: float = 60.0):
+        self._fetch = fetch
+        self._apply = apply
+        self.window = window
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.negative_ttl = negative_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="close-backfill")
+        self._pending: Dict[Instrument, Tuple[int, float]] = {}  # -> (attempt, not before)
+        self._in_flight: Dict[Instrument, int] = {}  # -> attempt
+        self._failed_until: Dict[Instrument, float] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Stats
+        self.requested = 0
+        self.batches = 0
+        self.filled = 0
+        self.retried = 0
+        self.failed = 0
+        self.negative_hits = 0
+
+    def request(self, exchange_segment: str, instrument_token: str):
+        """Queues an instrument whose close price is missing; cheap to call on every tick"""
+        instrument = (exchange_segment, instrument_token)
+        if instrument in self._pending or instrument in self._in_flight:
+            return
+        if self._failed_until.get(instrument, 0.0) > time.monotonic():
+            self.negative_hits += 1
+            return
+        with self._lock:
+            if instrument in self._pending or instrument in self._in_flight:
+                return
+            self._failed_until.pop(instrument, None)
+            self._pending[instrument] = (0, 0.0)
+            self.requested += 1
+            self._start_locked()
+        self._wakeup.set()
+
+    def fetch_now(self, instruments: Iterable[Instrument], timeout: Optional[float] = None):
+        """
+        Fetches instruments right away on the pool and waits for them, e.g. the first quotes of a subscription.
+        Instruments already in flight are left to that fetch; misses are retried like queued ones.
+        """
+        with self._lock:
+            batch = [instrument for instrument in dict.fromkeys(instruments) if instrument not in self._in_flight]
+            for instrument in batch:
+                self._pending.pop(instrument, None)
+                self._failed_until.pop(instrument, None)
+                self._in_flight[instrument] = 0
+            self.requested += len(batch)
+        wait(self._submit(batch), timeout)
+
+    def _submit(self, instruments: List[Instrument]) -> list:
+        return [self._pool.submit(self._fetch_batch, instruments[start:start + self.batch_size])
+                for start in range(0, len(instruments), self.batch_size)]
+
+    def _start_locked(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="close-backfill", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        timeout = None
+        while True:
+            if self._wakeup.wait(timeout):
+                # A new request: give its neighbours a window to arrive and share the batch
+                time.sleep(self.window)
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                ready = [instrument for instrument, (_, not_before) in self._pending.items() if not_before <= now]
+                for instrument in ready:
+                    self._in_flight[instrument] = self._pending.pop(instrument)[0]
+                next_due = min((not_before for _, not_before in self._pending.values()), default=None)
+            if ready:
+                self._submit(ready)
+            timeout = max(0.0, next_due - now) if next_due is not None else None
+
+    def _fetch_batch(self, instruments: List[Instrument]):
+        try:
+            results = self._fetch(instruments)
+        except Exception as e:
+            log.warning("[Backfill] Quotes for %d instruments failed: %s", len(instruments), e)
+            results = {}
+
+        missed = []
+        filled = 0
+        for instrument in instruments:
+            ohlc = results.get(instrument)
+            if ohlc and ohlc.get("close", 0) > 0:
+                try:
+                    self._apply(instrument[0], instrument[1], ohlc)
+                    filled += 1
+                except Exception as e:
+                    log.warning("[Backfill] Applying close of %s failed: %s", instrument, e)
+            else:
+                missed.append(instrument)
+
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            self.filled += filled
+            attempts = {instrument: self._in_flight.pop(instrument, 0) + 1 for instrument in instruments}
+            for instrument in missed:
+                attempt = attempts[instrument]
+                if attempt > self.retries:
+                    self._failed_until[instrument] = now + self.negative_ttl
+                    self.failed += 1
+                else:
+                    self._pending[instrument] = (attempt, now + self.retry_delay * 2 ** (attempt - 1))
+                    self.retried += 1
+            if missed:
+                self._start_locked()
+        if missed:
+            log.debug("[Backfill] %d of %d instruments without a close", len(missed), len(instruments))
+            self._wakeup.set()
+
+    def forget(self, exchange_segment: str, instrument_token: str):
+        """Drops a queued instrument and its negative cache entry, e.g. after unsubscribing"""
+        with self._lock:
+            self._pending.pop((exchange_segment, instrument_token), None)
+            self._failed_until.pop((exchange_segment, instrument_token), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "requested": self.requested,
+                "batches": self.batches,
+                "filled": self.filled,
+                "retried": self.retried,
+                "failed": self.failed,
+                "negative_cached": sum(1 for until in self._failed_until.values() if until > now),
+                "negative_hits": self.negative_hits,
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight)
+            }
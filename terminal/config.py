@@ -37,6 +37,12 @@ class Config:
     # WebSocket Settings
     WS_RECONNECT_DELAY = 5  # seconds
     WS_PING_INTERVAL = 30   # seconds
+    PRICE_FLUSH_INTERVAL_MS = int(os.getenv("TERMINAL_PRICE_FLUSH_MS", "200"))  # Conflated price_updates cadence
+    
+    # Logging
+    LOG_LEVEL = os.getenv("TERMINAL_LOG_LEVEL", "INFO")
+    LOG_QUEUE_SIZE = int(os.getenv("TERMINAL_LOG_QUEUE_SIZE", "10000"))           # Records waiting to be written
+    LOG_SAMPLE_INTERVAL = float(os.getenv("TERMINAL_LOG_SAMPLE_INTERVAL", "1.0"))  # Seconds between debug lines per token
     
     # Paths
     BASE_DIR = Path(__file__).parent
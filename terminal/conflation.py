@@ -0,0 +1,110 @@
+# Kotak Trading Terminal - Tick Conflation
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from terminal.feed_logging import get_logger
+
+log = get_logger("conflation")
+
+
+class Conflator:
+    """
+    Keeps only the latest value per key and hands the changed keys to flush() as one batch every interval
+    seconds, from a background thread.
+
+    A push for a key that is already waiting replaces its value; the replaced one is counted as a dropped
+    intermediate. Values are passed to flush as pushed, so a mutable object (e.g. MarketData) is read in its
+    state at flush time.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], None], interval: float = 0.2):
+        self._flush = flush
+        self.interval = interval
+        self._pending: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Stats
+        self.ticks_in = 0
+        self.updates_out = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_batch = 0
+        self.max_batch = 0
+        self.last_flush_ms = 0.0
+
+    def push(self, key: Hashable, value: Any):
+        with self._lock:
+            self.ticks_in += 1
+            if key in self._pending:
+                self.dropped += 1
+            self._pending[key] = value
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="price-conflation", daemon=True)
+                self._thread.start()
+
+    def discard(self, key: Hashable):
+        """Forgets a waiting value, e.g. after unsubscribing"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self):
+        """Emits everything waiting now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        started = time.perf_counter()
+        batch = list(pending.values())
+        try:
+            self._flush(batch)
+        finally:
+            self.flushes += 1
+            self.updates_out += len(batch)
+            self.last_batch = len(batch)
+            self.max_batch = max(self.max_batch, len(batch))
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._thread = None
+        self._wakeup.clear()
+        self.flush()
+
+    def _run(self):
+        next_flush = time.monotonic() + self.interval
+        while not self._stopped:
+            self._wakeup.wait(max(0.0, next_flush - time.monotonic()))
+            if self._stopped:
+                break
+            # Fixed cadence; a slow flush shortens the next wait rather than shifting every later one
+            next_flush = max(next_flush + self.interval, time.monotonic())
+            try:
+                self.flush()
+            except Exception as e:
+                log.exception("[Conflation] Flush failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "interval_ms": round(self.interval * 1000),
+            "ticks_in": self.ticks_in,
+            "updates_out": self.updates_out,
+            "dropped_intermediate": self.dropped,
+            "conflation_ratio": round(self.ticks_in / self.updates_out, 2) if self.updates_out else None,
+            "flushes": self.flushes,
+            "pending": pending,
+            "last_batch": self.last_batch,
+            "max_batch": self.max_batch,
+            "last_flush_ms": round(self.last_flush_ms, 3)
+        }
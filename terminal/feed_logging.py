@@ -0,0 +1,130 @@
+# Kotak Trading Terminal - Feed Logging
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from terminal.config import Config
+
+ROOT_LOGGER = "terminal"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records when the queue is full instead of blocking the caller"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TokenSampler:
+    """
+    Per-token rate limit for feed log lines.
+
+    allow(token) is True at most once per interval seconds for each token; suppressed counts the refusals.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.suppressed = 0
+        self._next_allowed: Dict[str, float] = {}
+
+    def allow(self, token: str) -> bool:
+        now = time.monotonic()
+        if now < self._next_allowed.get(token, 0.0):
+            self.suppressed += 1
+            return False
+        self._next_allowed[token] = now + self.interval
+        return True
+
+    def reset(self):
+        self._next_allowed = {}
+
+
+class FeedLogging:
+    """
+    Logging for the terminal: every "terminal.*" logger hands its records to a bounded queue, and a
+    QueueListener thread writes them, so the websocket thread never waits on stdout.
+
+    Feed handlers log per-tick lines at DEBUG with %-style arguments (formatted only when written), guarded by
+    is_debug() and sampled per token, so with debug off a tick costs one level check.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.sampler = TokenSampler(Config.LOG_SAMPLE_INTERVAL)
+        self.logger = logging.getLogger(ROOT_LOGGER)
+        self.base_level = logging.getLevelName(Config.LOG_LEVEL.upper())
+        if not isinstance(self.base_level, int):
+            self.base_level = logging.INFO
+
+    def start(self):
+        """Installs the queue handler and starts the writer thread (once)"""
+        with self._lock:
+            if self.listener is not None:
+                return
+            stream = logging.StreamHandler(sys.stdout)
+            stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)-5s %(name)s %(message)s"))
+            self.listener = logging.handlers.QueueListener(self.queue, stream, respect_handler_level=True)
+            self.logger.addHandler(self.handler)
+            self.logger.setLevel(self.base_level)
+            self.logger.propagate = False
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        with self._lock:
+            if self.listener is None:
+                return
+            self.listener.stop()
+            self.logger.removeHandler(self.handler)
+            self.listener = None
+
+    def is_debug(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    def set_debug(self, enabled: bool, sample_interval: Optional[float] = None):
+        """Switches feed debug tracing at runtime"""
+        if sample_interval is not None:
+            self.sampler.interval = max(0.0, float(sample_interval))
+        self.sampler.reset()
+        self.logger.setLevel(logging.DEBUG if enabled else self.base_level)
+
+    def status(self) -> dict:
+        return {
+            "debug": self.is_debug(),
+            "level": logging.getLevelName(self.logger.level),
+            "sample_interval": self.sampler.interval,
+            "suppressed": self.sampler.suppressed,
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped
+        }
+
+
+feed_logging = FeedLogging()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the terminal hierarchy, e.g. get_logger("websocket") -> "terminal.websocket" """
+    feed_logging.start()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def sample(token: str) -> bool:
+    """True when a per-tick debug line for token may be written now"""
+    return feed_logging.sampler.allow(token)
@@ -0,0 +1,274 @@
+# Kotak Trading Terminal - Market Data Store
+
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# (column, API field, dtype), in the order market data has always been serialized
+FIELDS = (
+    ("ltp", "ltp", np.float64),
+    ("last_traded_qty", "last_traded_qty", np.int64),
+    ("volume", "volume", np.int64),
+    ("open_price", "open", np.float64),
+    ("high_price", "high", np.float64),
+    ("low_price", "low", np.float64),
+    ("close_price", "close", np.float64),
+    ("change", "change", np.float64),
+    ("change_percent", "change_percent", np.float64),
+    ("bid_price", "bid_price", np.float64),
+    ("ask_price", "ask_price", np.float64),
+    ("bid_qty", "bid_qty", np.int64),
+    ("ask_qty", "ask_qty", np.int64),
+    ("open_interest", "open_interest", np.int64),
+    ("total_buy_qty", "total_buy_qty", np.int64),
+    ("total_sell_qty", "total_sell_qty", np.int64),
+    ("lower_circuit", "lower_circuit", np.float64),
+    ("upper_circuit", "upper_circuit", np.float64),
+    ("week_52_high", "week_52_high", np.float64),
+    ("week_52_low", "week_52_low", np.float64),
+)
+
+RECORD_FIELDS = ("instrument_token", "exchange_segment", "trading_symbol",
+                 *(field for _, field, _ in FIELDS), "last_update")
+
+# Slot 0 is never handed out: freed rows are pointed at it, so a late write through a stale row lands nowhere
+DEAD_SLOT = 0
+
+
+class MarketData:
+    """
+    Real-time market data for an instrument: a view of its slot in a MarketDataStore.
+
+    Field attributes read and write the store's columns, so code holding a row sees every tick in place.
+    Writes hold the store's lock, so one from another thread (e.g. a backfilled close) is not lost to a grow.
+    last_update is a time.monotonic() reading; records carry it as local datetime.
+    """
+
+    __slots__ = ("store", "slot", "key", "instrument_token", "exchange_segment")
+
+    def __init__(self, store: 'MarketDataStore', slot: int, instrument_token: str, exchange_segment: str):
+        self.store = store
+        self.slot = slot
+        self.instrument_token = instrument_token
+        self.exchange_segment = exchange_segment
+        self.key = f"{instrument_token}_{exchange_segment}"
+
+    @property
+    def trading_symbol(self) -> str:
+        return self.store.symbols[self.slot]
+
+    @trading_symbol.setter
+    def trading_symbol(self, value: str):
+        self.store.symbols[self.slot] = value
+
+    @property
+    def last_update(self) -> float:
+        return self.store.updated[self.slot].item()
+
+    @last_update.setter
+    def last_update(self, value: float):
+        store = self.store
+        with store._lock:
+            store.updated[self.slot] = value
+
+
+def _column_property(name: str) -> property:
+    def get(row: MarketData):
+        return row.store.columns[name][row.slot].item()
+
+    def set(row: MarketData, value):
+        # The column is looked up under the lock: a grow swaps it for a copy
+        store = row.store
+        with store._lock:
+            store.columns[name][row.slot] = value
+
+    return property(get, set)
+
+
+for _name, _, _ in FIELDS:
+    setattr(MarketData, _name, _column_property(_name))
+
+
+class MarketDataStore:
+    """
+    Market data of the whole subscribed universe in preallocated NumPy columns, one per field.
+
+    Each (segment, token) gets a dense slot, reused after free(); the slot is the row's integer ID, and rows
+    are found through a segment -> token index of interned strings, so a tick's lookup allocates nothing.
+    The columns double in size when full: under the lock, like every write, so none lands in a column
+    that was already copied.
+    Ticks write their fields into the row's slot, and snapshots and cross-sectional queries (movers) slice
+    the columns of all live slots at once instead of walking one object per instrument.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self.capacity = max(2, capacity)
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(self.capacity, dtype) for name, _, dtype in FIELDS}
+        self.updated = np.zeros(self.capacity, np.float64)  # time.monotonic() of the last write
+        self.live = np.zeros(self.capacity, bool)
+        self.symbols: List[str] = [""] * self.capacity
+        self.by_slot: List[Optional[MarketData]] = [None] * self.capacity
+        self._rows: Dict[str, Dict[str, MarketData]] = {}
+        self._count = 0
+        self._free: List[int] = []
+        self._next_slot = DEAD_SLOT + 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, exchange_segment: str, instrument_token: str) -> Optional[MarketData]:
+        tokens = self._rows.get(exchange_segment)
+        return tokens.get(instrument_token) if tokens else None
+
+    def row(self, exchange_segment: str, instrument_token: str) -> MarketData:
+        """The instrument's row, assigning it a slot on first use"""
+        tokens = self._rows.get(exchange_segment)
+        md = tokens.get(instrument_token) if tokens else None
+        if md is not None:
+            return md
+        with self._lock:
+            exchange_segment = sys.intern(exchange_segment)
+            instrument_token = sys.intern(instrument_token)
+            tokens = self._rows.setdefault(exchange_segment, {})
+            md = tokens.get(instrument_token)
+            if md is not None:
+                return md
+            if self._free:
+                slot = self._free.pop()
+            else:
+                if self._next_slot == self.capacity:
+                    self._grow()
+                slot = self._next_slot
+                self._next_slot += 1
+            md = MarketData(self, slot, instrument_token, exchange_segment)
+            self.updated[slot] = time.monotonic()
+            self.live[slot] = True
+            self.by_slot[slot] = md
+            tokens[instrument_token] = md
+            self._count += 1
+            return md
+
+    def free(self, exchange_segment: str, instrument_token: str):
+        """Drops the instrument and zeroes its slot for reuse"""
+        with self._lock:
+            md = self._rows.get(exchange_segment, {}).pop(instrument_token, None)
+            if md is None:
+                return
+            self._count -= 1
+            slot = md.slot
+            for column in self.columns.values():
+                column[slot] = 0
+            self.updated[slot] = 0
+            self.live[slot] = False
+            self.symbols[slot] = ""
+            self.by_slot[slot] = None
+            md.slot = DEAD_SLOT
+            self._free.append(slot)
+
+    def _grow(self):
+        # Called with the lock held
+        capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.capacity] = column
+            self.columns[name] = grown
+        for name in ("updated", "live"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.capacity] = column
+            setattr(self, name, grown)
+        self.symbols.extend([""] * (capacity - self.capacity))
+        self.by_slot.extend([None] * (capacity - self.capacity))
+        self.capacity = capacity
+
+    def update(self, md: MarketData, data: dict, fields: Iterable[Tuple[str, str]]):
+        """
+        Writes the feed values of data into the row: fields maps feed keys to columns, and only keys present
+        in data are written (a present but empty value as 0). Stamps the row's last update.
+        """
+        with self._lock:
+            columns = self.columns
+            slot = md.slot
+            for source, name in fields:
+                if source in data:
+                    columns[name][slot] = data[source] or 0
+            self.updated[slot] = time.monotonic()
+
+    def write(self, md: MarketData, values: Dict[str, Any]):
+        """Writes column values into the row under one lock, and stamps its last update"""
+        with self._lock:
+            columns = self.columns
+            slot = md.slot
+            for name, value in values.items():
+                columns[name][slot] = value
+            self.updated[slot] = time.monotonic()
+
+    # ===== Serialization =====
+
+    def records(self, rows: List[MarketData], key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        API dicts of rows, read with one fancy index per column; rows freed meanwhile are skipped.
+
+        With key, each dict also carries the row's "token_segment" key under that name.
+        """
+        rows = [md for md in rows if md.slot != DEAD_SLOT]
+        if not rows:
+            return []
+        slots = np.fromiter((md.slot for md in rows), np.intp, len(rows))
+        return self._records(slots, rows, key)
+
+    def record(self, md: MarketData) -> Optional[Dict[str, Any]]:
+        records = self.records([md])
+        return records[0] if records else None
+
+    def snapshot(self, key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """API dicts of every instrument, in slot order"""
+        with self._lock:
+            slots = np.flatnonzero(self.live)
+            rows = [self.by_slot[slot] for slot in slots]
+        return self._records(slots, rows, key)
+
+    def movers(self, count: int = 10, by: str = "change_percent") -> Dict[str, List[Dict[str, Any]]]:
+        """Top count gainers and losers by a column, among instruments that have traded and have a close"""
+        with self._lock:
+            columns = self.columns
+            slots = np.flatnonzero(self.live & (columns["ltp"] > 0) & (columns["close_price"] > 0))
+            order = np.argsort(columns[by][slots], kind="stable")
+            gainers = slots[order[::-1][:count]]
+            losers = slots[order[:count]]
+            gainer_rows = [self.by_slot[slot] for slot in gainers]
+            loser_rows = [self.by_slot[slot] for slot in losers]
+        return {
+            "gainers": self._records(gainers, gainer_rows),
+            "losers": self._records(losers, loser_rows)
+        }
+
+    def _records(self, slots: np.ndarray, rows: List[MarketData], key: Optional[str] = None) -> List[Dict[str, Any]]:
+        columns = [
+            [md.instrument_token for md in rows],
+            [md.exchange_segment for md in rows],
+            [self.symbols[slot] for slot in slots.tolist()],
+            *(self.columns[name][slots].tolist() for name, _, _ in FIELDS),
+            local_isoformat(self.updated[slots])
+        ]
+        names = RECORD_FIELDS
+        if key:
+            columns.append([md.key for md in rows])
+            names += (key,)
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def to_datetime(monotonic: float) -> datetime:
+    """Local wall-clock time of a time.monotonic() reading"""
+    return datetime.fromtimestamp(monotonic + time.time() - time.monotonic())
+
+
+def local_isoformat(monotonic: np.ndarray) -> List[str]:
+    """to_datetime(t).isoformat() of time.monotonic() readings, for the whole array at once"""
+    local = (monotonic + (time.time() - time.monotonic() + time.localtime().tm_gmtoff)) * 1e6
+    return np.datetime_as_string(local.astype("datetime64[us]"), unit="us").tolist()
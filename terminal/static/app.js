@@ -12,7 +12,9 @@ const state = {
     positions: [],
     holdings: [],
     trades: [],
-    transactionType: 'B'
+    transactionType: 'B',
+    prices: {},       // key -> latest full price update, merged from price_delta events
+    priceSeq: null    // seq of the last price_delta applied (null until the first snapshot)
 };
 
 // ===== Socket.IO Connection =====
@@ -28,13 +30,54 @@ socket.on('disconnect', () => {
     updateConnectionStatus(false);
 });
 
-socket.on('price_update', (data) => {
-    console.log('[Socket.IO] price_update received:', data);
+// Price updates arrive conflated, as the fields that changed since the previous batch; keys in
+// "removed" were unsubscribed. A full price_snapshot comes on connect and after a resync request;
+// a gap in seq asks for one.
+socket.on('price_snapshot', (snapshot) => {
+    state.prices = {};
+    state.priceSeq = snapshot.seq;
+    snapshot.data.forEach((data) => {
+        state.prices[data.k] = data;
+        applyPriceUpdate(data);
+    });
+});
+
+socket.on('price_delta', (delta) => {
+    if (state.priceSeq === null || delta.seq <= state.priceSeq) {
+        return;  // Waiting for the first snapshot, or already contained in it
+    }
+    const gap = delta.seq !== state.priceSeq + 1;
+    state.priceSeq = delta.seq;
+    let unknown = false;
+    delta.updates.forEach((update) => {
+        const merged = Object.assign(state.prices[update.k] || {}, update);
+        state.prices[update.k] = merged;
+        if (merged.instrument_token === undefined) {
+            unknown = true;  // Fields of an instrument we never had in full
+            return;
+        }
+        applyPriceUpdate(merged);
+    });
+    (delta.removed || []).forEach((key) => {
+        delete state.prices[key];
+    });
+    if (gap || unknown) {
+        socket.emit('resync');
+    }
+});
+
+socket.on('price_updates', (batch) => {
+    batch.forEach(applyPriceUpdate);
+});
+
+socket.on('price_update', applyPriceUpdate);
+
+function applyPriceUpdate(data) {
     updateWatchlistPrice(data);
     if (state.selectedSymbol === `${data.instrument_token}_${data.exchange_segment}`) {
         updatePriceInfo(data);
     }
-});
+}
 
 socket.on('depth_update', (data) => {
     if (state.selectedSymbol === `${data.instrument_token}_${data.exchange_segment}`) {
@@ -1,67 +1,69 @@
 # Kotak Trading Terminal - WebSocket Manager
 
+import sys
 import threading
 import json
+import logging
 import time
-from typing import Optional, Dict, List, Callable, Any
-from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Callable, Any, Set, Tuple
 from datetime import datetime
 from collections import defaultdict
 
 from terminal.auth_manager import AuthManager
+from terminal.backfill import CloseBackfill
 from terminal.config import Config
+from terminal.conflation import Conflator
+from terminal.feed_logging import get_logger, sample
+from terminal.market_store import MarketData, MarketDataStore, to_datetime
 
-# Module-level load time - resets on hot reload
-_MODULE_LOAD_TIME = time.time()
-print(f"[WebSocket] Module loaded at {_MODULE_LOAD_TIME}")
+log = get_logger("websocket")
 
 
-@dataclass
-class MarketData:
-    """Real-time market data for an instrument"""
-    instrument_token: str
-    exchange_segment: str
-    trading_symbol: str = ""
-    ltp: float = 0.0
-    last_traded_qty: int = 0
-    volume: int = 0
-    open_price: float = 0.0
-    high_price: float = 0.0
-    low_price: float = 0.0
-    close_price: float = 0.0
-    change: float = 0.0
-    change_percent: float = 0.0
-    bid_price: float = 0.0
-    ask_price: float = 0.0
-    bid_qty: int = 0
-    ask_qty: int = 0
-    open_interest: int = 0
-    total_buy_qty: int = 0
-    total_sell_qty: int = 0
-    lower_circuit: float = 0.0
-    upper_circuit: float = 0.0
-    week_52_high: float = 0.0
-    week_52_low: float = 0.0
-    last_update: datetime = field(default_factory=datetime.now)
+# Feed keys of price ticks -> MarketDataStore columns
+STOCK_FEED_FIELDS = (
+    ("ltq", "last_traded_qty"), ("v", "volume"), ("op", "open_price"), ("h", "high_price"),
+    ("lo", "low_price"), ("c", "close_price"), ("cng", "change"), ("nc", "change_percent"),
+    ("bp", "bid_price"), ("sp", "ask_price"), ("bq", "bid_qty"), ("sq", "ask_qty"),
+    ("oi", "open_interest"), ("tbq", "total_buy_qty"), ("tsq", "total_sell_qty"),
+    ("lcl", "lower_circuit"), ("ucl", "upper_circuit"), ("yh", "week_52_high"), ("yl", "week_52_low")
+)
+INDEX_FEED_FIELDS = (
+    ("iv", "ltp"), ("ic", "close_price"), ("highPrice", "high_price"), ("lowPrice", "low_price"),
+    ("openingPrice", "open_price"), ("cng", "change"), ("nc", "change_percent")
+)
+
+
+# Feed keys (price, quantity, orders) of the five depth levels
+BID_DEPTH_KEYS = tuple((f"bp{n if n > 1 else ''}", f"bq{n if n > 1 else ''}", f"bno{n}") for n in range(1, 6))
+ASK_DEPTH_KEYS = tuple((f"sp{n if n > 1 else ''}", f"bs{n if n > 1 else ''}", f"sno{n}") for n in range(1, 6))
+
+
+def instrument_key(token_info: Dict[str, Any]) -> Tuple[str, str]:
+    """Interned (exchange_segment, instrument_token) of a subscription item, the key of the store and backfill"""
+    return sys.intern(token_info['exchange_segment']), sys.intern(str(token_info['instrument_token']))
 
 
-@dataclass
 class DepthLevel:
     """Single level of market depth"""
-    price: float = 0.0
-    quantity: int = 0
-    orders: int = 0
+    __slots__ = ("price", "quantity", "orders")
+    
+    def __init__(self, price: float = 0.0, quantity: int = 0, orders: int = 0):
+        self.price = price
+        self.quantity = quantity
+        self.orders = orders
 
 
-@dataclass
 class MarketDepth:
-    """Market depth (order book) data"""
-    instrument_token: str
-    exchange_segment: str
-    trading_symbol: str = ""
-    bids: List[DepthLevel] = field(default_factory=list)
-    asks: List[DepthLevel] = field(default_factory=list)
-    last_update: datetime = field(default_factory=datetime.now)
+    """Market depth (order book) data; the levels are updated in place and last_update is time.monotonic()"""
+    __slots__ = ("instrument_token", "exchange_segment", "trading_symbol", "bids", "asks", "last_update")
+    
+    def __init__(self, instrument_token: str, exchange_segment: str, trading_symbol: str = ""):
+        self.instrument_token = instrument_token
+        self.exchange_segment = exchange_segment
+        self.trading_symbol = trading_symbol
+        self.bids = [DepthLevel() for _ in BID_DEPTH_KEYS]
+        self.asks = [DepthLevel() for _ in ASK_DEPTH_KEYS]
+        self.last_update = time.monotonic()
 
 
 class WebSocketManager:
@@ -88,17 +90,20 @@ class WebSocketManager:
         self._auth_manager = AuthManager()
         
         # Subscriptions
-        self._subscribed_tokens: Dict[str, dict] = {}  # key -> {instrument_token, exchange_segment}
-        self._depth_tokens: set = set()
-        self._index_tokens: set = set()
+        # Keyed by interned (exchange_segment, instrument_token), like the store; md.key is only the UI's key
+        self._subscribed_tokens: Dict[Tuple[str, str], dict] = {}  # -> {instrument_token, exchange_segment}
+        self._depth_tokens: Set[Tuple[str, str]] = set()
+        self._index_tokens: Set[Tuple[str, str]] = set()
         
         # Data storage
-        self._market_data: Dict[str, MarketData] = {}
-        self._market_depth: Dict[str, MarketDepth] = {}
+        self._market_data = MarketDataStore()
+        self._market_depth: Dict[str, Dict[str, MarketDepth]] = {}  # segment -> token -> depth
         self._order_updates: List[dict] = []
         
         # Callbacks for UI updates
         self._on_price_update: Optional[Callable] = None
+        self._on_price_updates: Optional[Callable] = None
+        self._on_price_delta: Optional[Callable] = None
         self._on_depth_update: Optional[Callable] = None
         self._on_order_update: Optional[Callable] = None
         self._on_connection_change: Optional[Callable] = None
@@ -108,6 +113,19 @@ class WebSocketManager:
         self._is_order_feed_connected = False
         self._sdk_callbacks_set = False
         
+        # Price ticks are conflated per instrument and sent to the UI in batches
+        self._price_conflator = Conflator(self._flush_prices, Config.PRICE_FLUSH_INTERVAL_MS / 1000)
+        
+        # Delta stream: field values last sent per instrument, and the batch sequence number
+        self._price_lock = threading.Lock()
+        self._emitted_prices: Dict[str, dict] = {}
+        self._price_seq = 0
+        self._delta_fields_sent = 0
+        self._delta_fields_total = 0
+        
+        # Missing close prices are fetched in batches by one worker, shared with subscribe()
+        self._close_backfill = CloseBackfill(self._fetch_closes, self._apply_close)
+        
         self._initialized = True
     
     def _setup_sdk_callbacks(self):
@@ -121,13 +139,15 @@ class WebSocketManager:
         
         # Set callbacks on the NeoAPI client
         # These are called by the SDK's internal __on_message, __on_error, etc.
+        # Feed values arrive as floats/ints, so the handlers below skip str->number parsing
+        client.native_output = True
         client.on_message = self._on_message
         client.on_error = self._on_error
         client.on_open = self._on_open
         client.on_close = self._on_close
         
         self._sdk_callbacks_set = True
-        print("[WebSocket] SDK callbacks registered")
+        log.info("[WebSocket] SDK callbacks registered")
         return True
     
     @property
@@ -138,6 +158,10 @@ class WebSocketManager:
     def is_order_feed_connected(self) -> bool:
         return self._is_order_feed_connected
     
+    @property
+    def market_data_columns(self) -> List[str]:
+        return list(self._market_data.columns)
+    
     # ===== Callback Registration =====
     
     def set_callbacks(
@@ -145,11 +169,25 @@ class WebSocketManager:
         on_price_update: Optional[Callable] = None,
         on_depth_update: Optional[Callable] = None,
         on_order_update: Optional[Callable] = None,
-        on_connection_change: Optional[Callable] = None
+        on_connection_change: Optional[Callable] = None,
+        on_price_updates: Optional[Callable] = None,
+        on_price_delta: Optional[Callable] = None
     ):
-        """Set callback functions for WebSocket events"""
+        """
+        Set callback functions for WebSocket events.
+        
+        on_price_delta receives each flush as {"seq", "t", "updates"}, where an update holds the instrument key
+        "k" and only the fields that changed since the previous batch (all fields the first time); a delta with
+        "removed" lists the keys of instruments that were unsubscribed. Without it,
+        on_price_updates receives the full price updates of each flush as one list, or on_price_update is
+        called once per instrument.
+        """
         if on_price_update:
             self._on_price_update = on_price_update
+        if on_price_updates:
+            self._on_price_updates = on_price_updates
+        if on_price_delta:
+            self._on_price_delta = on_price_delta
         if on_depth_update:
             self._on_depth_update = on_depth_update
         if on_order_update:
@@ -167,8 +205,9 @@ class WebSocketManager:
             else:
                 data = message
             
-            # DEBUG: Log all incoming messages
-            print(f"[WS MESSAGE] Received: {str(data)[:300]}")
+            # Sampled message trace; the level check is all it costs while debug is off
+            if log.isEnabledFor(logging.DEBUG) and sample("*"):
+                log.debug("[WS MESSAGE] Received: %.300s", data)
             
             # Handle nested format from Kotak WebSocket: {'type': 'stock_feed', 'data': [...]}
             msg_type = data.get("type", "")
@@ -204,26 +243,24 @@ class WebSocketManager:
                 self._handle_stock_feed(data)
                 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"WebSocket message error: {e}", flush=True)
+            log.exception("WebSocket message error: %s", e)
     
     def _on_error(self, error):
         """Handle WebSocket error"""
-        print(f"[WS ERROR] {error}")
+        log.error("[WS ERROR] %s", error)
         if self._on_connection_change:
             self._on_connection_change({"connected": False, "error": str(error)})
     
     def _on_open(self, message=None):
         """Handle WebSocket connection open"""
-        print(f"[WS OPEN] WebSocket connected! Message: {message}")
+        log.info("[WS OPEN] WebSocket connected! Message: %s", message)
         self._is_connected = True
         if self._on_connection_change:
             self._on_connection_change({"connected": True, "message": "Connected"})
     
     def _on_close(self, message=None):
         """Handle WebSocket connection close"""
-        print(f"[WS CLOSE] WebSocket closed. Message: {message}")
+        log.info("[WS CLOSE] WebSocket closed. Message: %s", message)
         self._is_connected = False
         if self._on_connection_change:
             self._on_connection_change({"connected": False, "message": "Disconnected"})
@@ -235,91 +272,49 @@ class WebSocketManager:
         
         if not token or not exchange:
             return
-            
-        key = f"{token}_{exchange}"
         
-        if key not in self._market_data:
-            self._market_data[key] = MarketData(
-                instrument_token=token,
-                exchange_segment=exchange
-            )
-        
-        md = self._market_data[key]
+        md = self._market_data.row(exchange, token)
+        key = md.key
         
         # Update fields from feed
-        md.trading_symbol = data.get("ts", md.trading_symbol)
+        if "ts" in data:
+            md.trading_symbol = data["ts"]
         
         # Get LTP - may be explicit or calculated from bid/ask
         new_ltp = data.get("ltp")
         bp = data.get("bp")
         sp = data.get("sp")
+        trace = log.isEnabledFor(logging.DEBUG) and sample(key)
         
-        # DEBUG: Log what we found
-        if bp or sp or new_ltp:
-            print(f"[PRICE DEBUG] Token {token}: ltp={new_ltp}, bp={bp}, sp={sp}")
+        if trace and (bp or sp or new_ltp):
+            log.debug("[PRICE DEBUG] Token %s: ltp=%s, bp=%s, sp=%s", token, new_ltp, bp, sp)
         
         if new_ltp:
-            md.ltp = float(new_ltp)
+            md.ltp = new_ltp
         elif bp and sp:
-            md.ltp = (float(bp) + float(sp)) / 2
+            md.ltp = (bp + sp) / 2
         elif bp:
-            md.ltp = float(bp)
+            md.ltp = bp
         elif sp:
-            md.ltp = float(sp)
-        
-        md.last_traded_qty = int(data.get("ltq", md.last_traded_qty) or 0)
-        md.volume = int(data.get("v", md.volume) or 0)
-        md.open_price = float(data.get("op", md.open_price) or 0)
-        md.high_price = float(data.get("h", md.high_price) or 0)
-        md.low_price = float(data.get("lo", md.low_price) or 0)
-        md.close_price = float(data.get("c", md.close_price) or 0)
-        md.change = float(data.get("cng", md.change) or 0)
-        md.change_percent = float(data.get("nc", md.change_percent) or 0)
-        md.bid_price = float(data.get("bp", md.bid_price) or 0)
-        md.ask_price = float(data.get("sp", md.ask_price) or 0)
-        md.bid_qty = int(data.get("bq", md.bid_qty) or 0)
-        md.ask_qty = int(data.get("sq", md.ask_qty) or 0)
-        md.open_interest = int(data.get("oi", md.open_interest) or 0)
-        md.total_buy_qty = int(data.get("tbq", md.total_buy_qty) or 0)
-        md.total_sell_qty = int(data.get("tsq", md.total_sell_qty) or 0)
-        md.lower_circuit = float(data.get("lcl", md.lower_circuit) or 0)
-        md.upper_circuit = float(data.get("ucl", md.upper_circuit) or 0)
-        md.week_52_high = float(data.get("yh", md.week_52_high) or 0)
-        md.week_52_low = float(data.get("yl", md.week_52_low) or 0)
-        md.last_update = datetime.now()
-        
-        # Debug: Log price updates
-        if md.ltp > 0:
-            print(f"[WebSocket] Price update: {token} ({exchange}) = Rs.{md.ltp:.2f}")
+            md.ltp = sp
+        
+        self._market_data.update(md, data, STOCK_FEED_FIELDS)
+        
+        if trace and md.ltp > 0:
+            log.debug("[WebSocket] Price update: %s (%s) = Rs.%.2f", token, exchange, md.ltp)
         
         # Notify callback
-        if self._on_price_update:
-            self._on_price_update(self._market_data_to_dict(md))
+        self._notify_price(key, md)
     
     def _handle_index_feed(self, data: dict):
         """Process index feed data"""
         token = str(data.get("tk", ""))
         exchange = data.get("e", "nse_cm")
-        key = f"{token}_{exchange}"
-        
-        if key not in self._market_data:
-            self._market_data[key] = MarketData(
-                instrument_token=token,
-                exchange_segment=exchange
-            )
         
-        md = self._market_data[key]
-        md.ltp = float(data.get("iv", md.ltp))
-        md.close_price = float(data.get("ic", md.close_price))
-        md.high_price = float(data.get("highPrice", md.high_price))
-        md.low_price = float(data.get("lowPrice", md.low_price))
-        md.open_price = float(data.get("openingPrice", md.open_price))
-        md.change = float(data.get("cng", md.change))
-        md.change_percent = float(data.get("nc", md.change_percent))
-        md.last_update = datetime.now()
+        md = self._market_data.row(exchange, token)
+        self._market_data.update(md, data, INDEX_FEED_FIELDS)
         
-        if self._on_price_update:
-            self._on_price_update(self._market_data_to_dict(md))
+        self._notify_price(md.key, md)
     
     def _handle_depth_feed(self, data: dict):
         """Process market depth data - also updates market prices from depth"""
@@ -328,40 +323,25 @@ class WebSocketManager:
         
         if not token or not exchange:
             return
-            
-        key = f"{token}_{exchange}"
         
-        if key not in self._market_depth:
-            self._market_depth[key] = MarketDepth(
-                instrument_token=token,
-                exchange_segment=exchange
-            )
+        depths = self._market_depth.get(exchange)
+        depth = depths.get(token) if depths else None
+        if depth is None:
+            depth = MarketDepth(sys.intern(token), sys.intern(exchange))
+            self._market_depth.setdefault(depth.exchange_segment, {})[depth.instrument_token] = depth
         
-        depth = self._market_depth[key]
         depth.trading_symbol = data.get("ts", depth.trading_symbol)
-        depth.last_update = datetime.now()
-        
-        # Parse bid levels
-        depth.bids = []
-        for i in range(5):
-            suffix = str(i+1) if i > 0 else ""
-            bid = DepthLevel(
-                price=float(data.get(f"bp{suffix}", 0) or 0),
-                quantity=int(data.get(f"bq{suffix}", 0) or 0),
-                orders=int(data.get(f"bno{i+1}", 0) or 0)
-            )
-            depth.bids.append(bid)
-        
-        # Parse ask levels
-        depth.asks = []
-        for i in range(5):
-            suffix = str(i+1) if i > 0 else ""
-            ask = DepthLevel(
-                price=float(data.get(f"sp{suffix}", 0) or 0),
-                quantity=int(data.get(f"bs{suffix}", 0) or 0),
-                orders=int(data.get(f"sno{i+1}", 0) or 0)
-            )
-            depth.asks.append(ask)
+        depth.last_update = time.monotonic()
+        
+        # Parse bid and ask levels
+        for level, (price, quantity, orders) in zip(depth.bids, BID_DEPTH_KEYS):
+            level.price = data.get(price, 0) or 0
+            level.quantity = data.get(quantity, 0) or 0
+            level.orders = data.get(orders, 0) or 0
+        for level, (price, quantity, orders) in zip(depth.asks, ASK_DEPTH_KEYS):
+            level.price = data.get(price, 0) or 0
+            level.quantity = data.get(quantity, 0) or 0
+            level.orders = data.get(orders, 0) or 0
         
         if self._on_depth_update:
             self._on_depth_update(self._market_depth_to_dict(depth))
@@ -373,144 +353,243 @@ class WebSocketManager:
         
         if bp or sp:
             # Update market data with price from depth
-            if key not in self._market_data:
-                self._market_data[key] = MarketData(
-                    instrument_token=token,
-                    exchange_segment=exchange
-                )
-            
-            md = self._market_data[key]
-            md.trading_symbol = data.get("ts", md.trading_symbol)
+            md = self._market_data.row(exchange, token)
+            if "ts" in data:
+                md.trading_symbol = data["ts"]
             
             # Calculate LTP from best bid/ask
             if bp and sp:
-                md.ltp = (float(bp) + float(sp)) / 2
+                ltp = (bp + sp) / 2
             elif bp:
-                md.ltp = float(bp)
-            elif sp:
-                md.ltp = float(sp)
-            
-            md.bid_price = float(bp) if bp else md.bid_price
-            md.ask_price = float(sp) if sp else md.ask_price
+                ltp = bp
+            else:
+                ltp = sp
+            values = {"ltp": ltp}
+            if bp:
+                values["bid_price"] = bp
+            if sp:
+                values["ask_price"] = sp
             
             # Lazy fetch close price if we don't have it
-            # Debug: Show close_price value
-            print(f"[DEBUG] Token {token}: close_price={md.close_price}, ltp={md.ltp}")
-            need_fetch = (md.close_price < 1 and md.ltp > 0)
-            print(f"[DEBUG] Token {token}: need_fetch={need_fetch}")
+            close = md.close_price
+            trace = log.isEnabledFor(logging.DEBUG) and sample(md.key)
+            need_fetch = (close < 1 and ltp > 0)
+            if trace:
+                log.debug("[DEBUG] Token %s: close_price=%s, ltp=%s, need_fetch=%s",
+                          token, close, ltp, need_fetch)
             if need_fetch:
-                self._fetch_close_price_async(token, exchange, key)
+                self._close_backfill.request(md.exchange_segment, md.instrument_token)
             
             # Calculate change percent if we have close price
-            if md.close_price and md.close_price > 0 and md.ltp > 0:
-                md.change = md.ltp - md.close_price
-                md.change_percent = ((md.ltp - md.close_price) / md.close_price) * 100
+            if close > 0 and ltp > 0:
+                values["change"] = ltp - close
+                values["change_percent"] = ((ltp - close) / close) * 100
             
-            md.last_update = datetime.now()
+            self._market_data.write(md, values)
             
-            # DEBUG: Log price updates from depth
-            print(f"[DEPTH->PRICE] Token {token}: LTP=Rs.{md.ltp:.2f} Change={md.change_percent:.2f}%")
+            if trace:
+                log.debug("[DEPTH->PRICE] Token %s: LTP=Rs.%.2f Change=%.2f%%", token, ltp, md.change_percent)
             
             # Emit price update
-            if self._on_price_update:
-                self._on_price_update(self._market_data_to_dict(md))
-    
-    def _fetch_close_price_async(self, token: str, exchange: str, key: str):
-        """Fetch close price for a token if not already fetched"""
-        # Check if we already have the close price
-        md = self._market_data.get(key)
-        if md and md.close_price > 0:
-            return  # Already have close price
-        
-        # Initialize fetch attempts if needed
-        if not hasattr(self, '_fetch_attempts'):
-            self._fetch_attempts = {}
+            self._notify_price(md.key, md)
+    
+    def _fetch_closes(self, instruments: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """
+        OHLC of (segment, token) instruments for the close backfill: snapshots over the feed socket first, then
+        one batched quotes call for the instruments without one
+        """
+        client = self._auth_manager.client
+        if not client or not self._auth_manager.is_authenticated:
+            return {}
+        
+        closes = {}
+        for is_index in (False, True):
+            instrument_tokens = [{"instrument_token": token, "exchange_segment": exchange}
+                                 for exchange, token in instruments
+                                 if ((exchange, token) in self._index_tokens) == is_index]
+            if not instrument_tokens:
+                continue
+            closes.update(self._fetch_snapshot_quotes(client, instrument_tokens, is_index))
+            missing = [item for item in instrument_tokens
+                       if (item["exchange_segment"], item["instrument_token"]) not in closes]
+            if not missing:
+                continue
+            log.debug("[Quotes] Fetching close prices for %d instruments...", len(missing))
+            try:
+                result = client.quotes(instrument_tokens=missing, quote_type="ohlc")
+            except Exception as e:
+                log.warning("[Quotes] Error fetching quotes: %s", e)
+                continue
+            log.debug("[Quotes] Raw response (%s): %.500s", type(result).__name__, result)
+            closes.update(self._parse_quotes(result, missing))
+        return closes
+    
+    @staticmethod
+    def _parse_quotes(result, instrument_tokens: List[Dict[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """OHLC by (segment, token) from a quotes response, in either of its list or {'data': [...]} forms"""
+        if isinstance(result, dict):
+            result = result.get('data')
+        if not isinstance(result, list):
+            return {}
+        
+        requested = {(item["exchange_segment"], item["instrument_token"]) for item in instrument_tokens}
+        by_token = {token: (exchange, token) for exchange, token in requested}
+        closes = {}
+        for quote in result:
+            if not isinstance(quote, dict):
+                continue
+            # Handle nested OHLC object from API
+            ohlc = quote.get('ohlc', {})
+            if not isinstance(ohlc, dict):
+                ohlc = {}
             
-        current_module_time = _MODULE_LOAD_TIME
-        now = time.time()
-        
-        # Get last attempt info: (timestamp, module_load_time)
-        # If it was just a timestamp (old format), treat as old module time
-        last_attempt_data = self._fetch_attempts.get(key)
-        
-        last_attempt_time = 0
-        last_attempt_module = 0
+            token = str(quote.get('exchange_token') or quote.get('pSymbol') or quote.get('instrument_token') or '')
+            exchange = quote.get('exchange_segment') or quote.get('pExchSeg') or quote.get('exchange') or ''
+            instrument = (exchange, token)
+            if instrument not in requested:
+                # The segment may be spelled differently; a single-instrument response may not name it at all
+                instrument = by_token.get(token) or (next(iter(requested)) if len(requested) == 1 else None)
+            if instrument is None:
+                continue
+            
+            # Try different field names based on API response format
+            # Priority: ohlc.close -> quote.pClose -> quote.close -> quote.c
+            closes[instrument] = {
+                "close": float(ohlc.get('close') or quote.get('pClose') or quote.get('close') or quote.get('c') or 0),
+                "open": float(ohlc.get('open') or quote.get('pOpen') or quote.get('open') or quote.get('o') or 0),
+                "high": float(ohlc.get('high') or quote.get('pHigh') or quote.get('high') or quote.get('h') or 0),
+                "low": float(ohlc.get('low') or quote.get('pLow') or quote.get('low') or quote.get('l') or 0)
+            }
+        return closes
+    
+    def _fetch_snapshot_quotes(self, client, instrument_tokens: List[Dict[str, str]], is_index: bool,
+                               timeout: float = 3.0) -> Dict[Tuple[str, str], dict]:
+        """OHLC by (segment, token) from snapshots over the feed socket, for the instruments that have a close"""
+        try:
+            snapshots = client.socket_quotes(instrument_tokens=instrument_tokens, isIndex=is_index,
+                                             timeout=timeout)
+        except Exception as e:
+            log.warning("[Quotes] Socket snapshot failed: %s", e)
+            return {}
         
-        if isinstance(last_attempt_data, (tuple, list)):
-            last_attempt_time, last_attempt_module = last_attempt_data
+        if is_index:
+            fields = ("ic", "openingPrice", "highPrice", "lowPrice")
         else:
-            last_attempt_time = last_attempt_data or 0
-            
-        print(f"[DEBUG-FETCH] Token={key} Module={current_module_time} LastMod={last_attempt_module} LastTime={last_attempt_time:.0f}")
-        
-        # If module reloaded, ignore previous attempts (force fetch)
-        if last_attempt_module != current_module_time:
-            print(f"[DEBUG-FETCH] Force fetch due to module reload")
-            pass # Force fetch
-        # Otherwise respect 60s cooldown
-        elif now - last_attempt_time < 60:
-            print(f"[DEBUG-FETCH] Rate limited: {now - last_attempt_time:.0f}s < 60s")
+            fields = ("c", "op", "h", "lo")
+        closes = {}
+        for instrument, item in snapshots.items():
+            if not isinstance(item, dict) or not float(item.get(fields[0]) or 0):
+                continue
+            closes[instrument] = {name: float(item.get(field) or 0)
+                                  for name, field in zip(("close", "open", "high", "low"), fields)}
+        return closes
+    
+    def _apply_close(self, exchange: str, token: str, ohlc: dict):
+        """Stores a backfilled close (and open/high/low) and re-emits the price with its change"""
+        md = self._market_data.get(exchange, token)
+        if md is None:
+            if (exchange, token) not in self._subscribed_tokens:
+                return  # Unsubscribed meanwhile
+            md = self._market_data.row(exchange, token)
+        
+        close = ohlc["close"]
+        md.close_price = close
+        if ohlc["open"] > 0:
+            md.open_price = ohlc["open"]
+        if ohlc["high"] > 0:
+            md.high_price = ohlc["high"]
+        if ohlc["low"] > 0:
+            md.low_price = ohlc["low"]
+        log.debug("[Quotes] Token %s: Close=%s", token, close)
+        
+        # Recalculate change with new close price
+        ltp = md.ltp
+        if ltp > 0:
+            md.change = ltp - close
+            md.change_percent = ((ltp - close) / close) * 100
+            # Emit updated price
+            self._notify_price(md.key, md)
+    
+    def _notify_price(self, key: str, md: MarketData):
+        """Queues md for the next price flush; later ticks of the same instrument replace it"""
+        if self._on_price_delta or self._on_price_updates or self._on_price_update:
+            self._price_conflator.push(key, md)
+    
+    def _flush_prices(self, batch: List[MarketData]):
+        if self._on_price_delta:
+            self._flush_price_delta(batch)
             return
-            
-        # Record attempt with current module time
-        self._fetch_attempts[key] = (now, current_module_time)
-        print(f"[Quotes] Starting fetch thread for {key}...")
-        
-        # Fetch in background to not block
-        import threading
-        def fetch():
-            try:
-                client = self._auth_manager.client
-                if not client or not self._auth_manager.is_authenticated:
-                    return
-                
-                instrument_tokens = [{"instrument_token": token, "exchange_segment": exchange}]
-                print(f"[Quotes] Fetching close price for {token}...")
-                
-                result = client.quotes(instrument_tokens=instrument_tokens, quote_type="ohlc")
-                print(f"[Quotes] Raw result for {token}: {str(result)[:300]}")
-                
-                # Try to parse result
-                quotes = []
-                if isinstance(result, list):
-                    quotes = result
-                elif isinstance(result, dict):
-                    quotes = result.get('data', []) if isinstance(result.get('data'), list) else []
-                
-                for quote in quotes:
-                    # Handle nested OHLC object from API
-                    ohlc = quote.get('ohlc', {})
-                    if not isinstance(ohlc, dict):
-                        ohlc = {}
-                        
-                    # Try different field names based on API response format
-                    # Priority: ohlc.close -> quote.pClose -> quote.close -> quote.c
-                    close = float(ohlc.get('close') or quote.get('pClose') or quote.get('close') or quote.get('c') or 0)
-                    open_p = float(ohlc.get('open') or quote.get('pOpen') or quote.get('open') or quote.get('o') or 0)
-                    high = float(ohlc.get('high') or quote.get('pHigh') or quote.get('high') or quote.get('h') or 0)
-                    low = float(ohlc.get('low') or quote.get('pLow') or quote.get('low') or quote.get('l') or 0)
-                    
-                    if close > 0 and key in self._market_data:
-                        md = self._market_data[key]
-                        md.close_price = close
-                        md.open_price = open_p if open_p > 0 else md.open_price
-                        md.high_price = high if high > 0 else md.high_price
-                        md.low_price = low if low > 0 else md.low_price
-                        print(f"[Quotes] Token {token}: Close={close}")
-                        
-                        # Recalculate change with new close price
-                        if md.ltp > 0:
-                            md.change = md.ltp - md.close_price
-                            md.change_percent = ((md.ltp - md.close_price) / md.close_price) * 100
-                            # Emit updated price
-                            if self._on_price_update:
-                                self._on_price_update(self._market_data_to_dict(md))
-                        break
-                        
-            except Exception as e:
-                print(f"[Quotes] Error fetching: {e}")
-        
-        threading.Thread(target=fetch, daemon=True).start()
+        updates = self._market_data.records(batch)
+        if self._on_price_updates:
+            self._on_price_updates(updates)
+        elif self._on_price_update:
+            for update in updates:
+                self._on_price_update(update)
+    
+    def _flush_price_delta(self, batch: List[MarketData]):
+        """Emits the fields of batch that differ from what was last sent, as the next sequence number"""
+        with self._price_lock:
+            updates = []
+            for current in self._market_data.records(batch, key="k"):
+                key = current.pop("k")
+                del current["last_update"]
+                previous = self._emitted_prices.get(key)
+                if previous is None:
+                    changed = dict(current)
+                else:
+                    changed = {name: value for name, value in current.items() if previous[name] != value}
+                if not changed:
+                    continue
+                self._emitted_prices[key] = current
+                self._delta_fields_sent += len(changed)
+                self._delta_fields_total += len(current)
+                changed["k"] = key
+                updates.append(changed)
+            if not updates:
+                return
+            self._price_seq += 1
+            # Emitted under the lock, so a snapshot is never sequenced between two deltas it does not cover
+            self._on_price_delta({"seq": self._price_seq, "t": int(time.time() * 1000), "updates": updates})
+    
+    def get_price_snapshot(self) -> Dict[str, Any]:
+        """
+        Full state of every instrument, for a client that connects or lost a delta; seq is the last delta.
+
+        Built from the values last sent rather than the store, so it is exactly the state after delta seq:
+        ticks still waiting in the conflator reach the client as the next delta, diffed against these values.
+        """
+        with self._price_lock:
+            return {
+                "seq": self._price_seq,
+                "data": [dict(fields, k=key) for key, fields in self._emitted_prices.items()]
+            }
+    
+    def _remove_price_keys(self, keys: List[str]):
+        """Forgets the values sent for keys and tells delta clients to drop them, as the next sequence number"""
+        with self._price_lock:
+            removed = [key for key in keys if self._emitted_prices.pop(key, None) is not None]
+            if not removed or not self._on_price_delta:
+                return
+            self._price_seq += 1
+            self._on_price_delta({"seq": self._price_seq, "t": int(time.time() * 1000), "updates": [],
+                                  "removed": removed})
+    
+    def set_price_flush_interval(self, interval_ms: float):
+        self._price_conflator.interval = max(10.0, float(interval_ms)) / 1000
+    
+    def get_conflation_stats(self) -> Dict[str, Any]:
+        """Ticks received vs. price updates sent, and the intermediate ticks dropped by conflation"""
+        return {
+            "success": True,
+            **self._price_conflator.stats(),
+            "delta_seq": self._price_seq,
+            "delta_field_ratio": round(self._delta_fields_sent / self._delta_fields_total, 3)
+                                 if self._delta_fields_total else None
+        }
+    
+    def get_backfill_stats(self) -> Dict[str, Any]:
+        """Close price backfill: instruments requested and filled, batches sent, retries and the negative cache"""
+        return {"success": True, **self._close_backfill.stats()}
     
     def _handle_order_feed(self, data: dict):
         """Process order update feed"""
@@ -564,7 +643,8 @@ class WebSocketManager:
             # Set up SDK callbacks BEFORE subscribing
             self._setup_sdk_callbacks()
             
-            print(f"[WebSocket] Subscribing to {len(instrument_tokens)} instruments: {instrument_tokens}")
+            log.info("[WebSocket] Subscribing to %d instruments", len(instrument_tokens))
+            log.debug("[WebSocket] Instruments: %s", instrument_tokens)
             
             # Subscribe
             client.subscribe(
@@ -575,65 +655,20 @@ class WebSocketManager:
             
             # Track subscriptions
             for token_info in instrument_tokens:
-                key = f"{token_info['instrument_token']}_{token_info['exchange_segment']}"
+                key = instrument_key(token_info)
                 self._subscribed_tokens[key] = token_info
                 if is_depth:
                     self._depth_tokens.add(key)
                 if is_index:
                     self._index_tokens.add(key)
             
-            # Fetch initial quotes to get close price for change calculation
-            try:
-                print(f"[Quotes] Fetching quotes for {len(instrument_tokens)} instruments...")
-                quotes_result = client.quotes(
-                    instrument_tokens=instrument_tokens,
-                    quote_type="ohlc"
-                )
-                print(f"[Quotes] Raw response type: {type(quotes_result)}")
-                print(f"[Quotes] Raw response: {str(quotes_result)[:500]}")
-                
-                if isinstance(quotes_result, list):
-                    for quote in quotes_result:
-                        token = str(quote.get('pSymbol', ''))
-                        exchange = quote.get('pExchSeg', '')
-                        key = f"{token}_{exchange}"
-                        
-                        if key not in self._market_data:
-                            self._market_data[key] = MarketData(
-                                instrument_token=token,
-                                exchange_segment=exchange
-                            )
-                        
-                        md = self._market_data[key]
-                        md.close_price = float(quote.get('pClose', 0) or 0)
-                        md.open_price = float(quote.get('pOpen', 0) or 0)
-                        md.high_price = float(quote.get('pHigh', 0) or 0)
-                        md.low_price = float(quote.get('pLow', 0) or 0)
-                        print(f"[Quotes] Token {token}: Close={md.close_price}")
-                elif isinstance(quotes_result, dict):
-                    # Maybe it's a dict with 'data' key
-                    data = quotes_result.get('data', [])
-                    print(f"[Quotes] Dict format, data length: {len(data) if isinstance(data, list) else 'N/A'}")
-                    for quote in data if isinstance(data, list) else []:
-                        token = str(quote.get('pSymbol', quote.get('instrument_token', '')))
-                        exchange = quote.get('pExchSeg', quote.get('exchange_segment', ''))
-                        key = f"{token}_{exchange}"
-                        
-                        if key not in self._market_data:
-                            self._market_data[key] = MarketData(
-                                instrument_token=token,
-                                exchange_segment=exchange
-                            )
-                        
-                        md = self._market_data[key]
-                        # Try different field names
-                        md.close_price = float(quote.get('pClose', quote.get('close', quote.get('c', 0))) or 0)
-                        md.open_price = float(quote.get('pOpen', quote.get('open', quote.get('o', 0))) or 0)
-                        md.high_price = float(quote.get('pHigh', quote.get('high', quote.get('h', 0))) or 0)
-                        md.low_price = float(quote.get('pLow', quote.get('low', quote.get('l', 0))) or 0)
-                        print(f"[Quotes] Token {token}: Close={md.close_price}")
-            except Exception as qe:
-                print(f"[Quotes] Error fetching quotes: {qe}")
+            # Fetch initial quotes to get close price for change calculation, through the same batched
+            # backfill that fills in closes missing from ticks
+            log.debug("[Quotes] Fetching quotes for %d instruments...", len(instrument_tokens))
+            self._close_backfill.fetch_now(
+                [(item['exchange_segment'], str(item['instrument_token'])) for item in instrument_tokens],
+                timeout=10.0
+            )
             
             return {
                 "success": True,
@@ -641,7 +676,7 @@ class WebSocketManager:
                 "message": f"Subscribed to {len(instrument_tokens)} instruments"
             }
         except Exception as e:
-            print(f"[WebSocket] Subscribe error: {e}")
+            log.error("[WebSocket] Subscribe error: %s", e)
             return {"success": False, "error": str(e)}
     
     def unsubscribe(
@@ -664,13 +699,20 @@ class WebSocketManager:
             )
             
             # Remove from tracking
+            removed = []
             for token_info in instrument_tokens:
-                key = f"{token_info['instrument_token']}_{token_info['exchange_segment']}"
+                key = instrument_key(token_info)
+                exchange, token = key
                 self._subscribed_tokens.pop(key, None)
                 self._depth_tokens.discard(key)
                 self._index_tokens.discard(key)
-                self._market_data.pop(key, None)
-                self._market_depth.pop(key, None)
+                self._market_data.free(exchange, token)
+                self._market_depth.get(exchange, {}).pop(token, None)
+                wire_key = f"{token}_{exchange}"
+                self._price_conflator.discard(wire_key)
+                self._close_backfill.forget(exchange, token)
+                removed.append(wire_key)
+            self._remove_price_keys(removed)
             
             return {"success": True, "message": f"Unsubscribed from {len(instrument_tokens)} instruments"}
         except Exception as e:
@@ -689,31 +731,34 @@ class WebSocketManager:
             
             client.subscribe_to_orderfeed()
             self._is_order_feed_connected = True
-            print("[WebSocket] Subscribed to order feed")
+            log.info("[WebSocket] Subscribed to order feed")
             return {"success": True, "message": "Subscribed to order feed"}
         except Exception as e:
-            print(f"[WebSocket] Order feed subscribe error: {e}")
+            log.error("[WebSocket] Order feed subscribe error: %s", e)
             return {"success": False, "error": str(e)}
     
     # ===== Data Access Methods =====
     
     def get_market_data(self, instrument_token: str, exchange_segment: str) -> Optional[Dict[str, Any]]:
         """Get cached market data for an instrument"""
-        key = f"{instrument_token}_{exchange_segment}"
-        md = self._market_data.get(key)
-        return self._market_data_to_dict(md) if md else None
+        md = self._market_data.get(exchange_segment, instrument_token)
+        return self._market_data.record(md) if md else None
     
     def get_all_market_data(self) -> Dict[str, Any]:
         """Get all cached market data"""
         return {
             "success": True,
-            "data": [self._market_data_to_dict(md) for md in self._market_data.values()]
+            "data": self._market_data.snapshot()
         }
     
+    def get_top_movers(self, count: int = 10, by: str = "change_percent") -> Dict[str, Any]:
+        """Top gainers and losers across all cached instruments"""
+        return {"success": True, "by": by, **self._market_data.movers(count, by)}
+    
     def get_market_depth(self, instrument_token: str, exchange_segment: str) -> Optional[Dict[str, Any]]:
         """Get cached market depth for an instrument"""
-        key = f"{instrument_token}_{exchange_segment}"
-        depth = self._market_depth.get(key)
+        depths = self._market_depth.get(exchange_segment)
+        depth = depths.get(instrument_token) if depths else None
         return self._market_depth_to_dict(depth) if depth else None
     
     def get_order_updates(self, limit: int = 20) -> List[dict]:
@@ -725,43 +770,14 @@ class WebSocketManager:
         return {
             "success": True,
             "subscribed_tokens": list(self._subscribed_tokens.values()),
-            "depth_tokens": list(self._depth_tokens),
-            "index_tokens": list(self._index_tokens),
+            "depth_tokens": [f"{token}_{exchange}" for exchange, token in self._depth_tokens],
+            "index_tokens": [f"{token}_{exchange}" for exchange, token in self._index_tokens],
             "is_connected": self._is_connected,
             "is_order_feed_connected": self._is_order_feed_connected
         }
     
     # ===== Helper Methods =====
     
-    def _market_data_to_dict(self, md: MarketData) -> dict:
-        """Convert MarketData to dictionary"""
-        return {
-            "instrument_token": md.instrument_token,
-            "exchange_segment": md.exchange_segment,
-            "trading_symbol": md.trading_symbol,
-            "ltp": md.ltp,
-            "last_traded_qty": md.last_traded_qty,
-            "volume": md.volume,
-            "open": md.open_price,
-            "high": md.high_price,
-            "low": md.low_price,
-            "close": md.close_price,
-            "change": md.change,
-            "change_percent": md.change_percent,
-            "bid_price": md.bid_price,
-            "ask_price": md.ask_price,
-            "bid_qty": md.bid_qty,
-            "ask_qty": md.ask_qty,
-            "open_interest": md.open_interest,
-            "total_buy_qty": md.total_buy_qty,
-            "total_sell_qty": md.total_sell_qty,
-            "lower_circuit": md.lower_circuit,
-            "upper_circuit": md.upper_circuit,
-            "week_52_high": md.week_52_high,
-            "week_52_low": md.week_52_low,
-            "last_update": md.last_update.isoformat()
-        }
-    
     def _market_depth_to_dict(self, depth: MarketDepth) -> dict:
         """Convert MarketDepth to dictionary"""
         return {
@@ -770,5 +786,5 @@ class WebSocketManager:
             "trading_symbol": depth.trading_symbol,
             "bids": [{"price": b.price, "quantity": b.quantity, "orders": b.orders} for b in depth.bids],
             "asks": [{"price": a.price, "quantity": a.quantity, "orders": a.orders} for a in depth.asks],
-            "last_update": depth.last_update.isoformat()
+            "last_update": to_datetime(depth.last_update).isoformat()
         }
@@ -0,0 +1,143 @@
+"""
+Minimal RFC 6455 server on a local port for driving the feed clients without a live feed.
+
+Every accepted connection runs handler(connection) on its own thread; a connection reads client frames with
+recv() and writes binary frames with send(). Closing a connection from the test drops it without a closing
+handshake, like a network failure.
+"""
+import base64
+import hashlib
+import os
+import socket
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from frame_synth import FrameSynth  # noqa: E402
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 1
+OP_BINARY = 2
+OP_CLOSE = 8
+OP_PING = 9
+OP_PONG = 10
+
+
+class StubConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        request = b""
+        while b"\r\n\r\n" not in request:
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionError("Closed during the handshake")
+            request += data
+        key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+                   if line.lower().startswith(b"sec-websocket-key:"))
+        accept = base64.b64encode(hashlib.sha1(key + GUID).digest())
+        sock.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+    def read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Closed by the client")
+            data += chunk
+        return data
+
+    def recv(self):
+        """(opcode, payload) of the next client frame; pings are answered here"""
+        while True:
+            head = self.read(2)
+            opcode, length = head[0] & 0x0F, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", self.read(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", self.read(8))[0]
+            mask = self.read(4)
+            payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(self.read(length)))
+            if opcode == OP_PING:
+                self.send(payload, OP_PONG)
+                continue
+            return opcode, payload
+
+    def send(self, payload, opcode=OP_BINARY):
+        length = len(payload)
+        if length < 126:
+            head = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            head = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        self.sock.sendall(head + payload)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class StubServer:
+    def __init__(self, handler):
+        self.handler = handler
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.url = "ws://127.0.0.1:%d" % self.sock.getsockname()[1]
+        self.connections = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+    def serve(self, sock):
+        try:
+            connection = StubConnection(sock)
+            with self.lock:
+                self.connections.append(connection)
+            self.handler(connection)
+        except (ConnectionError, OSError):
+            pass
+
+    def stop(self):
+        self.sock.close()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+
+
+def hsm_handler(topics, update_frames=0):
+    """
+    An HSM server for topics: answers the connection request, sends the snapshots of all topics after the
+    first subscription request and then update_frames frames of updates, and reads until the client closes.
+    """
+    def handle(connection):
+        synth = FrameSynth(seed=1)
+        connection.recv()
+        connection.send(synth.connection_frame())
+        connection.recv()
+        for frame in synth.snapshot_frames(topics) + synth.update_frames(topics, update_frames):
+            connection.send(frame)
+        while connection.recv()[0] != OP_CLOSE:
+            pass
+        connection.send(b"", OP_CLOSE)
+        connection.close()
+    return handle
+
+
+def make_topics(count):
+    return FrameSynth(seed=1).make_topics(scrips=count)
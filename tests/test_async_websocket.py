@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import neo_api_client
+from neo_api_client.async_websocket import AsyncNeoWebSocket
+from tests.stub_server import StubServer, hsm_handler, make_topics
+
+
+class AsyncNeoWebSocketTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.topics = make_topics(5)
+        self.server = StubServer(hsm_handler(self.topics, update_frames=3))
+        self.addCleanup(self.server.stop)
+        url = mock.patch.object(neo_api_client, "WEBSOCKET_URL", self.server.url)
+        url.start()
+        self.addCleanup(url.stop)
+
+        self.feed = AsyncNeoWebSocket("sid", "token", "server", None)
+        self.feed.reconnect.initial_delay = 0.05
+        self.errors = []
+        self.feed.on_error = self.errors.append
+        self.ticks = self.feed.ticks()
+
+    async def asyncTearDown(self):
+        await self.ticks.aclose()
+        await self.feed.close()
+
+    async def next_tick(self):
+        return await asyncio.wait_for(self.ticks.__anext__(), 5)
+
+    def subscribe(self):
+        self.feed.get_live_feed([{"instrument_token": topic.token, "exchange_segment": topic.segment}
+                                 for topic in self.topics], False, False)
+
+    async def test_subscribe_and_receive(self):
+        self.subscribe()
+        tick = await self.next_tick()
+        self.assertIn(tick["tk"], {topic.token for topic in self.topics})
+        self.assertEqual(tick["e"], "nse_cm")
+        self.assertEqual(self.feed.is_hsw_open, 1)
+        self.assertEqual(self.errors, [])
+
+    async def test_reconnects_and_resubscribes(self):
+        self.subscribe()
+        await self.next_tick()
+        connections = len(self.server.connections)
+
+        self.feed.hsWebsocket.drop()
+        while len(self.server.connections) == connections or self.feed.reconnect.reconnects == 0:
+            await self.next_tick()
+        # The new connection subscribed again and delivers the snapshots
+        self.assertEqual(self.feed.reconnect.reconnects, 1)
+        self.assertEqual(len(self.server.connections), connections + 1)
+        self.assertIn((await self.next_tick())["tk"], {topic.token for topic in self.topics})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+from terminal.backfill import CloseBackfill
+
+OHLC = {"close": 100.0, "open": 99.0, "high": 101.0, "low": 98.0}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class CloseBackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.applied = []
+        self.missing = {("nse_cm", "2")}
+        self.lock = threading.Lock()
+        self.backfill = CloseBackfill(self.fetch, self.apply, window=0.05, batch_size=3, retries=2,
+                                      retry_delay=0.05, negative_ttl=60.0)
+
+    def fetch(self, instruments):
+        with self.lock:
+            self.calls.append(list(instruments))
+        return {instrument: dict(OHLC) for instrument in instruments if instrument not in self.missing}
+
+    def apply(self, exchange_segment, instrument_token, ohlc):
+        with self.lock:
+            self.applied.append((exchange_segment, instrument_token))
+
+    def fetched(self, instrument):
+        with self.lock:
+            return sum(call.count(instrument) for call in self.calls)
+
+    def settled(self):
+        stats = self.backfill.stats()
+        return stats["pending"] == 0 and stats["in_flight"] == 0
+
+    def test_requests_share_batches_and_are_not_queued_twice(self):
+        for _ in range(3):
+            for token in ("1", "3", "4", "5"):
+                self.backfill.request("nse_cm", token)
+        self.assertTrue(wait_for(lambda: len(self.applied) == 4))
+        self.assertEqual(sorted(len(call) for call in self.calls), [1, 3])
+        self.assertEqual(sorted(self.applied), [("nse_cm", token) for token in ("1", "3", "4", "5")])
+        stats = self.backfill.stats()
+        self.assertEqual((stats["requested"], stats["batches"], stats["filled"]), (4, 2, 4))
+
+    def test_missing_instrument_is_retried_then_negatively_cached(self):
+        missing = ("nse_cm", "2")
+        started = time.monotonic()
+        self.backfill.request(*missing)
+        self.backfill.request("nse_cm", "1")
+        self.assertTrue(wait_for(lambda: self.backfill.stats()["failed"] == 1 and self.settled()))
+        self.assertEqual(self.fetched(missing), 1 + self.backfill.retries)
+        self.assertEqual(self.fetched(("nse_cm", "1")), 1)
+        # Retries wait retry_delay, then twice that
+        self.assertGreaterEqual(time.monotonic() - started, 0.05 + 0.1)
+        self.assertGreater(self.backfill._failed_until[missing], time.monotonic() + 50)
+
+        stats = self.backfill.stats()
+        self.assertEqual((stats["requested"], stats["filled"], stats["retried"], stats["failed"]), (2, 1, 2, 1))
+        self.assertEqual(stats["negative_cached"], 1)
+
+        # Requests within negative_ttl are not fetched again, until forget()
+        self.backfill.request(*missing)
+        self.assertEqual(self.backfill.stats()["negative_hits"], 1)
+        self.assertEqual(self.backfill.stats()["pending"], 0)
+        self.backfill.forget(*missing)
+        self.assertNotIn(missing, self.backfill._failed_until)
+        self.backfill.request(*missing)
+        self.assertTrue(wait_for(lambda: self.fetched(missing) == 2 + self.backfill.retries))
+
+    def test_fetch_failure_counts_as_missed(self):
+        self.missing = set()
+        self.backfill._fetch = lambda instruments: 1 / 0
+        self.backfill.request("nse_cm", "1")
+        self.assertTrue(wait_for(lambda: self.backfill.stats()["failed"] == 1))
+        self.assertEqual(self.backfill.stats()["retried"], self.backfill.retries)
+
+    def test_fetch_now_takes_over_queued_instruments(self):
+        self.backfill.window = 1.0
+        self.backfill.request("nse_cm", "1")
+        self.backfill.fetch_now([("nse_cm", "1"), ("nse_cm", "1"), ("nse_cm", "2"), ("nse_cm", "3")], timeout=5)
+        # Applied before fetch_now returns, in one call per batch_size, without waiting for the window
+        self.assertEqual(sorted(self.applied), [("nse_cm", "1"), ("nse_cm", "3")])
+        self.assertEqual(self.calls, [[("nse_cm", "1"), ("nse_cm", "2"), ("nse_cm", "3")]])
+        # The miss is retried like a queued request
+        self.assertEqual(self.backfill._pending[("nse_cm", "2")][0], 1)
+        stats = self.backfill.stats()
+        self.assertEqual((stats["requested"], stats["retried"], stats["in_flight"]), (4, 1, 0))
+        time.sleep(1.2)
+        self.assertEqual(self.fetched(("nse_cm", "1")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from neo_api_client.HSWebSocketLib import FeedBatch, HSWrapper, SCRIP_INDEX
+from tests.stub_server import FrameSynth
+
+LTP = SCRIP_INDEX["LTP"]
+
+
+class ColumnarParserTest(unittest.TestCase):
+    def setUp(self):
+        self.synth = FrameSynth(seed=3)
+        self.wrapper = HSWrapper(columnar_output=True)
+        self.wrapper.parseData(self.synth.connection_frame())
+
+    def ltp_rows(self, batch, topic):
+        return batch.values[(batch.topic_ids == topic.topic_id) & (batch.field_ids == LTP)].tolist()
+
+    def test_snapshot_without_precision_field(self):
+        short, full = self.synth.make_topics(scrips=2)
+        # The server sent neither multiplier nor precision for this topic
+        short.values = short.values[:LTP + 1]
+        batch = self.wrapper.parseData(self.synth.data_frame([self.synth.snap_packet(short),
+                                                              self.synth.snap_packet(full)]))
+        self.assertIsInstance(batch, FeedBatch)
+        self.assertEqual(self.ltp_rows(batch, short), [float(short.values[LTP])])
+        self.assertEqual(self.ltp_rows(batch, full), [full.values[LTP] / 100])
+
+
+if __name__ == "__main__":
+    unittest.main()
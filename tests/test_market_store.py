@@ -0,0 +1,96 @@
+import threading
+import unittest
+
+from terminal.market_store import DEAD_SLOT, MarketDataStore
+
+
+class MarketDataStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = MarketDataStore(capacity=2)
+
+    def test_grow_keeps_rows_and_values(self):
+        rows = [self.store.row("nse_cm", str(token)) for token in range(100)]
+        for index, md in enumerate(rows):
+            md.ltp = index + 0.5
+            md.trading_symbol = "SYM%d" % index
+        self.assertGreaterEqual(self.store.capacity, 101)
+        self.assertEqual([md.ltp for md in rows], [index + 0.5 for index in range(100)])
+        self.assertEqual(rows[42].trading_symbol, "SYM42")
+        self.assertIs(self.store.get("nse_cm", "42"), rows[42])
+        self.assertEqual(len(self.store), 100)
+
+    def test_grow_does_not_lose_concurrent_writes(self):
+        md = self.store.row("nse_cm", "1")
+        fetched, grown = threading.Event(), threading.Event()
+
+        class GatedColumns(dict):
+            def __getitem__(self, name):
+                column = super().__getitem__(name)
+                if threading.current_thread() is writer:
+                    # The writer holds the column it is about to write: let a grow copy it meanwhile
+                    fetched.set()
+                    grown.wait(0.2)
+                return column
+        self.store.columns = GatedColumns(self.store.columns)
+        writer = threading.Thread(target=setattr, args=(md, "ltp", 42.0))
+        writer.start()
+        fetched.wait(1)
+        self.store.row("nse_cm", "2")
+        grown.set()
+        writer.join()
+        self.assertEqual(self.store.capacity, 4)
+        self.assertEqual(md.ltp, 42.0)
+
+    def test_free_then_reuse(self):
+        first = self.store.row("nse_cm", "1")
+        first.ltp = 100.0
+        first.trading_symbol = "A"
+        slot = first.slot
+        self.store.free("nse_cm", "1")
+        self.assertEqual(first.slot, DEAD_SLOT)
+        self.assertIsNone(self.store.get("nse_cm", "1"))
+        self.assertEqual(len(self.store), 0)
+
+        second = self.store.row("nse_fo", "2")
+        self.assertEqual(second.slot, slot)
+        self.assertEqual(second.ltp, 0.0)
+        self.assertEqual(second.trading_symbol, "")
+        self.assertIs(self.store.by_slot[slot], second)
+
+    def test_stale_row_writes_land_in_the_dead_slot(self):
+        stale = self.store.row("nse_cm", "1")
+        self.store.free("nse_cm", "1")
+        current = self.store.row("nse_cm", "2")
+        current.ltp = 50.0
+
+        stale.ltp = 999.0
+        self.store.update(stale, {"v": 7}, (("v", "volume"),))
+        self.store.write(stale, {"close_price": 1.0})
+        self.assertEqual(current.ltp, 50.0)
+        self.assertEqual(current.volume, 0)
+        self.assertEqual(self.store.columns["ltp"][DEAD_SLOT], 999.0)
+        self.assertFalse(self.store.live[DEAD_SLOT])
+        self.assertEqual([record["instrument_token"] for record in self.store.snapshot()], ["2"])
+
+    def test_records_skip_freed_rows(self):
+        rows = [self.store.row("nse_cm", str(token)) for token in range(3)]
+        for md in rows:
+            md.ltp = float(md.instrument_token) + 1
+        self.store.free("nse_cm", "1")
+        records = self.store.records(rows, key="k")
+        self.assertEqual([(record["k"], record["ltp"]) for record in records], [("0_nse_cm", 1.0), ("2_nse_cm", 3.0)])
+        self.assertIsNone(self.store.record(rows[1]))
+        self.assertEqual(self.store.records([rows[1]]), [])
+
+    def test_movers(self):
+        for token, (ltp, close) in enumerate(((110.0, 100.0), (90.0, 100.0), (100.0, 0.0), (105.0, 100.0))):
+            md = self.store.row("nse_cm", str(token))
+            md.ltp, md.close_price = ltp, close
+            md.change_percent = (ltp - close) / close * 100 if close else 0.0
+        movers = self.store.movers(count=2)
+        self.assertEqual([record["instrument_token"] for record in movers["gainers"]], ["0", "3"])
+        self.assertEqual([record["instrument_token"] for record in movers["losers"]], ["1", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from types import SimpleNamespace
+
+from terminal.websocket_manager import WebSocketManager
+
+KEY = "11536_nse_cm"
+INSTRUMENT = {"instrument_token": "11536", "exchange_segment": "nse_cm"}
+
+
+class PriceDeltaTest(unittest.TestCase):
+    def setUp(self):
+        WebSocketManager._instance = None
+        self.manager = WebSocketManager()
+        self.manager._auth_manager = SimpleNamespace(client=SimpleNamespace(un_subscribe=lambda **kwargs: None),
+                                                     is_authenticated=True)
+        self.deltas = []
+        self.manager.set_callbacks(on_price_delta=self.deltas.append)
+        # Flushed by the test only
+        self.manager._price_conflator.interval = 3600
+        self.addCleanup(self.manager._price_conflator.stop)
+        self.addCleanup(setattr, WebSocketManager, "_instance", None)
+
+    def tick(self, token="11536", **fields):
+        self.manager._handle_stock_feed(dict({"tk": token, "e": "nse_cm", "c": 90.0, "ts": "SYM" + token}, **fields))
+
+    def flush(self):
+        self.manager._price_conflator.flush()
+
+    @staticmethod
+    def apply(state, delta):
+        for update in delta["updates"]:
+            state.setdefault(update["k"], {}).update(update)
+        for key in delta.get("removed", ()):
+            state.pop(key, None)
+
+    def test_first_delta_is_full_then_only_changes(self):
+        self.tick(ltp=100.0, v=10)
+        self.flush()
+        first = self.deltas[-1]["updates"][0]
+        self.assertEqual(first["k"], KEY)
+        self.assertEqual(first["instrument_token"], "11536")
+        self.assertEqual((first["ltp"], first["close"], first["volume"]), (100.0, 90.0, 10))
+        self.assertNotIn("last_update", first)
+
+        self.tick(ltp=101.0, v=10)
+        self.flush()
+        self.assertEqual(self.deltas[-1]["updates"], [{"ltp": 101.0, "k": KEY}])
+
+    def test_seq_is_contiguous_and_unchanged_flushes_emit_nothing(self):
+        for ltp in (100.0, 101.0, 101.0, 102.0):
+            self.tick(ltp=ltp)
+            self.flush()
+        self.tick("2", ltp=5.0)
+        self.manager.unsubscribe([INSTRUMENT])
+        self.flush()
+        self.assertEqual([delta["seq"] for delta in self.deltas], [1, 2, 3, 4, 5])
+        self.assertEqual(self.manager.get_price_snapshot()["seq"], 5)
+
+    def test_snapshot_is_the_state_after_its_seq(self):
+        self.tick(ltp=100.0)
+        self.tick("2", ltp=5.0)
+        self.flush()
+        # A move that is back where it started by the next flush: no delta corrects it later
+        self.tick(ltp=101.0)
+        snapshot = self.manager.get_price_snapshot()
+        self.tick(ltp=100.0)
+        self.tick("2", ltp=6.0)
+        self.flush()
+
+        self.assertEqual(snapshot["seq"], 1)
+        client = {record["k"]: dict(record) for record in snapshot["data"]}
+        for delta in self.deltas:
+            if delta["seq"] > snapshot["seq"]:
+                self.apply(client, delta)
+        self.assertEqual(client[KEY]["ltp"], 100.0)
+        self.assertEqual(client["2_nse_cm"]["ltp"], 6.0)
+
+        replayed = {}
+        for delta in self.deltas:
+            self.apply(replayed, delta)
+        self.assertEqual(client, replayed)
+
+    def test_unsubscribe_sends_a_tombstone(self):
+        self.tick(ltp=100.0)
+        self.tick("2", ltp=5.0)
+        self.flush()
+        self.tick(ltp=101.0)
+        self.manager.unsubscribe([INSTRUMENT])
+        self.flush()
+
+        tombstone = self.deltas[-1]
+        self.assertEqual((tombstone["seq"], tombstone["updates"], tombstone["removed"]), (2, [], [KEY]))
+        self.assertEqual([record["k"] for record in self.manager.get_price_snapshot()["data"]], ["2_nse_cm"])
+
+        # Unsubscribing again sends nothing; a new subscription starts with all fields
+        self.manager.unsubscribe([INSTRUMENT])
+        self.assertEqual(len(self.deltas), 2)
+        self.tick(ltp=102.0)
+        self.flush()
+        self.assertEqual(self.deltas[-1]["seq"], 3)
+        self.assertIn("instrument_token", self.deltas[-1]["updates"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
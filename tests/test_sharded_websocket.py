@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import neo_api_client
+from neo_api_client.sharded_websocket import ShardedNeoWebSocket, parse_tick_time
+from tests.stub_server import StubServer, hsm_handler, make_topics
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ShardedNeoWebSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.topics = make_topics(40)
+        self.server = StubServer(hsm_handler(self.topics))
+        url = mock.patch.object(neo_api_client, "WEBSOCKET_URL", self.server.url)
+        url.start()
+        self.addCleanup(url.stop)
+
+        self.feed = ShardedNeoWebSocket("sid", "token", "server", None, shard_count=2)
+        for shard in self.feed.shards:
+            shard.reconnect.initial_delay = 0.05
+        self.messages, self.opened, self.closed = [], [], []
+        self.lock = threading.Lock()
+        self.feed.on_message = self.on_message
+        self.feed.on_open = lambda: self.opened.append(time.monotonic())
+        self.feed.on_close = lambda: self.closed.append(time.monotonic())
+        self.addCleanup(self.stop)
+
+    def on_message(self, message):
+        with self.lock:
+            self.messages.append(message)
+
+    def stop(self):
+        for shard in self.feed.shards:
+            if shard.hsWebsocket:
+                shard.hsWebsocket.close()
+        self.server.stop()
+
+    def ticks(self, shard):
+        with self.lock:
+            return [item for message in self.messages
+                    if message.get("type") == "stock_feed" and message["shard"] == shard
+                    for item in message["data"]]
+
+    def subscribe(self):
+        tokens = [{"instrument_token": topic.token, "exchange_segment": topic.segment} for topic in self.topics]
+        self.feed.get_live_feed(tokens, False, False)
+        self.assertTrue(wait_for(lambda: all(self.ticks(shard) for shard in range(2))))
+
+    def test_ticks_are_tagged_with_their_shard(self):
+        self.subscribe()
+        for shard in range(2):
+            tokens = {item["tk"] for item in self.ticks(shard)}
+            self.assertEqual(tokens, {key.split("|")[1] for (key, _), placed in self.feed.placement.items()
+                                      if placed == shard})
+
+    def test_open_and_close_are_reported_once_for_all_shards(self):
+        self.subscribe()
+        self.assertEqual(len(self.opened), 1)
+
+        # One shard dropping and reconnecting is not the feed going down
+        reconnects = self.feed.shards[1].reconnect.reconnects
+        self.feed.shards[1].hsWebsocket.drop()
+        self.assertTrue(wait_for(lambda: self.feed.shards[1].reconnect.reconnects > reconnects))
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(self.closed, [])
+
+        for shard in self.feed.shards:
+            shard.hsWebsocket.close()
+        self.assertTrue(wait_for(lambda: self.closed))
+        self.assertEqual(len(self.closed), 1)
+
+    def test_lag_is_measured_from_formatted_trade_times(self):
+        self.subscribe()
+        for report in self.feed.shard_lag():
+            self.assertTrue(report["connected"])
+            self.assertGreater(report["messages"], 0)
+            # The synthetic feed's trade times are from November 2023
+            self.assertGreater(report["lag"], 0)
+
+    def test_lag_is_measured_from_columnar_batches(self):
+        self.feed = ShardedNeoWebSocket("sid", "token", "server", None, shard_count=2, columnar_output=True)
+        self.feed.on_message = self.on_message
+        self.subscribe_batches()
+        for report in self.feed.shard_lag():
+            self.assertGreater(report["lag"], 0)
+
+    def subscribe_batches(self):
+        tokens = [{"instrument_token": topic.token, "exchange_segment": topic.segment} for topic in self.topics]
+        self.feed.get_live_feed(tokens, False, False)
+
+        def batches(shard):
+            with self.lock:
+                return [message for message in self.messages
+                        if message.get("type") == "stock_feed_batch" and message["shard"] == shard]
+        self.assertTrue(wait_for(lambda: all(batches(shard) for shard in range(2))))
+
+    def test_parse_tick_time(self):
+        self.assertEqual(parse_tick_time(time.strftime("%d/%m/%Y %H:%M:%S", time.localtime(1700000000))),
+                         1700000000)
+        self.assertIsNone(parse_tick_time("not a time"))
+
+
+class ShardRoutingTest(unittest.TestCase):
+    def setUp(self):
+        self.feed = ShardedNeoWebSocket("sid", "token", "server", None, shard_count=2)
+        for shard in self.feed.shards:
+            shard.start_websocket_thread = lambda: None
+        self.tokens = [{"instrument_token": str(token), "exchange_segment": "nse_cm"} for token in range(20)]
+
+    def test_placement_is_kept_only_for_what_the_shard_took(self):
+        failing = self.feed.shards[1]
+        subscribe = failing.get_live_feed
+
+        def reject(*args):
+            raise ConnectionError("shard down")
+        failing.get_live_feed = reject
+        with self.assertRaises(ConnectionError):
+            self.feed.get_live_feed(self.tokens, False, False)
+        self.assertEqual(set(self.feed.placement.values()), {0})
+        self.assertEqual(len(self.feed.placement), len(self.feed.shards[0].subscriptions))
+
+        # The rejected instruments are routed again once the shard accepts them
+        failing.get_live_feed = subscribe
+        self.feed.get_live_feed(self.tokens, False, False)
+        self.assertEqual(len(self.feed.placement), len(self.tokens))
+        self.assertEqual(sum(len(shard.subscriptions) for shard in self.feed.shards), len(self.tokens))
+
+    def test_slow_consumer_does_not_block_other_shards(self):
+        release = threading.Event()
+        delivered = []
+
+        def on_message(message):
+            if message["shard"] == 0:
+                release.wait(5)
+            delivered.append(message["shard"])
+        self.feed.on_message = on_message
+        blocked = threading.Thread(target=self.feed.forward_message, args=(0, {"type": "stock_feed", "data": []}))
+        blocked.start()
+        other = threading.Thread(target=self.feed.forward_message, args=(1, {"type": "stock_feed", "data": []}))
+        other.start()
+        other.join(2)
+        self.assertEqual(delivered, [1])
+        release.set()
+        blocked.join(2)
+        self.assertEqual(delivered, [1, 0])
+        self.assertEqual([stats["messages"] for stats in self.feed.stats], [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from concurrent.futures import wait
+from types import SimpleNamespace
+
+from neo_api_client.NeoWebSocket import NeoWebSocket
+from neo_api_client.snapshot_requests import PendingSnapshots
+
+KEY = PendingSnapshots.key("nse_cm", 11536)
+
+
+class PendingSnapshotsTest(unittest.TestCase):
+    def setUp(self):
+        self.snapshots = PendingSnapshots()
+
+    def test_request_times_out_without_further_calls(self):
+        future = self.snapshots.add(KEY, "sf", 0.2)
+        wait([future], timeout=2)
+        self.assertTrue(future.done())
+        self.assertIsInstance(future.exception(), TimeoutError)
+        self.assertNotIn(KEY, self.snapshots)
+
+    def test_earlier_deadline_rearms_the_timer(self):
+        late = self.snapshots.add(KEY, "sf", 5)
+        early = self.snapshots.add(PendingSnapshots.key("nse_cm", "1"), "sf", 0.1)
+        wait([early], timeout=2)
+        self.assertIsInstance(early.exception(), TimeoutError)
+        self.assertFalse(late.done())
+
+    def test_concurrent_requests_for_the_same_key(self):
+        futures = []
+        threads = [threading.Thread(target=lambda: futures.append(self.snapshots.add(KEY, "sf", 5)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.snapshots.resolve(KEY, "sf", {"tk": "11536"}), 8)
+        self.assertEqual([future.result(0) for future in futures], [{"tk": "11536"}] * 8)
+        self.assertNotIn(KEY, self.snapshots)
+
+    def test_resolve_only_matches_the_feed_type(self):
+        scrip = self.snapshots.add(KEY, "sf", 5)
+        depth = self.snapshots.add(KEY, "dp", 5)
+        self.assertEqual(self.snapshots.resolve(KEY, "if", {}), 0)
+        self.assertEqual(self.snapshots.resolve(KEY, "dp", {"name": "dp"}), 1)
+        self.assertEqual(depth.result(0), {"name": "dp"})
+        self.assertFalse(scrip.done())
+        self.assertIn(KEY, self.snapshots)
+
+    def test_cancel_and_fail_all(self):
+        cancelled = self.snapshots.add(KEY, "sf", 5)
+        failed = self.snapshots.add(KEY, "dp", 5)
+        self.snapshots.cancel(KEY, cancelled)
+        self.assertTrue(cancelled.cancelled())
+        self.snapshots.fail_all(ConnectionError("closed"))
+        self.assertIsInstance(failed.exception(0), ConnectionError)
+        self.assertEqual(len(self.snapshots), 0)
+
+
+class SnapshotReconnectTest(unittest.TestCase):
+    def setUp(self):
+        self.feed = NeoWebSocket("sid", "token", "server", None)
+        self.sent = []
+        self.feed.start_websocket_thread = lambda: None
+        self.feed.hsWebsocket = SimpleNamespace(server=SimpleNamespace(closed=False),
+                                                send_request=lambda *request: self.sent.append(request))
+
+    def test_drop_keeps_requests_for_the_next_connection(self):
+        futures = self.feed.request_snapshots([{"instrument_token": "11536", "exchange_segment": "nse_cm"}])
+        self.feed.on_hsm_close()
+        self.assertEqual(len(self.feed.snapshot_queue), 1)
+        self.assertFalse(futures[KEY].done())
+
+        self.feed.send_snapshot_requests()
+        self.assertEqual(self.feed.snapshot_queue, [])
+        self.assertEqual(len(self.sent), 1)
+        self.assertIn("nse_cm|11536", self.sent[0][1])
+
+    def test_close_fails_pending_requests(self):
+        futures = self.feed.request_snapshots([{"instrument_token": "11536", "exchange_segment": "nse_cm"}])
+        self.feed.hsWebsocket.server.closed = True
+        self.feed.on_hsm_close()
+        self.assertEqual(self.feed.snapshot_queue, [])
+        self.assertIsInstance(futures[KEY].exception(0), ConnectionError)
+
+
+if __name__ == "__main__":
+    unittest.main()